@@ -14,13 +14,18 @@
 
 
 import logging
+import re
 import string
+import unicodedata
 from argparse import ArgumentParser
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 
+import numpy as np
 import pynini
 from pynini import Far
 
+from nemo_text_processing.text_normalization.token_offsets import get_shortest_path
+
 """
 This files takes 1. Far file containing a fst graph created by TN or ITN 2. entire string.
 Optionally: 3. start position of substring 4. end (exclusive) position of substring
@@ -59,6 +64,13 @@ inp indices: [22:26] out indices: [55:69]
 in: |2016| out: |twenty sixteen|
 
 
+To map many strings, load the FST once with the Aligner class:
+
+    aligner = Aligner(fst="<fst file>", rule="tokenize_and_classify", mode="tn")
+    for text, output_text, input_spans, output_spans in aligner.map_words(texts):
+        ...
+
+
 Disclaimer: The heuristic algorithm relies on monotonous alignment and can fail in certain situations,
 e.g. when word pieces are reordered by the fst:
 
@@ -92,6 +104,13 @@ def parse_args():
     )
     args.add_argument("--start", help="start index of substring to be mapped", type=int, required=False)
     args.add_argument("--end", help="end index of substring to be mapped", type=int, required=False)
+    args.add_argument(
+        "--token_type",
+        help="labels of the FST, UTF-8 bytes (pynini default) or Unicode code points",
+        type=str,
+        choices=[BYTE_TOKEN_TYPE, UTF8_TOKEN_TYPE],
+        default=BYTE_TOKEN_TYPE,
+    )
     return args.parse_args()
 
 
@@ -99,94 +118,139 @@ EPS = "<eps>"
 WHITE_SPACE = "\u23b5"
 ITN_MODE = "itn"
 TN_MODE = "tn"
+BYTE_TOKEN_TYPE = "byte"
+UTF8_TOKEN_TYPE = "utf8"
 tn_item_special_chars = ["$", "\\", ":", "+", "-", "="]
 tn_itn_symbols = list(string.ascii_letters + string.digits) + tn_item_special_chars
+_tn_itn_symbols_set = set(tn_itn_symbols)
 
 
 def get_word_segments(text: str) -> List[List[int]]:
     """
     Returns word segments from given text based on white space in form of list of index spans.
     """
-    spans = []
-    cur_span = [0]
-    for idx, ch in enumerate(text):
-        if len(cur_span) == 0 and ch != " ":
-            cur_span.append(idx)
-        elif ch == " ":
-            cur_span.append(idx)
-            assert len(cur_span) == 2
-            spans.append(cur_span)
-            cur_span = []
-        elif idx == len(text) - 1:
-            idx += 1
-            cur_span.append(idx)
-            assert len(cur_span) == 2
-            spans.append(cur_span)
-    return spans
-
-
-def create_symbol_table() -> pynini.SymbolTable:
+    return [[m.start(), m.end()] for m in re.finditer(r"[^ ]+", text)]
+
+
+class LazySymbolTable:
     """
-    Creates and returns Pynini SymbolTable used to label alignment with ascii instead of integers
+    Symbols of Unicode code points used to label alignments with characters instead of integers.
+    Symbols are added when a code point is observed for the first time and are reused afterwards, so that characters
+    of every language are covered without enumerating them in advance.
     """
-    table = pynini.SymbolTable()
-    for num in range(34, 200):  # ascii alphanum + letter range
-        table.add_symbol(chr(num), num)
-    table.add_symbol(EPS, 0)
-    table.add_symbol(WHITE_SPACE, 32)
-    return table
 
+    def __init__(self):
+        self._symbols = {0: EPS, 32: WHITE_SPACE}
 
-def get_string_alignment(fst: pynini.Fst, input_text: str, symbol_table: pynini.SymbolTable):
-    """
-    create alignment of input text based on shortest path in FST. Symbols used for alignment are from symbol_table
+    def __len__(self) -> int:
+        return len(self._symbols)
 
-    Returns:
-        output: list of tuples, each mapping input character to output
+    def __contains__(self, code_point: int) -> bool:
+        return code_point in self._symbols
+
+    def find(self, code_point: int) -> str:
+        """
+        Returns symbol of the code point
+        """
+        symbol = self._symbols.get(code_point)
+        if symbol is None:
+            symbol = self._symbols[code_point] = chr(code_point)
+        return symbol
+
+    def to_pynini(self) -> pynini.SymbolTable:
+        """
+        Returns Pynini SymbolTable with the symbols observed so far, e.g. to print FSTs
+        """
+        table = pynini.SymbolTable()
+        for code_point, symbol in sorted(self._symbols.items()):
+            table.add_symbol(symbol, code_point)
+        return table
+
+
+def create_symbol_table() -> LazySymbolTable:
     """
-    lattice = pynini.shortestpath(input_text @ fst)
-    paths = lattice.paths(input_token_type=symbol_table, output_token_type=symbol_table)
-
-    ilabels = paths.ilabels()
-    olabels = paths.olabels()
-    logging.debug("input: " + paths.istring())
-    logging.debug("output: " + paths.ostring())
-    output = list(zip([symbol_table.find(x) for x in ilabels], [symbol_table.find(x) for x in olabels]))
-    logging.debug(f"alignment: {output}")
-    paths.next()
-    assert paths.done()
-    output_str = "".join(map(remove, [x[1] for x in output]))
-    return output, output_str
+    Creates and returns symbol table used to label alignment with characters instead of integers
+    """
+    return LazySymbolTable()
+
+
+# symbol table shared by alignments that are created without one
+_symbol_table = LazySymbolTable()
 
 
-def _get_aligned_index(alignment: List[tuple], index: int):
+def _utf8_length(lead: int) -> int:
     """
-    Given index in contracted input string computes corresponding index in alignment (which has EPS)
+    Returns length of the UTF-8 sequence that starts with the byte, 1 for invalid lead bytes
     """
-    aligned_index = 0
-    idx = 0
+    if lead >> 5 == 0b110:
+        return 2
+    if lead >> 4 == 0b1110:
+        return 3
+    if lead >> 3 == 0b11110:
+        return 4
+    return 1
 
-    while idx < index:
-        if alignment[aligned_index][0] != EPS:
-            idx += 1
-        aligned_index += 1
-    while alignment[aligned_index][0] == EPS:
-        aligned_index += 1
-    return aligned_index
 
+def decode_labels(labels: List[int], token_type: str = BYTE_TOKEN_TYPE) -> List[int]:
+    """
+    Returns Unicode code point of every label of a path, 0 for epsilon and for labels that don't complete a character.
+    Characters of multiple UTF-8 bytes are assigned to the label of their last byte.
 
-def _get_original_index(alignment, aligned_index):
+    Args:
+        labels: labels of one side of a path
+        token_type: labels of the FST, UTF-8 bytes or Unicode code points
     """
-    Given index in aligned output, returns corresponding index in contracted output string
+    if token_type == UTF8_TOKEN_TYPE:
+        return list(labels)
+
+    code_points = []
+    pending = bytearray()
+    for label in labels:
+        code_points.append(0)
+        if label == 0:
+            continue
+        pending.append(label)
+        if len(pending) == _utf8_length(pending[0]):
+            char = pending.decode("utf-8", errors="replace")
+            code_points[-1] = ord(char) if len(char) == 1 else ord("\ufffd")
+            pending.clear()
+    return code_points
+
+
+def get_string_alignment(
+    fst: pynini.Fst,
+    input_text: str,
+    symbol_table: Optional[LazySymbolTable] = None,
+    token_type: str = BYTE_TOKEN_TYPE,
+):
     """
+    create alignment of input text based on shortest path in FST. Symbols used for alignment are from symbol_table
 
-    og_index = 0
-    idx = 0
-    while idx < aligned_index:
-        if alignment[idx][1] != EPS:
-            og_index += 1
-        idx += 1
-    return og_index
+    Args:
+        fst: FST to align the input with
+        input_text: input text
+        symbol_table: symbol table to label alignment with, shared table by default
+        token_type: labels of the FST, UTF-8 bytes (pynini default) or Unicode code points
+
+    Returns:
+        output: list of tuples, each mapping input character to output
+    """
+    if symbol_table is None:
+        symbol_table = _symbol_table
+    lattice = pynini.accep(pynini.escape(input_text), token_type=token_type) @ fst
+    _, labels = get_shortest_path(lattice, token_type=token_type)
+
+    ilabels = decode_labels([x[0] for x in labels], token_type)
+    olabels = decode_labels([x[1] for x in labels], token_type)
+    output = [
+        (symbol_table.find(i), symbol_table.find(o))
+        for i, o, arc in zip(ilabels, olabels, labels)
+        # arcs of incomplete characters are skipped, epsilon arcs of the path are kept
+        if i or o or not any(arc)
+    ]
+    logging.debug(f"alignment: {output}")
+    output_str = "".join(map(remove, [x[1] for x in output]))
+    return output, output_str
 
 
 remove = lambda x: "" if x == EPS else " " if x == WHITE_SPACE else x
@@ -206,62 +270,177 @@ def indexed_map_to_output(alignment: List[tuple], start: int, end: int, mode: st
         output_og_start_index: inclusive start position in output string
         output_og_end_index: exclusive end position in output string
     """
-    # get aligned start and end of input substring
+    return AlignmentIndex(alignment, mode=mode).map(start, end)
 
-    aligned_start = _get_aligned_index(alignment, start)
-    aligned_end = _get_aligned_index(alignment, end - 1)  # inclusive
 
-    logging.debug(f"0: |{list(map(remove, [x[0] for x in alignment[aligned_start:aligned_end+1]]))}|")
-    logging.debug(f"1: |{aligned_start}:{aligned_end+1}|")
+class AlignmentIndex:
+    """
+    Alignment of an input string with the FST output, indexed with prefix-count arrays, so that every input span is
+    mapped to the output in constant time, see indexed_map_to_output() for the mapping heuristic.
 
-    # extend aligned_start to left
+    Args:
+        alignment: alignment generated by FST with shortestpath, see get_string_alignment()
+        mode: grammar type for either tn or itn
+    """
 
-    while (
-        aligned_start - 1 > 0
-        and alignment[aligned_start - 1][0] == EPS
-        and (alignment[aligned_start - 1][1] in tn_itn_symbols or alignment[aligned_start - 1][1] == EPS)
-    ):
-        aligned_start -= 1
+    def __init__(self, alignment: List[tuple], mode: str = TN_MODE):
+        self.alignment = alignment
+        self.mode = mode
+        self.output_text = "".join(map(remove, [x[1] for x in alignment]))
+
+        n = len(alignment)
+        input_eps = np.fromiter((x[0] == EPS for x in alignment), dtype=bool, count=n)
+        output_eps = np.fromiter((x[1] == EPS for x in alignment), dtype=bool, count=n)
+        # output symbols that are attached to the neighbouring input spans
+        output_attached = output_eps | np.fromiter((_is_attached(x[1]) for x in alignment), dtype=bool, count=n)
+
+        # aligned index of every input character
+        self._input_positions = np.flatnonzero(~input_eps)
+        # number of output characters before every aligned index
+        self._output_prefix = np.concatenate([[0], np.cumsum(~output_eps)])
+        # lengths of runs of inserted attached output symbols that end / start at every aligned index
+        inserted = input_eps & output_attached
+        self._inserted_left = _run_lengths(inserted, reverse=False)
+        self._inserted_right = _run_lengths(inserted, reverse=True)
+        self._attached_right = _run_lengths(output_attached, reverse=True)
+
+    def map(self, start: int, end: int) -> Tuple[int, int]:
+        """
+        Given input start and end index of contracted substring return corresponding output start and end index
+
+        Args:
+            start: inclusive start position in input string
+            end: exclusive end position in input string
+
+        Returns:
+            output_og_start_index: inclusive start position in output string
+            output_og_end_index: exclusive end position in output string
+        """
+        aligned_start = int(self._input_positions[start])
+        aligned_end = int(self._input_positions[end - 1])  # inclusive
+
+        # extend aligned_start to left, the first aligned position is never included
+        if aligned_start - 1 > 0:
+            aligned_start -= min(int(self._inserted_left[aligned_start - 1]), aligned_start - 1)
+        # extend aligned_end to right
+        aligned_end += int(self._inserted_right[aligned_end + 1])
+        if self.mode == TN_MODE:
+            aligned_end += int(self._attached_right[aligned_end + 1])
+
+        return int(self._output_prefix[aligned_start]), int(self._output_prefix[aligned_end + 1])
+
+    def map_spans(self, spans: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """
+        Returns output spans of input spans, see map()
+        """
+        return [self.map(start, end) for start, end in spans]
+
+
+def _is_attached(symbol: str) -> bool:
+    """
+    Returns True for output symbols that belong to the same word as their neighbours, letters, digits and combining
+    marks (e.g. Devanagari vowel signs) of any script
+    """
+    return (
+        symbol in _tn_itn_symbols_set
+        or symbol.isalnum()
+        or (len(symbol) == 1 and unicodedata.category(symbol).startswith("M"))
+    )
 
-    while (
-        aligned_end + 1 < len(alignment)
-        and alignment[aligned_end + 1][0] == EPS
-        and (alignment[aligned_end + 1][1] in tn_itn_symbols or alignment[aligned_end + 1][1] == EPS)
-    ):
-        aligned_end += 1
 
-    if mode == TN_MODE:
-        while (aligned_end + 1) < len(alignment) and (
-            alignment[aligned_end + 1][1] in tn_itn_symbols or alignment[aligned_end + 1][1] == EPS
-        ):
-            aligned_end += 1
+def _run_lengths(mask: np.ndarray, reverse: bool = False) -> np.ndarray:
+    """
+    Returns lengths of runs of True values that end at every position (or start at every position if reverse),
+    with an extra 0 for the position after the last one
+    """
+    n = len(mask)
+    positions = np.arange(n)
+    if reverse:
+        next_false = np.minimum.accumulate(np.where(mask, n, positions)[::-1])[::-1]
+        return np.append(next_false - positions, 0)
+    last_false = np.maximum.accumulate(np.where(mask, -1, positions))
+    return np.append(positions - last_false, 0)
 
-    output_og_start_index = _get_original_index(alignment=alignment, aligned_index=aligned_start)
-    output_og_end_index = _get_original_index(alignment=alignment, aligned_index=aligned_end + 1)
 
-    return output_og_start_index, output_og_end_index
+class Aligner:
+    """
+    Aligns input strings with the output of a TN or ITN grammar. The grammar is loaded once and reused for all strings,
+    the alignment of every string is indexed once to map all its word spans.
+
+    Args:
+        fst: path to a FAR file or FST
+        rule: rule name in FAR file containing FST
+        mode: grammar type for either tn or itn
+        token_type: labels of the FST, UTF-8 bytes (pynini default) or Unicode code points
+    """
+
+    def __init__(
+        self,
+        fst: Union[str, pynini.Fst],
+        rule: str = "tokenize_and_classify",
+        mode: str = TN_MODE,
+        token_type: str = BYTE_TOKEN_TYPE,
+    ):
+        if isinstance(fst, str):
+            far = Far(fst, mode='r')
+            try:
+                fst = far[rule]
+            except KeyError:
+                raise ValueError(f"{rule} not found. Please specify valid rule.")
+        self.fst = fst
+        self.mode = mode
+        self.token_type = token_type
+        self.symbol_table = create_symbol_table()
+
+    def align(self, text: str) -> AlignmentIndex:
+        """
+        Returns indexed alignment of the text with the FST output
+        """
+        alignment, _ = get_string_alignment(
+            fst=self.fst, input_text=text, symbol_table=self.symbol_table, token_type=self.token_type
+        )
+        return AlignmentIndex(alignment, mode=self.mode)
+
+    def map_spans(
+        self, text: str, spans: Optional[List[Tuple[int, int]]] = None
+    ) -> Tuple[str, List[Tuple[int, int]], List[Tuple[int, int]]]:
+        """
+        Maps input spans of the text to the output
+
+        Args:
+            text: input text
+            spans: input spans as (inclusive start, exclusive end), all words bounded by whitespace by default
+
+        Returns: output text, input spans and their output spans
+        """
+        index = self.align(text)
+        if spans is None:
+            spans = [tuple(x) for x in get_word_segments(text)]
+        return index.output_text, spans, index.map_spans(spans)
+
+    def map_words(
+        self, texts: Iterable[str]
+    ) -> Iterator[Tuple[str, str, List[Tuple[int, int]], List[Tuple[int, int]]]]:
+        """
+        Maps all words of every text to the output
+
+        Returns: generator of input text, output text, input word spans and their output spans
+        """
+        for text in texts:
+            yield (text, *self.map_spans(text))
 
 
 if __name__ == '__main__':
     logging.getLogger().setLevel(logging.INFO)
     args = parse_args()
-    fst = Far(args.fst, mode='r')
-    try:
-        fst = fst[args.rule]
-    except:
-        raise ValueError(f"{args.rule} not found. Please specify valid --rule argument.")
+    aligner = Aligner(fst=args.fst, rule=args.rule, mode=args.grammar, token_type=args.token_type)
     input_text = args.text
 
-    table = create_symbol_table()
-    alignment, output_text = get_string_alignment(fst=fst, input_text=input_text, symbol_table=table)
+    spans = None if args.start is None else [(args.start, args.end)]
+    output_text, indices, output_indices = aligner.map_spans(input_text, spans)
     logging.info(f"inp string: |{args.text}|")
     logging.info(f"out string: |{output_text}|")
 
-    if args.start is None:
-        indices = get_word_segments(input_text)
-    else:
-        indices = [(args.start, args.end)]
-    for x in indices:
-        start, end = indexed_map_to_output(start=x[0], end=x[1], alignment=alignment, mode=args.grammar)
+    for x, (start, end) in zip(indices, output_indices):
         logging.info(f"inp indices: [{x[0]}:{x[1]}] out indices: [{start}:{end}]")
         logging.info(f"in: |{input_text[x[0]:x[1]]}| out: |{output_text[start:end]}|")
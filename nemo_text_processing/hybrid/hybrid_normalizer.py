@@ -0,0 +1,283 @@
+# Copyright (c) 2024, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import multiprocessing
+import queue
+import re
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from nemo_text_processing.hybrid import model_utils
+from nemo_text_processing.hybrid.wfst_options import remove_whitelist_boudaries, threshold, threshold_weights
+from nemo_text_processing.text_normalization.normalize_with_audio import NormalizerWithAudio
+
+__all__ = ['HybridNormalizer']
+
+# normalizer of the current worker process, see _init_worker()
+_normalizer = None
+# end of the input stream
+_END = object()
+
+
+def _init_worker(normalizer_kwargs: Dict):
+    """
+    creates WFST normalizer in a worker process
+    """
+    global _normalizer
+    _normalizer = NormalizerWithAudio(**normalizer_kwargs, lm=True)
+
+
+def _get_options(text: str, n_tagged: int, delta: float, punct_post_process: bool) -> Tuple[List[str], List[float]]:
+    """
+    returns WFST normalization options of the text with "< >" around the normalized spans and their weights,
+    options are reduced the same way as in wfst_lm_rescoring.py
+    """
+    options = _normalizer.normalize(text, n_tagged=n_tagged, punct_post_process=punct_post_process)
+    if isinstance(options, str):
+        # normalization failed
+        return [options], [0.0]
+
+    texts, weights = options
+    texts = [re.sub(r"<(.+?)>", r"< \1 >", x) for x in texts]
+    norm_texts_weights = [[texts, [float(w) for w in weights]]]
+    if delta > 0:
+        norm_texts_weights = threshold_weights(norm_texts_weights, delta=delta)
+    # options with the smallest number of unchanged words and replacements
+    norm_texts_weights = threshold(norm_texts_weights)
+    return norm_texts_weights[0][0], norm_texts_weights[0][1]
+
+
+class HybridNormalizer:
+    """
+    Online hybrid text normalization: WFST normalization options are generated by a pool of worker processes and
+    ranked by a language model, see wfst_lm_rescoring.py for the offline evaluation of the approach.
+    Sentences are submitted to the workers ahead of scoring (at most queue_size of them), the options of consecutive
+    sentences are scored in batches while the workers normalize the next sentences. Results are returned in order.
+
+        e.g.
+        with HybridNormalizer(scorer=model_utils.init_models("bert-base-uncased")["bert-base-uncased"]) as normalizer:
+            for normalized in normalizer.normalize_stream(open("input.txt")):
+                print(normalized)
+
+    Args:
+        scorer: model to rank WFST options with, e.g. from model_utils.init_models()
+        normalizer_kwargs: arguments of NormalizerWithAudio created in every worker (lm mode is always on),
+            set cache_dir to load grammars from .far files instead of building them in every worker
+        n_tagged: number of WFST options to generate
+        threshold: options with weights larger than the weight of the best option plus threshold are discarded,
+            set to 0 to keep all options
+        context_len: number of words around the normalized spans to score, None to score the full sentences
+        diff_window: score only tokens that differ between the options and diff_window tokens around them,
+            -1 to score all tokens
+        prefilter: optional cheaper model, e.g. n-gram LM, to select prefilter_top_k options for the scorer
+        prefilter_top_k: number of options to keep after the prefilter
+        punct_post_process: whether to normalize punctuation of the WFST options
+        n_jobs: number of WFST worker processes
+        queue_size: maximum number of sentences submitted to the workers ahead of scoring
+        batch_size: maximum number of sentences to score together
+        mp_context: start method of the worker processes, "spawn" is safe to use with torch models in the parent
+    """
+
+    def __init__(
+        self,
+        scorer: model_utils.Scorer,
+        normalizer_kwargs: Optional[Dict] = None,
+        n_tagged: int = 100,
+        threshold: float = 0.2,
+        context_len: Optional[int] = None,
+        diff_window: int = -1,
+        prefilter: Optional[model_utils.Scorer] = None,
+        prefilter_top_k: int = 5,
+        punct_post_process: bool = False,
+        n_jobs: int = 4,
+        queue_size: int = 256,
+        batch_size: int = 16,
+        mp_context: str = "spawn",
+    ):
+        self.scorer = scorer
+        self.normalizer_kwargs = normalizer_kwargs or {"input_case": "cased", "lang": "en"}
+        self.n_tagged = n_tagged
+        self.threshold = threshold
+        self.context_len = context_len
+        self.diff_window = diff_window
+        self.prefilter = prefilter
+        self.prefilter_top_k = prefilter_top_k
+        self.punct_post_process = punct_post_process
+        self.n_jobs = n_jobs
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.mp_context = mp_context
+        self._pool = None
+
+    def __enter__(self) -> "HybridNormalizer":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Stops the worker processes
+        """
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def normalize(self, text: str) -> str:
+        """
+        Returns normalization of a single text
+        """
+        options = self._get_pool().submit(_get_options, text, self.n_tagged, self.threshold, self.punct_post_process)
+        return self._rank([options.result()])[0]
+
+    def normalize_stream(self, texts: Iterable[str]) -> Iterator[str]:
+        """
+        Normalizes a stream of texts, e.g. lines of an open file or sentences from a request queue.
+        Input is read lazily, at most queue_size texts are normalized ahead of the returned ones.
+
+        Args:
+            texts: iterable of texts
+
+        Returns: generator of normalized texts in the input order
+        """
+        pool = self._get_pool()
+        futures = queue.Queue()
+        # texts that are submitted but not returned yet
+        slots = threading.Semaphore(self.queue_size)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._submit, args=(pool, texts, futures, slots, stop), daemon=True)
+        producer.start()
+
+        # futures of the submitted texts in the input order
+        outstanding = collections.deque()
+        try:
+            submitted_all = False
+            while outstanding or not submitted_all:
+                # wait for a submission only if there is nothing to score
+                while not submitted_all:
+                    try:
+                        item = futures.get(block=not outstanding)
+                    except queue.Empty:
+                        break
+                    if item is _END:
+                        submitted_all = True
+                    elif isinstance(item, BaseException):
+                        raise item
+                    else:
+                        outstanding.append(item)
+                if not outstanding:
+                    continue
+
+                # wait for the next text and score it together with the following texts whose options are ready,
+                # a partial batch is scored not to delay results of slow streams, errors are raised in order
+                batch = [outstanding.popleft().result()]
+                while (
+                    outstanding
+                    and len(batch) < self.batch_size
+                    and outstanding[0].done()
+                    and outstanding[0].exception() is None
+                ):
+                    batch.append(outstanding.popleft().result())
+                for normalized in self._rank(batch):
+                    slots.release()
+                    yield normalized
+        finally:
+            stop.set()
+            producer.join()
+            # cancel options that are not needed anymore
+            while True:
+                try:
+                    outstanding.append(futures.get_nowait())
+                except queue.Empty:
+                    break
+            for item in outstanding:
+                if isinstance(item, Future):
+                    item.cancel()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """
+        Returns the pool of WFST workers, starts it on the first call
+        """
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.n_jobs,
+                mp_context=multiprocessing.get_context(self.mp_context),
+                initializer=_init_worker,
+                initargs=(self.normalizer_kwargs,),
+            )
+        return self._pool
+
+    def _submit(
+        self,
+        pool: ProcessPoolExecutor,
+        texts: Iterable[str],
+        futures: queue.Queue,
+        slots: threading.Semaphore,
+        stop: threading.Event,
+    ):
+        """
+        Submits texts to the workers, the next text is read only when less than queue_size texts are waiting to be
+        returned
+        """
+        try:
+            texts = iter(texts)
+            while True:
+                while not slots.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                if stop.is_set():
+                    return
+                text = next(texts, _END)
+                if text is _END:
+                    return
+                futures.put(pool.submit(_get_options, text, self.n_tagged, self.threshold, self.punct_post_process))
+        except Exception as e:
+            futures.put(e)
+        finally:
+            futures.put(_END)
+
+    def _rank(self, options: List[Tuple[List[str], List[float]]]) -> List[str]:
+        """
+        Returns the best option of every text, options of all texts are scored together
+        """
+        candidates = [texts for texts, _ in options]
+        if self.prefilter is not None:
+            scores = model_utils.score_options_batch(candidates, self.context_len, self.prefilter)
+            candidates = [
+                [texts[i] for i in sorted(range(len(texts)), key=lambda i: text_scores[i])[: self.prefilter_top_k]]
+                for texts, text_scores in zip(candidates, scores)
+            ]
+
+        # texts with a single option are not scored
+        to_score = [i for i, texts in enumerate(candidates) if len(texts) > 1]
+        scores = []
+        if to_score:
+            scores = model_utils.score_options_batch(
+                [candidates[i] for i in to_score], self.context_len, self.scorer, diff_window=self.diff_window
+            )
+        best = [texts[0] for texts in candidates]
+        for i, text_scores in zip(to_score, scores):
+            best[i] = candidates[i][min(range(len(text_scores)), key=lambda k: text_scores[k])]
+        return [self._clean(text) for text in best]
+
+    @staticmethod
+    def _clean(text: str) -> str:
+        """
+        Removes span delimiters from the normalized text
+        """
+        text = remove_whitelist_boudaries(text)
+        text = re.sub(r"<\s(.+?)\s>", r"\1", text)
+        return re.sub(r" +", " ", text).strip()
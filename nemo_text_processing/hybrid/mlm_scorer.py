@@ -13,13 +13,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import List
-
-import numpy as np
+from typing import List, Optional, Tuple
 
 try:
     import torch
-    from torch.nn.functional import softmax
 except ImportError as e:
     raise ImportError("torch is not installed")
 try:
@@ -27,74 +24,293 @@ try:
 except ImportError as e:
     raise ImportError("transformers is not installed")
 
-__all__ = ['MLMScorer']
+from nemo_text_processing.hybrid.model_utils import BACKENDS
+from nemo_text_processing.hybrid.scorer import Scorer
+from nemo_text_processing.text_normalization.utils_audio_based import get_matching_blocks
+from nemo_text_processing.utils.cache import PersistentCache
+
+__all__ = ['MLMScorer', 'BACKENDS']
+
+# torchscript graphs are traced for input lengths padded to a multiple of this number of tokens
+TRACE_LENGTH_STEP = 16
+
+
+class _LogitsModel(torch.nn.Module):
+    """
+    HuggingFace masked LM that returns logits only, to be traced into a TorchScript graph
+    """
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, *inputs: 'torch.Tensor') -> Tuple['torch.Tensor']:
+        return (self.model(*inputs, return_dict=False)[0],)
 
 
-class MLMScorer:
-    def __init__(self, model_name: str, device: str = 'cpu'):
+class MLMScorer(Scorer):
+    def __init__(
+        self,
+        model_name: str,
+        device: str = 'cpu',
+        batch_size: int = 64,
+        cache_size: int = 100000,
+        cache_path: Optional[str] = None,
+        backend: str = 'fp32',
+        num_threads: Optional[int] = None,
+        use_fast: bool = False,
+    ):
         """
         Creates MLM scorer from https://arxiv.org/abs/1910.14659.
         Args:
             model_name: HuggingFace pretrained model name
             device: either 'cpu' or 'cuda'
+            batch_size: number of masked copies of the sentences to score in one forward pass
+            cache_size: maximum number of masked copies to keep scores for in memory, set to 0 to disable
+            cache_path: path to a SQLite file to keep scores of masked copies between runs, keyed by model name
+                and backend
+            backend: inference backend, one of BACKENDS
+            num_threads: number of threads used by torch for CPU inference, None to keep the torch default.
+                Note, the setting is global for the process.
+            use_fast: set to True to use a fast (Rust) tokenizer if it is available for the model, its tokenization
+                could differ from the slow tokenizer and change the scores
         """
-        self.model = AutoModelForMaskedLM.from_pretrained(model_name).to(device).eval()
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=False)
+        if backend not in BACKENDS:
+            raise ValueError(f"Unsupported backend: {backend}, choose one of {BACKENDS}")
+        if backend == 'int8' and device != 'cpu':
+            raise ValueError("int8 backend is supported on CPU only")
+        if num_threads is not None:
+            torch.set_num_threads(num_threads)
+
+        self.model_name = model_name
+        self.backend = backend
+        self.cache = PersistentCache(max_size=cache_size, path=cache_path, namespace="mlm_scores")
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=use_fast)
         self.device = device
+        self.batch_size = batch_size
         self.MASK_LABEL = self.tokenizer.mask_token
+        self.model = self._load_model(model_name, device, backend)
+
+    def _load_model(self, model_name: str, device: str, backend: str):
+        """
+        returns model for the backend, torchscript graphs are traced later for every input shape, see _forward()
+        """
+        model = AutoModelForMaskedLM.from_pretrained(model_name)
+        model = model.to(device).eval()
+        if backend == 'int8':
+            return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        if backend == 'torchscript':
+            self._traced = {}
+            return _LogitsModel(model).eval()
+        return model
 
-    def score_sentences(self, sentences: List[str]):
+    def _get_model_inputs(self, input_ids: 'torch.Tensor', attention_mask: 'torch.Tensor') -> Tuple['torch.Tensor']:
+        """
+        returns positional model inputs on the model device
+        """
+        inputs = (input_ids.to(self.device), attention_mask.to(self.device))
+        if 'token_type_ids' in self.tokenizer.model_input_names:
+            inputs += (torch.zeros_like(input_ids, device=self.device),)
+        return inputs
+
+    def _forward(self, input_ids: 'torch.Tensor', attention_mask: 'torch.Tensor') -> 'torch.Tensor':
+        """
+        returns logits of the model for the batch
+        """
+        if self.backend != 'torchscript':
+            return self.model(*self._get_model_inputs(input_ids, attention_mask))[0]
+
+        # traced graphs are specialized to the shape of the example inputs, batches are padded to batch_size rows and
+        # to a multiple of TRACE_LENGTH_STEP tokens, a graph is traced once for every padded shape
+        n_rows, length = input_ids.shape
+        padded_length = -(-length // TRACE_LENGTH_STEP) * TRACE_LENGTH_STEP
+        padded_length = min(padded_length, self.model.model.config.max_position_embeddings)
+        padding = (0, padded_length - length, 0, max(self.batch_size - n_rows, 0))
+        pad_id = self.tokenizer.pad_token_id if self.tokenizer.pad_token_id is not None else 0
+        inputs = self._get_model_inputs(
+            torch.nn.functional.pad(input_ids, padding, value=pad_id),
+            torch.nn.functional.pad(attention_mask, padding, value=0),
+        )
+        shape = tuple(inputs[0].shape)
+        if shape not in self._traced:
+            with torch.no_grad():
+                self._traced[shape] = torch.jit.freeze(torch.jit.trace(self.model, inputs, strict=False))
+        return self._traced[shape](*inputs)[0][:n_rows, :length]
+
+    def score_sentences(self, sentences: List[str]) -> List[float]:
         """
         returns list of MLM scores for each sentence in list.
+        Every token of a sentence is masked in turn, masked copies of all sentences are scored in padded batches.
         """
-        return [self.score_sentence(sentence) for sentence in sentences]
+        token_ids = [self._tokenize(sentence) for sentence in sentences]
+        # masked copies as (sentence index, position of the masked token), special tokens are not masked
+        variants = [(i, pos) for i, (_, n_tokens) in enumerate(token_ids) for pos in range(1, n_tokens + 1)]
+        log_probs = self._score_masked([ids for ids, _ in token_ids], variants)
+
+        scores = [0.0] * len(sentences)
+        for (i, _), log_prob in zip(variants, log_probs):
+            scores[i] += log_prob
+        return scores
 
-    def score_sentence(self, sentence: str):
+    def score_sentence(self, sentence: str) -> float:
         """
         returns MLM score for sentence.
         """
         assert type(sentence) == str
+        return self.score_sentences([sentence])[0]
+
+    def score_sentence_groups(self, groups: List[List[str]], window: int = 1) -> List[List[float]]:
+        """
+        returns MLM scores for groups of alternative sentences, e.g. normalization options of the same input.
+        Only tokens that differ between the sentences of a group, and tokens within `window` tokens of them,
+        are masked and scored: the shared context contributes about the same score to every sentence of the group,
+        so the ranking is close to the full MLM score ranking with a fraction of forward passes.
+
+        Args:
+            groups: groups of sentences
+            window: number of shared tokens around the differing tokens to score
+        """
+        token_ids = []
+        variants = []
+        for group in groups:
+            if len(group) == 0:
+                continue
+            group_ids = [self._tokenize(sentence) for sentence in group]
+            for i, positions in enumerate(self._get_diff_positions([ids[1 : n + 1] for ids, n in group_ids], window)):
+                variants.extend((len(token_ids) + i, pos + 1) for pos in positions)
+            token_ids.extend(ids for ids, _ in group_ids)
+        log_probs = self._score_masked(token_ids, variants)
+
+        scores = [0.0] * len(token_ids)
+        for (i, _), log_prob in zip(variants, log_probs):
+            scores[i] += log_prob
+
+        group_scores = []
+        for group in groups:
+            group_scores.append(scores[: len(group)])
+            scores = scores[len(group) :]
+        return group_scores
+
+    @staticmethod
+    def _get_diff_positions(sentences: List[List[int]], window: int) -> List[List[int]]:
+        """
+        returns positions of tokens to score for every sentence. Sentences are aligned with the first one, tokens that
+        are not aligned with the tokens shared by all sentences are scored, together with the tokens within `window`
+        tokens of every difference, the same shared tokens are scored in all sentences.
+        """
+        reference = sentences[0]
+        alignments = []
+        for tokens in sentences:
+            alignment = []
+            for i, j, length in get_matching_blocks(reference, tokens):
+                alignment.extend((i + k, j + k) for k in range(length))
+            alignments.append(alignment)
+
+        # reference tokens that are not aligned with a token of every sentence
+        common = [True] * len(reference)
+        for alignment in alignments:
+            aligned = set(i for i, _ in alignment)
+            common = [x and i in aligned for i, x in enumerate(common)]
+        scored_reference = set()
+        for i, x in enumerate(common):
+            if not x:
+                scored_reference.update(range(i - window, i + window + 1))
+        # shared tokens around the tokens inserted between reference tokens
+        for tokens, alignment in zip(sentences, alignments):
+            pairs = [(-1, -1)] + alignment + [(len(reference), len(tokens))]
+            for (prev_i, prev_j), (i, j) in zip(pairs, pairs[1:]):
+                if j - prev_j > 1:
+                    scored_reference.update(range(prev_i - window + 1, i + window))
+
+        positions = []
+        for tokens, alignment in zip(sentences, alignments):
+            shared = [False] * len(tokens)
+            for i, j in alignment:
+                shared[j] = i not in scored_reference
+            positions.append([j for j, x in enumerate(shared) if not x])
+        return positions
+
+    def _tokenize(self, sentence: str) -> Tuple[List[int], int]:
+        """
+        returns token ids of the sentence with special tokens and the number of tokens without special tokens.
+        """
+        encoding = self.tokenizer(sentence, return_special_tokens_mask=True)
+        return encoding["input_ids"], len(encoding["input_ids"]) - sum(encoding["special_tokens_mask"])
+
+    def _score_masked(self, token_ids: List[List[int]], variants: List[Tuple[int, int]]) -> List[float]:
+        """
+        returns log probability of the original token at the masked position for every masked copy.
+        Scores are cached by the masked text and the id of the masked token, identical masked copies are scored once,
+        e.g. "the cat sat" and "the dog sat" share the masked text "the [MASK] sat" but not the score.
+
+        Args:
+            token_ids: token ids of the sentences with special tokens
+            variants: masked copies as (sentence index, position of the masked token)
+        """
+        tokens = {}
+        keys = []
+        for i, pos in variants:
+            if i not in tokens:
+                tokens[i] = self.tokenizer.convert_ids_to_tokens(token_ids[i])
+            masked = tokens[i].copy()
+            masked[pos] = self.MASK_LABEL
+            keys.append((self.model_name, self.backend, " ".join(masked), token_ids[i][pos]))
+
+        log_probs = [self.cache.get(key) for key in keys]
+        # first masked copy of every text that is not in the cache
+        missing = {}
+        for k, (key, log_prob) in enumerate(zip(keys, log_probs)):
+            if log_prob is None:
+                missing.setdefault(key, k)
+
+        if missing:
+            missing_log_probs = self._run_model(token_ids, [variants[k] for k in missing.values()])
+            self.cache.update(zip(missing.keys(), missing_log_probs))
+            missing_log_probs = dict(zip(missing.keys(), missing_log_probs))
+            log_probs = [missing_log_probs[key] if x is None else x for key, x in zip(keys, log_probs)]
+        return log_probs
+
+    def _run_model(self, token_ids: List[List[int]], variants: List[Tuple[int, int]]) -> List[float]:
+        """
+        returns log probability of the original token at the masked position for every masked copy,
+        computed by the model.
+
+        Args:
+            token_ids: token ids of the sentences with special tokens
+            variants: masked copies as (sentence index, position of the masked token)
+        """
+        if len(variants) == 0:
+            return []
+
+        # sentences are tokenized once, masked copies are rows of the padded matrix of the sentences
+        lengths = torch.tensor([len(ids) for ids in token_ids])
+        pad_id = self.tokenizer.pad_token_id if self.tokenizer.pad_token_id is not None else 0
+        all_ids = torch.full((len(token_ids), int(lengths.max())), pad_id, dtype=torch.long)
+        for i, ids in enumerate(token_ids):
+            all_ids[i, : len(ids)] = torch.tensor(ids, dtype=torch.long)
+
+        # copies of sentences with similar length are batched together to reduce padding
+        order = sorted(range(len(variants)), key=lambda k: len(token_ids[variants[k][0]]))
+        log_probs = [0.0] * len(variants)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start : start + self.batch_size]
+            sentence_idx = torch.tensor([variants[k][0] for k in batch])
+            positions = torch.tensor([variants[k][1] for k in batch])
+            rows = torch.arange(len(batch))
+            max_len = int(lengths[sentence_idx].max())
+
+            input_ids = all_ids[sentence_idx, :max_len].clone()
+            targets = input_ids[rows, positions].clone()
+            input_ids[rows, positions] = self.tokenizer.mask_token_id
+            attention_mask = (torch.arange(max_len)[None, :] < lengths[sentence_idx][:, None]).long()
+
+            rows, positions, targets = rows.to(self.device), positions.to(self.device), targets.to(self.device)
+            with torch.no_grad():
+                logits = self._forward(input_ids, attention_mask)
+                # only logits at the masked positions are normalized
+                masked_log_probs = torch.log_softmax(logits[rows, positions].float(), dim=-1)
+                batch_log_probs = masked_log_probs[rows, targets].cpu().tolist()
 
-        tokens = self.tokenizer.tokenize(sentence)
-        mask_idx = []
-        token_type = []
-        attn_mask = []
-        ids = []
-        for m_idx, _ in enumerate(tokens):
-            masked = self.__mask_text__(m_idx, tokens)
-            mask_idx.append(m_idx)
-            ids.append(self.tokenizer.encode(masked))
-            id_len = len(ids[-1])
-            token_type.append([0] * id_len)
-            attn_mask.append([1] * id_len)
-
-        data = {
-            'input_ids': torch.tensor(ids, device=self.device),
-            'attention_mask': torch.tensor(attn_mask, device=self.device),
-            'token_type_ids': torch.tensor(token_type, device=self.device),
-        }
-
-        with torch.no_grad():
-            outputs = self.model(**data)
-            logits = outputs.logits
-
-        scores = []
-        scores_log_prob = 0.0
-
-        for i, m_idx in enumerate(mask_idx):
-            preds = logits[i].squeeze(0)
-            probs = softmax(preds, dim=1)
-            token_id = self.tokenizer.convert_tokens_to_ids([tokens[m_idx]])[0]
-            log_prob = np.log(probs[m_idx + 1, token_id].cpu().numpy()).item()
-            scores.append(log_prob)
-            scores_log_prob += log_prob
-
-        return scores_log_prob
-
-    def __mask_text__(self, idx: int, tokens: List[str]):
-        """
-        replaces string at index idx in list `tokens` with a masked token and returns the modified list.
-        """
-        masked = tokens.copy()
-        masked[idx] = self.MASK_LABEL
-        return masked
+            for k, log_prob in zip(batch, batch_log_probs):
+                log_probs[k] = log_prob
+        return log_probs
@@ -15,32 +15,60 @@
 import logging
 import math
 import re
-from typing import List, Union
+from typing import List, Optional, Union
 
-from tqdm import tqdm
+from nemo_text_processing.hybrid.ngram_scorer import NGramScorer
+from nemo_text_processing.hybrid.scorer import Scorer
 
-from nemo_text_processing.hybrid.mlm_scorer import MLMScorer
+# prefix of model names that are paths to n-gram LMs, e.g. "ngram:lm.arpa"
+NGRAM_PREFIX = "ngram:"
+# inference backends of Masked Language Models, see MLMScorer:
+# fp32 - HuggingFace model as is, int8 - dynamic int8 quantization of linear layers (CPU only),
+# torchscript - model traced and frozen into a TorchScript graph
+BACKENDS = ['fp32', 'int8', 'torchscript']
 
-try:
-    import torch
-except ImportError as e:
-    raise ImportError("torch is not installed")
 
-
-def init_models(model_name_list: str):
+def init_models(
+    model_name_list: str,
+    batch_size: int = 64,
+    cache_path: Optional[str] = None,
+    backend: str = 'fp32',
+    num_threads: Optional[int] = None,
+):
     """
-    returns dictionary of Masked Language Models by their HuggingFace name.
+    returns dictionary of scorers by their names: Masked Language Models by their HuggingFace name and
+    n-gram LMs by "ngram:<path to ARPA or .npz file>".
+    batch_size is the number of masked copies of sentences scored in one forward pass,
+    cache_path is a path to a SQLite file to keep scores of masked sentences between runs,
+    backend is the inference backend (see BACKENDS), int8 models always run on CPU,
+    num_threads is the number of threads for CPU inference.
+    torch and transformers are only imported if Masked Language Models are requested.
     """
     model_names = model_name_list.split(",")
     models = {}
     for model_name in model_names:
-        device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        models[model_name] = MLMScorer(model_name=model_name, device=device)
+        if model_name.startswith(NGRAM_PREFIX):
+            models[model_name] = NGramScorer(lm_path=model_name[len(NGRAM_PREFIX) :])
+            continue
+        # imported here since n-gram LMs don't need torch and transformers
+        import torch
+
+        from nemo_text_processing.hybrid.mlm_scorer import MLMScorer
+
+        device = 'cuda' if torch.cuda.is_available() and backend != 'int8' else 'cpu'
+        models[model_name] = MLMScorer(
+            model_name=model_name,
+            device=device,
+            batch_size=batch_size,
+            cache_path=cache_path,
+            backend=backend,
+            num_threads=num_threads,
+        )
     return models
 
 
-def get_score(texts: Union[List[str], str], model: MLMScorer):
-    """Computes MLM score for list of text using model"""
+def get_score(texts: Union[List[str], str], model: Scorer):
+    """Computes score for list of text using model"""
     try:
         if isinstance(texts, str):
             texts = [texts]
@@ -52,24 +80,86 @@ def get_score(texts: Union[List[str], str], model: MLMScorer):
     return score
 
 
+def _get_masked_texts(text, model, do_lower=True) -> List[str]:
+    """returns variants of the text to score, see get_masked_score()."""
+    text = text.lower() if do_lower else text
+    spans = re.findall(r"<\s.+?\s>", text)
+    if len(spans) == 0:
+        return [text]
+    if model.MASK_LABEL is None:
+        return [re.sub(r"<\s(.+?)\s>", r"\1", text)]
+
+    text_with_mask = []
+    for match in re.finditer(r"<\s.+?\s>", text):
+        new_text = (
+            text[: match.span()[0]] + match.group().replace("< ", "").replace(" >", "") + text[match.span()[1] :]
+        )
+        new_text = re.sub(r"<\s.+?\s>", model.MASK_LABEL, new_text)
+        text_with_mask.append(new_text)
+    return text_with_mask
+
+
 def get_masked_score(text, model, do_lower=True):
     """text is normalized prediction which contains <> around semiotic tokens.
     If multiple tokens are present, multiple variants of the text are created where all but one ambiguous semiotic tokens are masked
     to avoid unwanted reinforcement of neighboring semiotic tokens."""
-    text = text.lower() if do_lower else text
-    spans = re.findall(r"<\s.+?\s>", text)
-    if len(spans) > 0:
-        text_with_mask = []
+    return get_score(_get_masked_texts(text, model, do_lower), model)
+
+
+def get_masked_scores(
+    texts: List[str], model, do_lower=True, diff_window: int = -1, groups: Optional[List[List[int]]] = None
+) -> List[float]:
+    """returns get_masked_score() of every text. Variants of all texts are scored by the model together,
+    so that the model could batch them.
+    If diff_window >= 0, texts from the same group are alternatives of each other, e.g. normalization options
+    of the same input, and only tokens that differ between them and diff_window tokens around are scored.
+    groups are lists of text indices, all texts form one group by default."""
+    masked_texts = [_get_masked_texts(text, model, do_lower) for text in texts]
+    try:
+        if diff_window >= 0 and hasattr(model, "score_sentence_groups"):
+            variant_scores = _get_diff_scores(masked_texts, model, diff_window, groups)
+        else:
+            variant_scores = model.score_sentences([x for variants in masked_texts for x in variants])
+    except Exception as e:
+        logging.warning(f"Batch scoring error: {e}, scoring texts one by one")
+        return [get_score(variants, model) for variants in masked_texts]
 
-        for match in re.finditer(r"<\s.+?\s>", text):
-            new_text = (
-                text[: match.span()[0]] + match.group().replace("< ", "").replace(" >", "") + text[match.span()[1] :]
-            )
-            new_text = re.sub(r"<\s.+?\s>", model.MASK_LABEL, new_text)
-            text_with_mask.append(new_text)
-        text = text_with_mask
+    scores = []
+    start = 0
+    for variants in masked_texts:
+        scores.append(-1 * sum(variant_scores[start : start + len(variants)]) / len(variants))
+        start += len(variants)
+    return scores
 
-    return get_score(text, model)
+
+def _get_diff_scores(
+    masked_texts: List[List[str]], model, window: int, groups: Optional[List[List[int]]] = None
+) -> List[float]:
+    """returns scores of all variants of masked_texts, only the differing tokens of the texts from the same group
+    are scored. The i-th variants of the texts are compared if all texts in the group have the same number of variants,
+    i.e. masks of the same semiotic spans."""
+    if groups is None:
+        groups = [list(range(len(masked_texts)))]
+
+    # (text index, variant index) of the sentences of every group
+    variant_groups = []
+    for group in groups:
+        n_variants = set(len(masked_texts[i]) for i in group)
+        if len(n_variants) == 0:
+            continue
+        elif len(n_variants) == 1:
+            for k in range(n_variants.pop()):
+                variant_groups.append([(i, k) for i in group])
+        else:
+            variant_groups.append([(i, k) for i in group for k in range(len(masked_texts[i]))])
+
+    group_scores = model.score_sentence_groups(
+        [[masked_texts[i][k] for i, k in variant_group] for variant_group in variant_groups], window=window
+    )
+    variant_scores = {}
+    for variant_group, scores in zip(variant_groups, group_scores):
+        variant_scores.update(zip(variant_group, scores))
+    return [variant_scores[(i, k)] for i, variants in enumerate(masked_texts) for k in range(len(variants))]
 
 
 def _get_ambiguous_positions(sentences: List[str]):
@@ -90,43 +180,91 @@ def _get_ambiguous_positions(sentences: List[str]):
     return ambiguous
 
 
-def score_options(sentences: List[str], context_len, model, do_lower=True):
-    """return list of scores for each sentence in list where model is used for MLM Scoring."""
-    scores = []
+def score_options(sentences: List[str], context_len, model, do_lower=True, diff_window: int = -1):
+    """return list of scores for each sentence in list where model is used for MLM Scoring.
+    Texts to score of all sentences are passed to the model together.
+    Set diff_window >= 0 to score only tokens that differ between the sentences, and diff_window tokens around them."""
+    return score_options_batch([sentences], context_len, model, do_lower=do_lower, diff_window=diff_window)[0]
+
+
+def score_options_batch(
+    sentences_list: List[List[str]], context_len, model, do_lower=True, diff_window: int = -1
+) -> List[List[float]]:
+    """returns score_options() of the options of multiple inputs, texts to score of all inputs are passed to
+    the model together. Only options of the same input are compared with diff_window >= 0."""
+    texts = []
+    groups = []
+    layouts = []
+    for sentences in sentences_list:
+        sentences = _get_texts_to_score(sentences, context_len)
+        # texts with the same context of different sentences
+        if sentences and isinstance(sentences[0], list):
+            sentence_groups = [[] for _ in range(len(sentences[0]))]
+        else:
+            sentence_groups = [[]]
+        for sent in sentences:
+            if isinstance(sent, list):  # in case of set context len
+                for k in range(len(sent)):
+                    sentence_groups[k].append(len(texts) + k)
+                texts.extend(sent)
+            elif isinstance(sent, str):  # in case of full context
+                sentence_groups[0].append(len(texts))
+                texts.append(sent)
+            else:
+                raise ValueError()
+        groups.extend(sentence_groups)
+        layouts.append(sentences)
+    text_scores = get_masked_scores(texts, model, do_lower=do_lower, diff_window=diff_window, groups=groups)
+
+    all_scores = []
+    start = 0
+    for sentences in layouts:
+        scores = []
+        for sent in sentences:
+            if isinstance(sent, list):
+                option_scores = text_scores[start : start + len(sent)]
+                start += len(sent)
+                logging.debug(sent)
+                logging.debug(option_scores)
+                logging.debug("=" * 50)
+                if any(math.isnan(x) for x in option_scores):
+                    av_score = math.inf
+                else:
+                    av_score = round(sum(option_scores) / len(option_scores), 4)
+                scores.append(av_score)
+            else:
+                scores.append(round(text_scores[start]))
+                start += 1
+        all_scores.append(scores)
+    return all_scores
+
+
+def _get_texts_to_score(sentences: List[str], context_len) -> List[Union[str, List[str]]]:
+    """returns parts of the sentences around the semiotic spans if context_len is set,
+    otherwise the sentences with the spans that are the same in all sentences unwrapped"""
     if context_len is not None:
         diffs = [find_diff(s, context_len) for s in sentences]
         if len(set([len(d) for d in diffs])) == 1:
-            sentences = diffs
+            return diffs
 
     ambiguous_positions = None
     if sentences and isinstance(sentences[0], str):
         ambiguous_positions = _get_ambiguous_positions(sentences)
+    if not ambiguous_positions:
+        return sentences
 
-    for sent in tqdm(sentences):
-        if isinstance(sent, list):  # in case of set context len
-            option_scores = [get_masked_score(s, model, do_lower) for s in sent]
-            logging.debug(sent)
-            logging.debug(option_scores)
-            logging.debug("=" * 50)
-            if any(math.isnan(x) for x in option_scores):
-                av_score = math.inf
-            else:
-                av_score = round(sum(option_scores) / len(option_scores), 4)
-            scores.append(av_score)
-        elif isinstance(sent, str):  # in case of full context
-            if ambiguous_positions:
-                matches = list(re.finditer(r"<\s.+?\s>", sent))
-                for match, pos in zip(matches[::-1], ambiguous_positions[::-1]):
-                    if not pos:
-                        sent = (
-                            sent[: match.span()[0]]
-                            + match.group().replace("< ", "").replace(" >", "")
-                            + sent[match.span()[1] :]
-                        )
-            scores.append(round(get_masked_score(sent, model, do_lower=do_lower)))
-        else:
-            raise ValueError()
-    return scores
+    texts = []
+    for sent in sentences:
+        matches = list(re.finditer(r"<\s.+?\s>", sent))
+        for match, pos in zip(matches[::-1], ambiguous_positions[::-1]):
+            if not pos:
+                sent = (
+                    sent[: match.span()[0]]
+                    + match.group().replace("< ", "").replace(" >", "")
+                    + sent[match.span()[1] :]
+                )
+        texts.append(sent)
+    return texts
 
 
 def find_diff(text, context_len=3):
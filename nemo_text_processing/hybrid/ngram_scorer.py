@@ -0,0 +1,196 @@
+# Copyright (c) 2024, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import math
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from nemo_text_processing.hybrid.scorer import Scorer
+
+__all__ = ['NGramScorer']
+
+BOS = "<s>"
+EOS = "</s>"
+UNK = "<unk>"
+# log10 probability of unknown words if the LM has no <unk> entry, the same as KenLM uses
+UNK_LOG10_PROB = -100.0
+
+
+class NGramScorer(Scorer):
+    """
+    Back-off n-gram LM scorer, a light alternative to MLMScorer for ranking normalization options.
+    N-grams of every order are kept in sorted arrays of word ids, all n-grams of a batch of sentences
+    are looked up at once with binary search.
+
+    Args:
+        lm_path: path to an LM in ARPA format (could be gzipped) or in the .npz format written by save()
+        do_lower: set to True to lower case sentences before scoring
+    """
+
+    # n-gram LMs score whole sentences, there is no mask
+    MASK_LABEL = None
+
+    def __init__(self, lm_path: str, do_lower: bool = False):
+        self.lm_path = lm_path
+        self.do_lower = do_lower
+        if lm_path.endswith(".npz"):
+            self._load_npz(lm_path)
+        else:
+            self._load_arpa(lm_path)
+        self.vocab = {word: i for i, word in enumerate(self.words)}
+        self.order = len(self.ngrams)
+        self._keys = [_as_keys(ngrams) for ngrams, _, _ in self.ngrams]
+
+    def score_sentences(self, sentences: List[str]) -> List[float]:
+        """
+        returns natural log probability of every sentence, including the end of sentence.
+        """
+        if len(sentences) == 0:
+            return []
+
+        unk_id = self.vocab[UNK]
+        ids = []
+        sentence_idx = []
+        starts = []
+        for i, sentence in enumerate(sentences):
+            sentence = sentence.lower() if self.do_lower else sentence
+            words = [BOS] + sentence.split() + [EOS]
+            starts.extend([len(ids)] * len(words))
+            sentence_idx.extend([i] * len(words))
+            ids.extend(self.vocab.get(word, unk_id) for word in words)
+        ids = np.array(ids, dtype=np.int32)
+        starts = np.array(starts)
+        sentence_idx = np.array(sentence_idx)
+
+        # every word except <s> is scored
+        positions = np.nonzero(np.arange(len(ids)) != starts)[0]
+        log_probs = np.zeros(len(positions), dtype=np.float64)
+        # order of the longest n-gram ending with the word that is found in the LM
+        found_order = np.zeros(len(positions), dtype=np.int64)
+        for n in range(1, self.order + 1):
+            found, values, _ = self._lookup(ids, starts, positions, n)
+            log_probs[found] = values[found]
+            found_order[found] = n
+
+        # back-off weights of the contexts that are longer than the longest found n-gram
+        for n in range(1, self.order):
+            found, _, backoffs = self._lookup(ids, starts, positions - 1, n)
+            use = found & (n >= found_order)
+            log_probs[use] += backoffs[use]
+
+        scores = np.zeros(len(sentences), dtype=np.float64)
+        np.add.at(scores, sentence_idx[positions], log_probs * math.log(10))
+        return scores.tolist()
+
+    def score_sentence(self, sentence: str) -> float:
+        """
+        returns natural log probability of the sentence.
+        """
+        return self.score_sentences([sentence])[0]
+
+    def save(self, path: str):
+        """
+        Saves the LM to a binary .npz file that loads faster than ARPA
+        """
+        arrays = {"words": np.array(self.words)}
+        for n, (ngrams, log_probs, backoffs) in enumerate(self.ngrams, start=1):
+            arrays[f"ngrams_{n}"] = ngrams
+            arrays[f"log_probs_{n}"] = log_probs
+            arrays[f"backoffs_{n}"] = backoffs
+        np.savez(path, **arrays)
+
+    def _lookup(
+        self, ids: np.ndarray, starts: np.ndarray, ends: np.ndarray, n: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Looks up n-grams that end at the given positions, n-grams can't cross sentence boundaries
+
+        Returns: mask of the found n-grams, their log10 probabilities and back-off weights
+        """
+        ngrams, log_probs, backoffs = self.ngrams[n - 1]
+        table_keys = self._keys[n - 1]
+        if len(ngrams) == 0:
+            return np.zeros(len(ends), dtype=bool), np.zeros(len(ends)), np.zeros(len(ends))
+
+        valid = ends - n + 1 >= starts[ends]
+        keys = _as_keys(ids[np.clip(ends[:, None] + np.arange(-n + 1, 1)[None, :], 0, None)])
+        idx = np.minimum(np.searchsorted(table_keys, keys), len(ngrams) - 1)
+        found = valid & (table_keys[idx] == keys)
+        return found, log_probs[idx].astype(np.float64), backoffs[idx].astype(np.float64)
+
+    def _load_arpa(self, path: str):
+        """
+        Reads n-grams from an ARPA file
+        """
+        open_fn = gzip.open if path.endswith(".gz") else open
+        entries: List[Dict[Tuple[str, ...], Tuple[float, float]]] = []
+        n = 0
+        with open_fn(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("ngram ") or line == "\\data\\":
+                    continue
+                if line == "\\end\\":
+                    break
+                if line.startswith("\\") and line.endswith("-grams:"):
+                    n = int(line[1 : -len("-grams:")])
+                    while len(entries) < n:
+                        entries.append({})
+                    continue
+                if n == 0:
+                    continue
+                parts = line.split()
+                backoff = float(parts[n + 1]) if len(parts) > n + 1 else 0.0
+                entries[n - 1][tuple(parts[1 : n + 1])] = (float(parts[0]), backoff)
+
+        if len(entries) == 0:
+            raise ValueError(f"No n-grams found in {path}")
+        if (UNK,) not in entries[0]:
+            entries[0][(UNK,)] = (UNK_LOG10_PROB, 0.0)
+
+        self.words = sorted(word for (word,) in entries[0])
+        vocab = {word: i for i, word in enumerate(self.words)}
+        self.ngrams = []
+        for n, order_entries in enumerate(entries, start=1):
+            ngrams = np.zeros((len(order_entries), n), dtype=np.int32)
+            log_probs = np.zeros(len(order_entries), dtype=np.float32)
+            backoffs = np.zeros(len(order_entries), dtype=np.float32)
+            for i, (ngram, (log_prob, backoff)) in enumerate(order_entries.items()):
+                ngrams[i] = [vocab[word] for word in ngram]
+                log_probs[i] = log_prob
+                backoffs[i] = backoff
+            order = np.argsort(_as_keys(ngrams), kind="stable")
+            self.ngrams.append((ngrams[order], log_probs[order], backoffs[order]))
+
+    def _load_npz(self, path: str):
+        """
+        Reads n-grams from a file written by save()
+        """
+        with np.load(path) as data:
+            self.words = data["words"].tolist()
+            self.ngrams = []
+            n = 1
+            while f"ngrams_{n}" in data:
+                self.ngrams.append((data[f"ngrams_{n}"], data[f"log_probs_{n}"], data[f"backoffs_{n}"]))
+                n += 1
+
+
+def _as_keys(rows: np.ndarray) -> np.ndarray:
+    """
+    returns rows of word ids as single comparable values, so that n-grams could be sorted and searched as scalars
+    """
+    rows = np.ascontiguousarray(rows, dtype=np.int32)
+    return rows.view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1]))).ravel()
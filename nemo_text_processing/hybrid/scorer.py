@@ -0,0 +1,35 @@
+# Copyright (c) 2024, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+__all__ = ['Scorer']
+
+
+class Scorer(ABC):
+    """
+    Interface of the models that rank normalization options, see model_utils.score_options().
+    MASK_LABEL is the mask token of masked LMs, None for models that score whole texts. Masked LMs score variants of
+    a text with all but one ambiguous semiotic span masked, other models score the text with all spans.
+    Scorers could also implement score_sentence_groups(groups, window) to score only the differing tokens of
+    alternative sentences, see MLMScorer.
+    """
+
+    MASK_LABEL: Optional[str] = None
+
+    @abstractmethod
+    def score_sentences(self, sentences: List[str]) -> List[float]:
+        """returns log probability of every sentence, higher is better"""
+        raise NotImplementedError
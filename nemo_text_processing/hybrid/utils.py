@@ -18,14 +18,15 @@ import difflib
 import json
 import logging
 import re
-import string
-from typing import List, Optional, Tuple, Union
+from collections import deque
+from typing import Iterator, List, Optional, Tuple, Union
 
 import pandas as pd
 import pynini
 from pynini.lib.rewrite import top_rewrite
 from tqdm import tqdm
 
+from nemo_text_processing.hybrid.wfst_options import remove_punctuation, remove_whitelist_boudaries
 from nemo_text_processing.inverse_text_normalization.en.taggers.cardinal import CardinalFst
 from nemo_text_processing.inverse_text_normalization.inverse_normalize import InverseNormalizer
 
@@ -39,19 +40,16 @@ cardinal_graph = (
 inverse_normalizer = InverseNormalizer()
 
 
-def load_data(input_fs: List[str]):
+def iter_data(input_fs: List[str]) -> Iterator[Tuple[str, List[str], List[int]]]:
     """
-    loads data from list of abs file paths
+    lazily loads data from list of abs file paths, see load_data()
     Returns:
-        inputs: List[str] list of abs file paths
-        targets: List[List[str]] list of targets, can contain multiple options for each target
-        sentences: List[List[str]] list of sentence options
-        labels: List[List[int]] list of labels (1,0)
+        generator of (input, list of sentence options, list of labels (1,0)) of every example
     """
-    inputs = []
-    sentences = []
+    # inputs and options are paired in order, so that inputs could be read ahead of their options
+    inputs = deque()
+    options = deque()
     cur_sentences = []
-    labels = []
     cur_labels = []
     for input_f in input_fs:
         if input_f.endswith(".json"):
@@ -60,11 +58,12 @@ def load_data(input_fs: List[str]):
                     line = json.loads(line)
                     try:
                         inputs.append(line['text'].strip())
-                        sentences.append([line['gt_normalized'].strip()])
-                        labels.append([1])
+                        options.append(([line['gt_normalized'].strip()], [1]))
                     except Exception as e:
                         print(e)
                         raise ValueError(f"Check format for line {line}")
+                    while inputs and options:
+                        yield (inputs.popleft(), *options.popleft())
         else:
             with open(input_f, "r") as f:
                 for line in f:
@@ -85,27 +84,39 @@ def load_data(input_fs: List[str]):
                             cur_sentences.append(sent)
                             cur_labels.append(0)
                     else:
-                        sentences.append(cur_sentences)
+                        options.append((cur_sentences, cur_labels))
                         cur_sentences = []
-                        labels.append(cur_labels)
                         cur_labels = []
+                        while inputs and options:
+                            yield (inputs.popleft(), *options.popleft())
 
     if len(cur_sentences) > 0:
+        options.append((cur_sentences, cur_labels))
+    while inputs and options:
+        yield (inputs.popleft(), *options.popleft())
+    assert len(inputs) == len(options) == 0
+
+
+def load_data(input_fs: List[str]):
+    """
+    loads data from list of abs file paths
+    Returns:
+        inputs: List[str] list of abs file paths
+        targets: List[List[str]] list of targets, can contain multiple options for each target
+        sentences: List[List[str]] list of sentence options
+        labels: List[List[int]] list of labels (1,0)
+    """
+    inputs = []
+    sentences = []
+    labels = []
+    for cur_input, cur_sentences, cur_labels in iter_data(input_fs):
+        inputs.append(cur_input)
         sentences.append(cur_sentences)
         labels.append(cur_labels)
-    assert len(inputs) == len(sentences)
     targets = [[x for i, x in enumerate(sents) if ls[i]] for (sents, ls) in zip(sentences, labels)]
     return inputs, targets, sentences, labels
 
 
-def remove_whitelist_boudaries(x):
-    # remove raw whitelist
-    x = re.sub(r"\|raw_start\|[^|]+\|raw_end\|", "", x)
-    # remove norm text boundaries
-    x = x.replace("|norm_start|", "").replace("|norm_end|", "")
-    return x
-
-
 def _clean_pre_norm_libritts(inputs: List[str], targets: List[List[str]]):
     """
     standardizes format of inputs and targets before being normalized, so more rules apply.
@@ -467,28 +478,6 @@ def clean_libri_tts(target: str):
     return target
 
 
-def remove_punctuation(text: str, remove_spaces=True, do_lower=True, lang="en", exclude=None):
-    """Removes punctuation (and optionally spaces) in text for better evaluation"""
-    all_punct_marks = string.punctuation
-
-    if exclude is not None:
-        for p in exclude:
-            all_punct_marks = all_punct_marks.replace(p, "")
-    text = re.sub("[" + all_punct_marks + "]", " ", text)
-
-    if lang == "en":
-        # remove things like \x94 and \x93
-        text = re.sub(r"[^\x00-\x7f]", r" ", text)
-
-    text = re.sub(r" +", " ", text)
-    if remove_spaces:
-        text = text.replace(" ", "").replace("\u00a0", "").strip()
-
-    if do_lower:
-        text = text.lower()
-    return text.strip()
-
-
 def get_alternative_label(pred: str, targets: List[str]) -> bool:
     """Returns true if prediction matches target options"""
 
@@ -14,19 +14,23 @@
 
 
 import argparse
+import hashlib
+import itertools
+import json
 import logging
+import math
 import os
-import pickle
 import re
 import shutil
-from typing import Dict, List
+import time
+from typing import Dict, Iterator, List, Optional
 
-import model_utils
 import pandas as pd
-import utils
 from joblib import Parallel, delayed
 from tqdm import tqdm
 
+from nemo_text_processing.hybrid import model_utils, utils
+from nemo_text_processing.hybrid.wfst_options import threshold, threshold_weights
 from nemo_text_processing.text_normalization.normalize_with_audio import NormalizerWithAudio
 
 parser = argparse.ArgumentParser(description="Re-scoring")
@@ -35,7 +39,12 @@ parser.add_argument("--n_tagged", default=100, type=int, help="Number WFST optio
 parser.add_argument("--context_len", default=-1, type=int, help="Context length, -1 to use full context")
 parser.add_argument("--threshold", default=0.2, type=float, help="delta threshold value")
 parser.add_argument("--overwrite_cache", action="store_true", help="overwrite cache")
-parser.add_argument("--model_name", type=str, default="bert-base-uncased")
+parser.add_argument(
+    "--model_name",
+    type=str,
+    default="bert-base-uncased",
+    help="Comma separated HuggingFace MLM names or n-gram LMs as ngram:<path to ARPA or .npz file>",
+)
 parser.add_argument("--cache_dir", default='cache', type=str, help="use cache dir")
 parser.add_argument(
     "--data",
@@ -47,138 +56,200 @@ parser.add_argument(
     "--models", default="mlm_bert-base-uncased", type=str, help="Comma separated string of model names"
 )
 parser.add_argument(
+    "--regenerate_wfst",
     "--regenerate_pkl",
+    dest="regenerate_wfst",
     action="store_true",
-    help="Set to True to re-create pickle file with WFST normalization options",
+    help="Set to True to re-create WFST normalization options and all the following stages",
+)
+parser.add_argument(
+    "--batch_size", default=200, type=int, help="Number of examples per shard, shards are processed in parallel"
+)
+parser.add_argument(
+    "--work_dir",
+    default=None,
+    type=str,
+    help="Directory for intermediate shards of every stage, finished shards are reused when the run is restarted. "
+    "Defaults to wfst_lm_rescoring_<data file name>_<n_tagged>",
+)
+parser.add_argument(
+    "--diff_window",
+    default=-1,
+    type=int,
+    help="Score only tokens that differ between WFST options and diff_window tokens around them, -1 to score all tokens",
+)
+parser.add_argument(
+    "--mlm_cache_path",
+    default=None,
+    type=str,
+    help="Path to a SQLite file to keep MLM scores of masked sentences between runs",
+)
+parser.add_argument(
+    "--mlm_batch_size", default=64, type=int, help="Number of masked sentences to score in one forward pass"
+)
+parser.add_argument(
+    "--prefilter_model",
+    default=None,
+    type=str,
+    help="Model to select options for --model_name models, e.g. an n-gram LM as ngram:<path to ARPA file>",
+)
+parser.add_argument(
+    "--prefilter_top_k", default=5, type=int, help="Number of options with the best prefilter scores to keep"
+)
+parser.add_argument(
+    "--mlm_backend", default="fp32", choices=model_utils.BACKENDS, help="Inference backend of the MLM models"
+)
+parser.add_argument("--mlm_num_threads", default=None, type=int, help="Number of threads for CPU inference")
+parser.add_argument(
+    "--check_parity",
+    action="store_true",
+    help="Compare the best options and scoring time of --mlm_backend models with the fp32 models",
 )
-parser.add_argument("--batch_size", default=200, type=int, help="Batch size for parallel processing")
 
 
-def rank(sentences: List[str], labels: List[int], models: Dict[str, 'Model'], context_len=None, do_lower=True):
+def rank(
+    sentences: List[str],
+    labels: List[int],
+    models: Dict[str, model_utils.Scorer],
+    context_len=None,
+    do_lower=True,
+    diff_window: int = -1,
+    prefilter: Optional[model_utils.Scorer] = None,
+    prefilter_top_k: int = 5,
+):
     """
-    computes scores for each sentences using all provided models and returns summary in data frame
+    computes scores for each sentences using all provided models and returns summary in data frame.
+    diff_window >= 0 scores only tokens that differ between the sentences and diff_window tokens around them.
+    If prefilter is set, e.g. to a cheap n-gram LM, only prefilter_top_k sentences with the best prefilter scores
+    are scored by the models, other sentences get infinite scores.
     """
     df = pd.DataFrame({"sent": sentences, "labels": labels})
+    candidates = list(range(len(sentences)))
+    if prefilter is not None and len(sentences) > prefilter_top_k:
+        prefilter_scores = model_utils.score_options(
+            sentences=sentences, context_len=context_len, model=prefilter, do_lower=do_lower
+        )
+        candidates = sorted(sorted(candidates, key=lambda i: prefilter_scores[i])[:prefilter_top_k])
+
     for model_name, model in models.items():
         scores = model_utils.score_options(
-            sentences=sentences, context_len=context_len, model=model, do_lower=do_lower
+            sentences=[sentences[i] for i in candidates],
+            context_len=context_len,
+            model=model,
+            do_lower=do_lower,
+            diff_window=diff_window,
         )
-        df[model_name] = scores
+        all_scores = [math.inf] * len(sentences)
+        for i, score in zip(candidates, scores):
+            all_scores[i] = score
+        df[model_name] = all_scores
     return df
 
 
-def threshold_weights(norm_texts_weights, delta: float = 0.2):
+def _rank_example(
+    example: Dict,
+    models: Dict[str, model_utils.Scorer],
+    context_len: Optional[int],
+    args: argparse.Namespace,
+    prefilter: Optional[model_utils.Scorer] = None,
+    reference_models: Optional[Dict[str, model_utils.Scorer]] = None,
+) -> Dict:
     """
-    norm_texts_weights: list of [ List[normalized options of input], list[weights] ]
-    delta: delta to add to minimum weight in options to compose upper limit for threshhold
-
-    returns:
-        filter list of same format as input
-    """
-    # threshold value is factor applied to lowest/first weight of all normalization options for every input
-    res = []
-    for i, options_weights in enumerate(norm_texts_weights):
-        thresh = options_weights[1][0] + delta  # minimum weight plus delta
-        item = [x for x in zip(*options_weights)]
-        # filters out all options for every input that is larger than threshold
-        res.append(list(filter(lambda x: x[1] < thresh, item)))
-
-    return [list(map(list, zip(*item))) for item in res]
-
+    ranks normalization options of a labeled example with every model and prints the examples with wrong predictions
 
-def _get_unchanged_count(text):
+    Returns: whether the predictions are correct, whether they match the fp32 models and the scoring time
     """
-    returns number of unchanged words in text
-    """
-    exclude = '#$%&<>'
+    assert len(example["options"]) == len(example["labels"])
+    rank_kwargs = {
+        "sentences": example["options"],
+        "labels": example["labels"],
+        "context_len": context_len,
+        "do_lower": True,
+        "diff_window": args.diff_window,
+        "prefilter": prefilter,
+        "prefilter_top_k": args.prefilter_top_k,
+    }
+    result = {"correct": {}, "parity": {}, "time": {}, "gt_in_options": 1 in example["labels"]}
+    start_time = time.perf_counter()
+    df = rank(models=models, **rank_kwargs)
+    result["time"][args.mlm_backend] = time.perf_counter() - start_time
+    if reference_models is not None:
+        start_time = time.perf_counter()
+        reference_df = rank(models=reference_models, **rank_kwargs)
+        result["time"]["fp32"] = time.perf_counter() - start_time
+        for model in models:
+            result["parity"][model] = int(df[model].idxmin() == reference_df[model].idxmin())
+    df['sent'] = df['sent'].apply(lambda x: utils.remove_whitelist_boudaries(x))
+    df["weights"] = example["weights"]
 
-    # remove normalized whitelist
-    text = re.sub(r"\|norm_start\|[^|]+\|norm_end\|", "", text)
-    # remove raw text boundaries
-    text = text.replace("|raw_start|", "").replace("|raw_end|", "")
+    do_print = False
 
-    start_pattern = "<"
-    end_pattern = ">"
+    for model in models:
+        # one hot vector for predictions, 1 for the best score option
+        df[f"{model}_pred"] = (df[model] == min(df[model])).astype(int)
+        # add constrain when multiple correct labels per example
+        pred_is_correct = min(sum((df["labels"] == df[f"{model}_pred"]) & df["labels"] == 1), 1)
 
-    text = utils.remove_punctuation(text, remove_spaces=False, do_lower=False, exclude=exclude)
-    text_clean = ""
-    for ch in text:
-        if ch.isalpha() or ch.isspace() or ch in [start_pattern, end_pattern]:
-            text_clean += ch
-        else:
-            text_clean += " " + ch + " "
+        if not pred_is_correct or logging.getLogger().level <= logging.DEBUG:
+            do_print = True
 
-    text = text_clean
-    unchanged_count = 0
-    skip = False
+        if do_print:
+            print(f"{model} prediction is correct: {pred_is_correct == 1}")
+        result["correct"][model] = int(pred_is_correct)
 
-    for word in text.split():
-        if start_pattern == word:
-            skip = True
-        elif end_pattern == word:
-            skip = False
-        elif not skip:
-            unchanged_count += 1
-    return unchanged_count
+    if do_print:
+        print(f"INPUT: {example['input']}")
+        print(f"GT   : {example['targets']}\n")
+        utils.print_df(df)
+        print("-" * 80 + "\n")
+    return result
 
 
-def _get_replacement_count(text):
+def _check_work_dir(work_dir: str, config: Dict):
     """
-    returns number of token replacements
+    creates work directory, shards of an existing directory are reused only if they were created with the same config
     """
-    start_pattern = "<"
-    end_pattern = ">"
-    return min(text.count(start_pattern), text.count(end_pattern))
+    config_f = os.path.join(work_dir, "config.json")
+    if os.path.exists(config_f):
+        with open(config_f, "r") as f:
+            existing = json.load(f)
+        if existing != config:
+            raise ValueError(
+                f"{work_dir} contains shards created with {existing}, current settings are {config}. "
+                f"Use --regenerate_wfst or another --work_dir"
+            )
+        return
+    os.makedirs(work_dir, exist_ok=True)
+    with open(config_f, "w") as f:
+        json.dump(config, f)
+
+
+def _write_jsonl(path: str, records: List[Dict]):
+    """
+    writes records to a JSONL file, the file appears only when all records are written
+    """
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(f"{path}.tmp", path)
 
 
-def threshold(norm_texts_weights, unchanged=True, replacement=True):
+def _read_jsonl(path: str) -> Iterator[Dict]:
     """
-    Reduces the number of WFST options based for LM rescoring.
+    reads records from a JSONL file one by one
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
 
-    Args:
-        :param norm_texts_weights: WFST options with associated weight
-        :param unchanged: set to True to filter out examples based on number of words left unchanged
-            (punct is not taken into account)
-        :param replacement: set to True to filter out examples based on number of replacements made
-            (Given A and B are WFST options, if the number of unchanged for A and B are the same,
-            the option with a smaller number of replacements is preferable (i.e., larger span)).
 
-    :return: WFST options with associated weight (reduced)
+def main(argv: Optional[List[str]] = None) -> bool:
     """
+    runs the evaluation with the command line arguments argv (sys.argv by default)
 
-    def __apply(norm_texts_weights, f, use_min=True):
-        inputs_filtered = []
-        for example in norm_texts_weights:
-            texts = example[0]
-            counts = [f(t) for t in texts]
-            [logging.debug(f"{c} -- {t}") for t, c in zip(texts, counts)]
-            target_count = min(counts) if use_min else max(counts)
-            filtered_texts = []
-            filtered_weights = []
-            for i, c in enumerate(counts):
-                if c == target_count:
-                    filtered_texts.append(example[0][i])
-                    filtered_weights.append(example[1][i])
-            inputs_filtered.append([filtered_texts, filtered_weights])
-        return inputs_filtered
-
-    logging.debug("BASIC THRESHOLDING INPUT:")
-    [logging.debug(x) for x in norm_texts_weights[0][0]]
-    if unchanged:
-        norm_texts_weights = __apply(norm_texts_weights, _get_unchanged_count)
-        logging.debug("AFTER UNCHANGED FILTER:")
-        [logging.debug(x) for x in norm_texts_weights[0][0]]
-
-    if replacement:
-        norm_texts_weights = __apply(norm_texts_weights, _get_replacement_count)
-        logging.debug("AFTER REPLACEMENT FILTER:")
-        [logging.debug(x) for x in norm_texts_weights[0][0]]
-
-    return norm_texts_weights
-
-
-def main():
-    args = parser.parse_args()
+    Returns: whether the best options of all models are correct for all examples
+    """
+    args = parser.parse_args(argv)
 
     logging.getLogger().setLevel(logging.INFO)
     lang = args.lang
@@ -194,139 +265,178 @@ def main():
         raise FileNotFoundError(f"{args.data} file not found")
 
     print("Create Masked Language Model...")
-    models = model_utils.init_models(model_name_list=args.model_name)
+    models = model_utils.init_models(
+        model_name_list=args.model_name,
+        batch_size=args.mlm_batch_size,
+        cache_path=args.mlm_cache_path,
+        backend=args.mlm_backend,
+        num_threads=args.mlm_num_threads,
+    )
+    prefilter = None
+    if args.prefilter_model is not None:
+        prefilter = model_utils.init_models(model_name_list=args.prefilter_model)[args.prefilter_model]
+    reference_models = None
+    if args.check_parity and args.mlm_backend != "fp32":
+        reference_models = model_utils.init_models(
+            model_name_list=args.model_name,
+            batch_size=args.mlm_batch_size,
+            cache_path=args.mlm_cache_path,
+            backend="fp32",
+            num_threads=args.mlm_num_threads,
+        )
     input_fs = input_f.split(",")
-    print("LOAD DATA...")
-    inputs, targets, _, _ = utils.load_data(input_fs)
-    pre_inputs, pre_targets = utils.clean_pre_norm(dataset=args.dataset, inputs=inputs, targets=targets)
+    context_len = args.context_len if args.context_len is not None and args.context_len >= 0 else None
+    work_dir = args.work_dir or f"wfst_lm_rescoring_{os.path.basename(args.data)}_{args.n_tagged}"
+    if args.regenerate_wfst and os.path.exists(work_dir):
+        shutil.rmtree(work_dir)
+    _check_work_dir(work_dir, {"data": args.data, "n_tagged": args.n_tagged, "batch_size": args.batch_size})
+
+    # every stage writes one JSONL file per shard, directories of the later stages depend on their settings
+    wfst_dir = os.path.join(work_dir, "wfst")
+    labeled_dir = os.path.join(work_dir, f"labeled_{args.threshold}")
+    rank_settings = {
+        k: getattr(args, k)
+        for k in [
+            "threshold",
+            "model_name",
+            "context_len",
+            "diff_window",
+            "prefilter_model",
+            "prefilter_top_k",
+            "mlm_backend",
+            "check_parity",
+        ]
+    }
+    ranked_dir = os.path.join(
+        work_dir, "ranked_" + hashlib.md5(json.dumps(rank_settings, sort_keys=True).encode()).hexdigest()[:8]
+    )
+    for dir_name in [wfst_dir, labeled_dir, ranked_dir]:
+        os.makedirs(dir_name, exist_ok=True)
 
     print("INIT WFST...")
     normalizer = NormalizerWithAudio(
         input_case="cased", lang=lang, cache_dir=args.cache_dir, lm=True, overwrite_cache=args.overwrite_cache
     )
 
-    print("APPLYING NORMALIZATION RULES...")
-    p_file = (
-        f"norm_texts_weights_{args.n_tagged}_{os.path.basename(args.data)}_{args.context_len}_{args.threshold}.pkl"
-    )
-
-    if not os.path.exists(p_file) or args.regenerate_pkl:
-        print(f"Creating WFST and saving to {p_file}")
+    def __process_shard(shard_idx, inputs, targets):
+        """WFST n-best, thresholding, post processing and labeling of a shard, finished stages are skipped"""
+        labeled_f = os.path.join(labeled_dir, f"{shard_idx:05}.jsonl")
+        if os.path.exists(labeled_f):
+            return shard_idx
 
-        def __process_batch(batch_idx, batch, dir_name):
-            normalized = []
-            for x in tqdm(batch):
+        pre_inputs, pre_targets = utils.clean_pre_norm(dataset=args.dataset, inputs=inputs, targets=targets)
+        wfst_f = os.path.join(wfst_dir, f"{shard_idx:05}.jsonl")
+        if os.path.exists(wfst_f):
+            norm_texts_weights = [[x["options"], x["weights"]] for x in _read_jsonl(wfst_f)]
+        else:
+            norm_texts_weights = []
+            for x in pre_inputs:
                 ns, ws = normalizer.normalize(x, n_tagged=args.n_tagged, punct_post_process=False)
                 ns = [re.sub(r"<(.+?)>", r"< \1 >", x) for x in ns]
-                normalized.append((ns, ws))
-            with open(f"{dir_name}/{batch_idx}.p", "wb") as handle:
-                pickle.dump(normalized, handle, protocol=pickle.HIGHEST_PROTOCOL)
-
-            print(f"Batch -- {batch_idx} -- is complete")
-            return batch_idx
+                norm_texts_weights.append([ns, [float(w) for w in ws]])
+            _write_jsonl(wfst_f, [{"options": ns, "weights": ws} for ns, ws in norm_texts_weights])
 
-        # to save intermediate results to a file
-        batch = min(len(pre_inputs), args.batch_size)
+        # apply weights threshold to reduce number of options
+        if args.threshold > 0:
+            norm_texts_weights = threshold_weights(norm_texts_weights, delta=args.threshold)
+        # reduce number of options by selecting options with the smallest number of unchanged words
+        norm_texts_weights = threshold(norm_texts_weights)
 
-        tmp_dir = f"/tmp/{os.path.basename(args.data)}"
-        if os.path.exists(tmp_dir):
-            shutil.rmtree(tmp_dir)
-        os.makedirs(tmp_dir, exist_ok=True)
-
-        batch_ids = Parallel(n_jobs=args.n_jobs)(
-            delayed(__process_batch)(idx, pre_inputs[i : i + batch], tmp_dir)
-            for idx, i in enumerate(range(0, len(pre_inputs), batch))
+        post_targets, post_norm_texts_weights = utils.clean_post_norm(
+            dataset=args.dataset, inputs=pre_inputs, targets=pre_targets, norm_texts=norm_texts_weights
         )
-
-        # aggregate all intermediate results
-        norm_texts_weights = []
-        for batch_id in batch_ids:
-            batch_f = f"{tmp_dir}/{batch_id}.p"
-            norm_texts_weights.extend(pickle.load(open(batch_f, "rb")))
-
-        with open(p_file, "wb") as handle:
-            pickle.dump(norm_texts_weights, handle, protocol=pickle.HIGHEST_PROTOCOL)
-    else:
-        print(f"Loading WFST from {p_file}")
-        norm_texts_weights = pickle.load(open(p_file, "rb"))
-
-    print("THRESHOLDING...")
-    # apply weights threshold to reduce number of options
-
-    if args.threshold > 0:
-        norm_texts_weights = threshold_weights(norm_texts_weights, delta=args.threshold)
-        logging.debug("AFTER WEIGHTS THRESHOLDING:")
-        [logging.debug(x) for x in norm_texts_weights[0][0]]
-
-    # reduce number of options by selecting options with the smallest number of unchanged words
-    norm_texts_weights = threshold(norm_texts_weights)
-
-    print("POST PROCESSING...")
-    post_targets, post_norm_texts_weights = utils.clean_post_norm(
-        dataset=args.dataset, inputs=pre_inputs, targets=pre_targets, norm_texts=norm_texts_weights
+        labels = utils.get_labels(targets=post_targets, norm_texts_weights=post_norm_texts_weights)
+        _write_jsonl(
+            labeled_f,
+            [
+                {"input": x, "targets": t, "options": nw[0], "weights": nw[1], "labels": l}
+                for x, t, nw, l in zip(pre_inputs, post_targets, post_norm_texts_weights, labels)
+            ],
+        )
+        print(f"Shard -- {shard_idx} -- is complete")
+        return shard_idx
+
+    def __iter_shards():
+        examples = utils.iter_data(input_fs)
+        for shard_idx in itertools.count():
+            shard = list(itertools.islice(examples, args.batch_size))
+            if len(shard) == 0:
+                break
+            inputs = [x for x, _, _ in shard]
+            targets = [[x for x, label in zip(sents, labels) if label] for _, sents, labels in shard]
+            yield shard_idx, inputs, targets
+
+    print("APPLYING NORMALIZATION RULES AND RANKING...")
+    # shards are normalized and labeled in parallel while finished shards are ranked in order
+    shard_ids = Parallel(n_jobs=args.n_jobs, return_as="generator")(
+        delayed(__process_shard)(*shard) for shard in __iter_shards()
     )
 
-    print("GETTING LABELS...")
-    labels = utils.get_labels(targets=post_targets, norm_texts_weights=post_norm_texts_weights)
-
-    examples_with_no_labels_among_wfst = [i for i, x in enumerate(labels) if 1 not in x]
-
-    print("GATHERING STATS...")
     model_stats = {m: 0 for m in models}
-    gt_in_options = 0
-    for i, example in tqdm(enumerate(zip(post_norm_texts_weights, labels))):
-        data, curr_labels = example
-        assert len(data[0]) == len(curr_labels)
-        df = rank(
-            sentences=data[0],
-            labels=curr_labels,
-            models=models,
-            context_len=args.context_len if args.context_len is not None and args.context_len >= 0 else None,
-            do_lower=True,
-        )
-        df['sent'] = df['sent'].apply(lambda x: utils.remove_whitelist_boudaries(x))
-        df["weights"] = data[1]
-
-        do_print = False
-
-        for model in models:
-            # one hot vector for predictions, 1 for the best score option
-            df[f"{model}_pred"] = (df[model] == min(df[model])).astype(int)
-            # add constrain when multiple correct labels per example
-            pred_is_correct = min(sum((df["labels"] == df[f"{model}_pred"]) & df["labels"] == 1), 1)
-
-            if not pred_is_correct or logging.getLogger().level <= logging.DEBUG:
-                do_print = True
-
-            if do_print:
-                print(f"{model} prediction is correct: {pred_is_correct == 1}")
-            model_stats[model] += pred_is_correct
-        gt_in_options += 1 in curr_labels
-
-        if do_print:
-            print(f"INPUT: {pre_inputs[i]}")
-            print(f"GT   : {post_targets[i]}\n")
-            utils.print_df(df)
-            print("-" * 80 + "\n")
-
-    if gt_in_options != len(post_norm_texts_weights):
+    # number of examples with the same best option as the fp32 model and scoring time of both backends
+    parity_stats = {m: 0 for m in models}
+    scoring_time = {args.mlm_backend: 0.0, "fp32": 0.0}
+    n_examples = 0
+    examples_with_no_labels_among_wfst = []
+    for shard_idx in shard_ids:
+        labeled_f = os.path.join(labeled_dir, f"{shard_idx:05}.jsonl")
+        ranked_f = os.path.join(ranked_dir, f"{shard_idx:05}.jsonl")
+        if os.path.exists(ranked_f):
+            ranked = list(_read_jsonl(ranked_f))
+        else:
+            ranked = []
+            for example in tqdm(_read_jsonl(labeled_f)):
+                ranked.append(
+                    _rank_example(
+                        example, models, context_len, args, prefilter=prefilter, reference_models=reference_models
+                    )
+                )
+            _write_jsonl(ranked_f, ranked)
+
+        for i, result in enumerate(ranked):
+            for model in models:
+                model_stats[model] += result["correct"][model]
+                parity_stats[model] += result["parity"].get(model, 0)
+            for backend, seconds in result["time"].items():
+                scoring_time[backend] += seconds
+            if not result["gt_in_options"]:
+                examples_with_no_labels_among_wfst.append((shard_idx, i))
+        n_examples += len(ranked)
+
+    if examples_with_no_labels_among_wfst:
         print("WFST options for some examples don't contain the ground truth:")
-        for i in examples_with_no_labels_among_wfst:
-            print(f"INPUT: {pre_inputs[i]}")
-            print(f"GT   : {post_targets[i]}\n")
-            print(f"WFST:")
-            for x in post_norm_texts_weights[i]:
-                print(x)
-            print("=" * 40)
+        for shard_idx, examples in itertools.groupby(examples_with_no_labels_among_wfst, key=lambda x: x[0]):
+            examples = set(i for _, i in examples)
+            for i, example in enumerate(_read_jsonl(os.path.join(labeled_dir, f"{shard_idx:05}.jsonl"))):
+                if i not in examples:
+                    continue
+                print(f"INPUT: {example['input']}")
+                print(f"GT   : {example['targets']}\n")
+                print(f"WFST:")
+                print(example["options"])
+                print(example["weights"])
+                print("=" * 40)
 
     all_correct = True
     for model, correct in model_stats.items():
-        print(
-            f"{model} -- correct: {correct}/{len(post_norm_texts_weights)} or ({round(correct/len(post_norm_texts_weights) * 100, 2)}%)"
-        )
-        all_correct = all_correct and (correct == len(post_norm_texts_weights))
+        print(f"{model} -- correct: {correct}/{n_examples} or ({round(correct/n_examples * 100, 2)}%)")
+        all_correct = all_correct and (correct == n_examples)
 
     print(f"examples_with_no_labels_among_wfst: {len(examples_with_no_labels_among_wfst)}")
+    if reference_models is not None:
+        for model, same in parity_stats.items():
+            print(
+                f"{model} -- {args.mlm_backend} and fp32 best options match: {same}/{n_examples} or ({round(same/n_examples * 100, 2)}%)"
+            )
+        print(
+            f"scoring time -- {args.mlm_backend}: {round(scoring_time[args.mlm_backend], 2)}s, fp32: {round(scoring_time['fp32'], 2)}s"
+        )
+    for model_name, model in models.items():
+        if not hasattr(model, "cache"):
+            continue
+        print(
+            f"{model_name} -- score cache hits: {model.cache.hits}, misses: {model.cache.misses}, hit rate: {round(model.cache.hit_rate * 100, 2)}%"
+        )
     return all_correct
 
 
@@ -0,0 +1,159 @@
+# Copyright (c) 2024, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import re
+import string
+
+__all__ = ['remove_punctuation', 'remove_whitelist_boudaries', 'threshold', 'threshold_weights']
+
+
+def remove_punctuation(text: str, remove_spaces=True, do_lower=True, lang="en", exclude=None):
+    """Removes punctuation (and optionally spaces) in text for better evaluation"""
+    all_punct_marks = string.punctuation
+
+    if exclude is not None:
+        for p in exclude:
+            all_punct_marks = all_punct_marks.replace(p, "")
+    text = re.sub("[" + all_punct_marks + "]", " ", text)
+
+    if lang == "en":
+        # remove things like \x94 and \x93
+        text = re.sub(r"[^\x00-\x7f]", r" ", text)
+
+    text = re.sub(r" +", " ", text)
+    if remove_spaces:
+        text = text.replace(" ", "").replace("\u00a0", "").strip()
+
+    if do_lower:
+        text = text.lower()
+    return text.strip()
+
+
+def remove_whitelist_boudaries(x):
+    # remove raw whitelist
+    x = re.sub(r"\|raw_start\|[^|]+\|raw_end\|", "", x)
+    # remove norm text boundaries
+    x = x.replace("|norm_start|", "").replace("|norm_end|", "")
+    return x
+
+
+def threshold_weights(norm_texts_weights, delta: float = 0.2):
+    """
+    norm_texts_weights: list of [ List[normalized options of input], list[weights] ]
+    delta: delta to add to minimum weight in options to compose upper limit for threshhold
+
+    returns:
+        filter list of same format as input
+    """
+    # threshold value is factor applied to lowest/first weight of all normalization options for every input
+    res = []
+    for i, options_weights in enumerate(norm_texts_weights):
+        thresh = options_weights[1][0] + delta  # minimum weight plus delta
+        item = [x for x in zip(*options_weights)]
+        # filters out all options for every input that is larger than threshold
+        res.append(list(filter(lambda x: x[1] < thresh, item)))
+
+    return [list(map(list, zip(*item))) for item in res]
+
+
+def _get_unchanged_count(text):
+    """
+    returns number of unchanged words in text
+    """
+    exclude = '#$%&<>'
+
+    # remove normalized whitelist
+    text = re.sub(r"\|norm_start\|[^|]+\|norm_end\|", "", text)
+    # remove raw text boundaries
+    text = text.replace("|raw_start|", "").replace("|raw_end|", "")
+
+    start_pattern = "<"
+    end_pattern = ">"
+
+    text = remove_punctuation(text, remove_spaces=False, do_lower=False, exclude=exclude)
+    text_clean = ""
+    for ch in text:
+        if ch.isalpha() or ch.isspace() or ch in [start_pattern, end_pattern]:
+            text_clean += ch
+        else:
+            text_clean += " " + ch + " "
+
+    text = text_clean
+    unchanged_count = 0
+    skip = False
+
+    for word in text.split():
+        if start_pattern == word:
+            skip = True
+        elif end_pattern == word:
+            skip = False
+        elif not skip:
+            unchanged_count += 1
+    return unchanged_count
+
+
+def _get_replacement_count(text):
+    """
+    returns number of token replacements
+    """
+    start_pattern = "<"
+    end_pattern = ">"
+    return min(text.count(start_pattern), text.count(end_pattern))
+
+
+def threshold(norm_texts_weights, unchanged=True, replacement=True):
+    """
+    Reduces the number of WFST options based for LM rescoring.
+
+    Args:
+        :param norm_texts_weights: WFST options with associated weight
+        :param unchanged: set to True to filter out examples based on number of words left unchanged
+            (punct is not taken into account)
+        :param replacement: set to True to filter out examples based on number of replacements made
+            (Given A and B are WFST options, if the number of unchanged for A and B are the same,
+            the option with a smaller number of replacements is preferable (i.e., larger span)).
+
+    :return: WFST options with associated weight (reduced)
+    """
+
+    def __apply(norm_texts_weights, f, use_min=True):
+        inputs_filtered = []
+        for example in norm_texts_weights:
+            texts = example[0]
+            counts = [f(t) for t in texts]
+            [logging.debug(f"{c} -- {t}") for t, c in zip(texts, counts)]
+            target_count = min(counts) if use_min else max(counts)
+            filtered_texts = []
+            filtered_weights = []
+            for i, c in enumerate(counts):
+                if c == target_count:
+                    filtered_texts.append(example[0][i])
+                    filtered_weights.append(example[1][i])
+            inputs_filtered.append([filtered_texts, filtered_weights])
+        return inputs_filtered
+
+    logging.debug("BASIC THRESHOLDING INPUT:")
+    [logging.debug(x) for x in norm_texts_weights[0][0]]
+    if unchanged:
+        norm_texts_weights = __apply(norm_texts_weights, _get_unchanged_count)
+        logging.debug("AFTER UNCHANGED FILTER:")
+        [logging.debug(x) for x in norm_texts_weights[0][0]]
+
+    if replacement:
+        norm_texts_weights = __apply(norm_texts_weights, _get_replacement_count)
+        logging.debug("AFTER REPLACEMENT FILTER:")
+        [logging.debug(x) for x in norm_texts_weights[0][0]]
+
+    return norm_texts_weights
@@ -14,6 +14,7 @@
 
 import os
 from argparse import ArgumentParser
+from collections import Counter
 from time import perf_counter
 from typing import List
 
@@ -155,6 +156,10 @@ class InverseNormalizer(Normalizer):
         self.verbalizer = VerbalizeFinalFst()
         self.parser = TokenParser()
         self.lang = lang
+        # the TN whitelist fast path does not apply to ITN
+        self.whitelist_lookup = {}
+        self.user_whitelist = None
+        self.stats = Counter()
         self.max_number_of_permutations_per_split = max_number_of_permutations_per_split
 
     def inverse_normalize_list(self, texts: List[str], verbose=False) -> List[str]:
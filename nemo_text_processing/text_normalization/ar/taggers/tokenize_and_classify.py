@@ -31,6 +31,7 @@ from nemo_text_processing.text_normalization.ar.taggers.fraction import Fraction
 from nemo_text_processing.text_normalization.ar.taggers.measure import MeasureFst
 from nemo_text_processing.text_normalization.ar.taggers.money import MoneyFst
 from nemo_text_processing.text_normalization.ar.taggers.word import WordFst
+from nemo_text_processing.text_normalization.en.graph_utils import get_whitelist_cache_key
 from nemo_text_processing.text_normalization.en.taggers.punctuation import PunctuationFst
 from nemo_text_processing.utils.logging import logger
 
@@ -62,7 +63,7 @@ class ClassifyFst(GraphFst):
         far_file = None
         if cache_dir is not None and cache_dir != "None":
             os.makedirs(cache_dir, exist_ok=True)
-            whitelist_file = os.path.basename(whitelist) if whitelist else ""
+            whitelist_file = get_whitelist_cache_key(whitelist)
             far_file = os.path.join(
                 cache_dir, f"_{input_case}_ar_tn_{deterministic}_deterministic{whitelist_file}.far"
             )
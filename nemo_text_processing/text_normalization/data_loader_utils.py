@@ -19,7 +19,8 @@ import string
 import sys
 import unicodedata
 from collections import defaultdict, namedtuple
-from typing import Dict, List, Optional, Set, Tuple
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
 from unicodedata import category
 
 from nemo_text_processing.utils.logging import logger
@@ -50,6 +51,15 @@ known_types = [
 ]
 
 
+@lru_cache(maxsize=1)
+def get_unicode_punctuation() -> FrozenSet[str]:
+    """
+    Returns all unicode punctuation marks (general category "P*"), used by post_process_punct(add_unicode_punct=True).
+    Computed on the first call, scanning all code points takes a noticeable time.
+    """
+    return frozenset(chr(i) for i in range(sys.maxunicode + 1) if category(chr(i)).startswith("P"))
+
+
 def _load_kaggle_text_norm_file(file_path: str, to_lower: bool) -> List[Instance]:
     """
     https://www.kaggle.com/richardwilliamsproat/text-normalization-for-english-russian-and-polish
@@ -308,54 +318,60 @@ def post_process_punct(input: str, normalized_text: str, add_unicode_punct: bool
         input = input.replace("``", '"')
     input = [x for x in input]
     normalized_text = [x for x in normalized_text]
-    punct_marks = [x for x in string.punctuation if x in input]
+    input_chars = set(input)
+    punct_marks = [x for x in string.punctuation if x in input_chars]
 
     if add_unicode_punct:
-        punct_unicode = [
-            chr(i)
-            for i in range(sys.maxunicode)
-            if category(chr(i)).startswith("P") and chr(i) not in punct_marks and chr(i) in input
-        ]
-        punct_marks = punct_marks.extend(punct_unicode)
+        unicode_punct = get_unicode_punctuation()
+        punct_unicode = sorted(x for x in input_chars if x in unicode_punct and x not in punct_marks)
+        punct_marks.extend(punct_unicode)
+
+    # positions of every punctuation mark in the input and in the normalized text, collected in a single pass
+    punct_set = set(punct_marks)
+    input_positions = defaultdict(list)
+    for idx, ch in enumerate(input):
+        if ch in punct_set:
+            input_positions[ch].append(idx)
+    normalized_positions = defaultdict(list)
+    for idx, ch in enumerate(normalized_text):
+        if ch in punct_set:
+            normalized_positions[ch].append(idx)
+
+    def _is_valid(idx_out, idx_in, normalized_text, input):
+        """Check if previous or next word match (for cases when punctuation marks are part of
+        semiotic token, i.e. some punctuation can be missing in the normalized text)"""
+        return (idx_out > 0 and idx_in > 0 and normalized_text[idx_out - 1] == input[idx_in - 1]) or (
+            idx_out < len(normalized_text) - 1
+            and idx_in < len(input) - 1
+            and normalized_text[idx_out + 1] == input[idx_in + 1]
+        )
 
     for punct in punct_marks:
-        try:
-            equal = True
-            if input.count(punct) != normalized_text.count(punct):
-                equal = False
-            idx_in, idx_out = 0, 0
-            while punct in input[idx_in:]:
-                idx_out = normalized_text.index(punct, idx_out)
-                idx_in = input.index(punct, idx_in)
-
-                def _is_valid(idx_out, idx_in, normalized_text, input):
-                    """Check if previous or next word match (for cases when punctuation marks are part of
-                    semiotic token, i.e. some punctuation can be missing in the normalized text)"""
-                    return (idx_out > 0 and idx_in > 0 and normalized_text[idx_out - 1] == input[idx_in - 1]) or (
-                        idx_out < len(normalized_text) - 1
-                        and idx_in < len(input) - 1
-                        and normalized_text[idx_out + 1] == input[idx_in + 1]
-                    )
-
-                if not equal and not _is_valid(idx_out, idx_in, normalized_text, input):
-                    idx_in += 1
-                    continue
-                if idx_in > 0 and idx_out > 0:
-                    if normalized_text[idx_out - 1] == " " and input[idx_in - 1] != " ":
-                        normalized_text[idx_out - 1] = ""
-
-                    elif normalized_text[idx_out - 1] != " " and input[idx_in - 1] == " ":
-                        normalized_text[idx_out - 1] += " "
-
-                if idx_in < len(input) - 1 and idx_out < len(normalized_text) - 1:
-                    if normalized_text[idx_out + 1] == " " and input[idx_in + 1] != " ":
-                        normalized_text[idx_out + 1] = ""
-                    elif normalized_text[idx_out + 1] != " " and input[idx_in + 1] == " ":
-                        normalized_text[idx_out] = normalized_text[idx_out] + " "
-                idx_out += 1
-                idx_in += 1
-        except:
-            logger.info(f"Skipping post-processing of {''.join(normalized_text)} for '{punct}'")
+        # marks that got a space attached while processing previous marks no longer match
+        out_positions = [idx for idx in normalized_positions[punct] if normalized_text[idx] == punct]
+        equal = len(input_positions[punct]) == len(out_positions)
+        out_pos_idx = 0
+        for idx_in in input_positions[punct]:
+            if out_pos_idx == len(out_positions):
+                logger.info(f"Skipping post-processing of {''.join(normalized_text)} for '{punct}'")
+                break
+            idx_out = out_positions[out_pos_idx]
+
+            if not equal and not _is_valid(idx_out, idx_in, normalized_text, input):
+                continue
+            if idx_in > 0 and idx_out > 0:
+                if normalized_text[idx_out - 1] == " " and input[idx_in - 1] != " ":
+                    normalized_text[idx_out - 1] = ""
+
+                elif normalized_text[idx_out - 1] != " " and input[idx_in - 1] == " ":
+                    normalized_text[idx_out - 1] += " "
+
+            if idx_in < len(input) - 1 and idx_out < len(normalized_text) - 1:
+                if normalized_text[idx_out + 1] == " " and input[idx_in + 1] != " ":
+                    normalized_text[idx_out + 1] = ""
+                elif normalized_text[idx_out + 1] != " " and input[idx_in + 1] == " ":
+                    normalized_text[idx_out] = normalized_text[idx_out] + " "
+            out_pos_idx += 1
 
     normalized_text = "".join(normalized_text)
     return re.sub(r' +', ' ', normalized_text)
@@ -0,0 +1,225 @@
+# Copyright (c) 2024, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from sacremoses import MosesDetokenizer
+from sacremoses.util import is_cjk
+
+from nemo_text_processing.utils.logging import logger
+
+# token classes, checked in the same order as in sacremoses.MosesDetokenizer
+CJK = 0
+CURRENCY = 1
+PUNCT = 2
+OPEN_QUOTE = 3
+WORD = 4
+
+# languages with Moses rules that are not re-implemented here, sacremoses is used for them
+MOSES_ONLY_LANGS = ["cs", "fi"]
+
+FR_PUNCT_WITH_SPACE = re.compile(r"^[\?\!\:\;\\\%]$")
+DOUBLE_QUOTES = re.compile(r"^[„“”]+$")
+XML_ESCAPES = [
+    ("&bar;", "|"),
+    ("&#124;", "|"),
+    ("&lt;", "<"),
+    ("&gt;", ">"),
+    ("&bra;", "["),
+    ("&ket;", "]"),
+    ("&quot;", '"'),
+    ("&apos;", "'"),
+    ("&#91;", "["),
+    ("&#93;", "]"),
+    ("&amp;", "&"),
+]
+
+
+class Detokenizer:
+    """
+    Detokenizer for the output of the TN verbalizers, produces the same output as sacremoses.MosesDetokenizer.
+    Classes of tokens are computed once per token and cached, the verbalizers produce mostly lower cased
+    ASCII words that are classified without any regular expression.
+
+    Args:
+        lang: language
+        cache_size: maximum number of detokenized texts to cache, set to 0 to disable caching
+        check_compatibility: set to True to compare every output with sacremoses.MosesDetokenizer output,
+            in case of a mismatch a warning is logged and sacremoses output is returned. Use for testing only.
+        max_token_cache_size: maximum number of token classes to cache
+    """
+
+    def __init__(
+        self,
+        lang: str = "en",
+        cache_size: int = 10000,
+        check_compatibility: bool = False,
+        max_token_cache_size: int = 100000,
+    ):
+        self.lang = lang
+        self.cache_size = cache_size
+        self.check_compatibility = check_compatibility
+        self.max_token_cache_size = max_token_cache_size
+        self.moses_detokenizer = MosesDetokenizer(lang=lang)
+        self._cache = OrderedDict()
+        self._token_cache = {}
+
+    def detokenize(self, text: str, unescape: bool = True) -> str:
+        """
+        Detokenizes text
+
+        Args:
+            text: tokenized text, e.g. normalized output
+            unescape: whether to unescape XML symbols, e.g. "&amp;" -> "&"
+
+        Returns: detokenized text
+        """
+        key = (text, unescape)
+        if self.cache_size > 0 and key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        if self.lang in MOSES_ONLY_LANGS:
+            output = self.moses_detokenizer.detokenize([text], unescape=unescape)
+        else:
+            output = self._detokenize(text, unescape=unescape)
+
+        if self.check_compatibility:
+            moses_output = self.moses_detokenizer.detokenize([text], unescape=unescape)
+            if output != moses_output:
+                logger.warning(f"Detokenizer mismatch for |{text}|: |{output}| != sacremoses: |{moses_output}|")
+                output = moses_output
+
+        if self.cache_size > 0:
+            self._cache[key] = output
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return output
+
+    def detokenize_batch(self, texts: List[str], unescape: bool = True) -> List[str]:
+        """
+        Detokenizes a list of texts, e.g. all normalization options of an input, every unique text is processed once
+
+        Args:
+            texts: list of tokenized texts
+            unescape: whether to unescape XML symbols, e.g. "&amp;" -> "&"
+
+        Returns: list of detokenized texts
+        """
+        outputs = {}
+        for text in texts:
+            if text not in outputs:
+                outputs[text] = self.detokenize(text, unescape=unescape)
+        return [outputs[text] for text in texts]
+
+    def _classify(self, token: str) -> Tuple[int, bool, bool, bool, bool]:
+        """
+        Returns token class, whether token is an English contraction, whether token is a French contraction,
+        whether token starts with a letter and whether the last character of the token is a CJK character
+        """
+        if token in self._token_cache:
+            return self._token_cache[token]
+
+        if token.isascii() and token.isalnum():
+            token_class = (WORD, False, False, token[0].isalpha(), False)
+        else:
+            if is_cjk(token[0]) and self.lang != "ko":
+                cls = CJK
+            elif MosesDetokenizer.IS_CURRENCY_SYMBOL.search(token):
+                cls = CURRENCY
+            elif MosesDetokenizer.IS_PUNCT.search(token):
+                cls = PUNCT
+            elif MosesDetokenizer.IS_OPEN_QUOTE.search(token):
+                cls = OPEN_QUOTE
+            else:
+                cls = WORD
+            token_class = (
+                cls,
+                bool(MosesDetokenizer.IS_ENGLISH_CONTRACTION.search(token)),
+                bool(MosesDetokenizer.IS_FRENCH_CONRTACTION.search(token)),
+                bool(MosesDetokenizer.STARTS_WITH_ALPHA.search(token)),
+                is_cjk(token[-1]),
+            )
+
+        if len(self._token_cache) >= self.max_token_cache_size:
+            self._token_cache.clear()
+        self._token_cache[token] = token_class
+        return token_class
+
+    def _detokenize(self, text: str, unescape: bool = True) -> str:
+        """
+        Port of sacremoses.MosesDetokenizer.detokenize() for a single input string
+        """
+        text = f" {text} ".replace(" @-@ ", "-")
+        if unescape and "&" in text:
+            for escaped, symbol in XML_ESCAPES:
+                text = text.replace(escaped, symbol)
+
+        tokens = text.split()
+        token_classes = [self._classify(token) for token in tokens]
+        quote_counts: Dict[str, int] = {}
+        prepend_space = " "
+        detokenized = []
+        for i, token in enumerate(tokens):
+            cls, en_contraction, fr_contraction, _, _ = token_classes[i]
+            if cls == CJK:
+                # left shift of consecutive CJK words
+                if i > 0 and token_classes[i - 1][4]:
+                    detokenized.append(token)
+                else:
+                    detokenized.append(prepend_space + token)
+                prepend_space = " "
+            elif cls == CURRENCY:
+                detokenized.append(prepend_space + token)
+                prepend_space = ""
+            elif cls == PUNCT:
+                # in French, these punctuation marks are prefixed with a non-breakable space
+                if self.lang == "fr" and FR_PUNCT_WITH_SPACE.search(token):
+                    detokenized.append(" ")
+                detokenized.append(token)
+                prepend_space = " "
+            elif self.lang == "en" and i > 0 and en_contraction:
+                detokenized.append(token)
+                prepend_space = " "
+            elif (
+                self.lang in ["fr", "it", "ga"] and i <= len(tokens) - 2 and fr_contraction and token_classes[i + 1][3]
+            ):
+                detokenized.append(prepend_space + token)
+                prepend_space = ""
+            elif cls == OPEN_QUOTE:
+                quote = '"' if DOUBLE_QUOTES.search(token) else token
+                count = quote_counts.get(quote, 0)
+                if count % 2 == 0:
+                    if self.lang == "en" and token == "'" and i > 0 and tokens[i - 1].endswith("s"):
+                        # left shift on single quote for possessives ending in "s", e.g. "The Jones' house"
+                        detokenized.append(token)
+                        prepend_space = " "
+                    else:
+                        detokenized.append(prepend_space + token)
+                        prepend_space = ""
+                        quote_counts[quote] = count + 1
+                else:
+                    detokenized.append(token)
+                    prepend_space = " "
+                    quote_counts[quote] = count + 1
+            else:
+                detokenized.append(prepend_space + token)
+                prepend_space = " "
+
+        detokenized = "".join(detokenized)
+        if "  " in detokenized:
+            detokenized = re.sub(r" {2,}", " ", detokenized)
+        return detokenized.strip()
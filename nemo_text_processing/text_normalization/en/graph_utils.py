@@ -13,6 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
 import os
 import string
 from pathlib import Path
@@ -186,6 +187,23 @@ def generator_main(file_name: str, graphs: Dict[str, "pynini.FstLike"]):
     logger.info(f"Created {file_name}")
 
 
+def get_whitelist_cache_key(whitelist: str = None) -> str:
+    """
+    Returns the part of the .far file name that identifies a user whitelist: file name and a hash of its content,
+    so that the cached grammars are not reused after the whitelist is edited.
+
+    Args:
+        whitelist: path to a file with whitelist replacements
+
+    Returns: cache key, empty string if whitelist is not provided
+    """
+    if not whitelist:
+        return ""
+    with open(whitelist, "rb") as f:
+        digest = hashlib.md5(f.read()).hexdigest()[:8]
+    return f"{os.path.basename(whitelist)}_{digest}"
+
+
 def get_plurals(fst):
     """
     Given singular returns plurals
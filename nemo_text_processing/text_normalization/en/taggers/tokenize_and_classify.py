@@ -24,6 +24,7 @@ from nemo_text_processing.text_normalization.en.graph_utils import (
     delete_extra_space,
     delete_space,
     generator_main,
+    get_whitelist_cache_key,
 )
 from nemo_text_processing.text_normalization.en.taggers.abbreviation import AbbreviationFst
 from nemo_text_processing.text_normalization.en.taggers.cardinal import CardinalFst
@@ -76,7 +77,7 @@ class ClassifyFst(GraphFst):
         far_file = None
         if cache_dir is not None and cache_dir != "None":
             os.makedirs(cache_dir, exist_ok=True)
-            whitelist_file = os.path.basename(whitelist) if whitelist else ""
+            whitelist_file = get_whitelist_cache_key(whitelist)
             far_file = os.path.join(
                 cache_dir,
                 f"en_tn_{deterministic}_deterministic_{input_case}_{whitelist_file}_tokenize.far",
@@ -28,6 +28,7 @@ from nemo_text_processing.text_normalization.en.graph_utils import (
     delete_extra_space,
     delete_space,
     generator_main,
+    get_whitelist_cache_key,
 )
 from nemo_text_processing.text_normalization.en.taggers.cardinal import CardinalFst
 from nemo_text_processing.text_normalization.en.taggers.date import DateFst
@@ -88,7 +89,7 @@ class ClassifyFst(GraphFst):
         far_file = None
         if cache_dir is not None and cache_dir != 'None':
             os.makedirs(cache_dir, exist_ok=True)
-            whitelist_file = os.path.basename(whitelist) if whitelist else ""
+            whitelist_file = get_whitelist_cache_key(whitelist)
             far_file = os.path.join(
                 cache_dir, f"_{input_case}_en_tn_{deterministic}_deterministic{whitelist_file}_lm.far"
             )
@@ -12,6 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import re
+from collections import Counter
+from typing import Dict
+
 import pynini
 from pynini.lib import pynutil
 
@@ -151,3 +155,28 @@ def get_formats(input_f, input_case=INPUT_CASED, is_default=True):
 
     multiple_formats = pynini.string_map(multiple_formats)
     return multiple_formats
+
+
+def get_whitelist_lookup(input_case: str, input_file: str = None) -> Dict[str, str]:
+    """
+    Returns exact-match whitelist entries of the deterministic WhiteListFst as a dictionary, it is built from the same
+    .tsv files as the grammar. Used to normalize whitelisted input without the tagger and verbalizer,
+    e.g. "Dr." -> "doctor". Keys with multiple replacements are left for the grammar to resolve.
+
+    Args:
+        input_case: accepting either "lower_cased" or "cased" input.
+        input_file: path to a file with whitelist replacements, replaces the default whitelist (same as in WhiteListFst)
+
+    Returns: dictionary from input to normalized form
+    """
+    if input_file:
+        whitelist = load_labels(input_file)
+    else:
+        whitelist = load_labels(get_abs_path("data/whitelist/tts.tsv"))
+        whitelist.extend(x for x in load_labels(get_abs_path("data/whitelist/symbol.tsv")) if x[0] != "/")
+
+    whitelist = [(x.lower() if input_case == INPUT_LOWER_CASED else x, y) for x, y, *_ in whitelist]
+    counts = Counter(x for x, _ in whitelist)
+    # upper case abbreviations with periods are also accepted by another branch of WhiteListFst, e.g. "A.B.C." -> "ABC"
+    abbreviation = re.compile(r"[A-Z](\.[A-Z]){2,}\.?|[A-Z](\. [A-Z]){2,}\.?")
+    return {x: y for x, y in whitelist if counts[x] == 1 and not abbreviation.fullmatch(x)}
@@ -17,20 +17,17 @@ import json
 import os
 import re
 import shutil
-import sys
 from argparse import ArgumentParser
-from collections import OrderedDict
+from collections import Counter, OrderedDict
 from glob import glob
 from math import factorial
 from time import perf_counter
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import pynini
-import regex
 import tqdm
 from joblib import Parallel, delayed
 from pynini.lib.rewrite import top_rewrite
-from sacremoses import MosesDetokenizer
 from tqdm import tqdm
 
 from nemo_text_processing.text_normalization.data_loader_utils import (
@@ -39,13 +36,13 @@ from nemo_text_processing.text_normalization.data_loader_utils import (
     pre_process,
     write_file,
 )
-from nemo_text_processing.text_normalization.preprocessing_utils import additional_split
+from nemo_text_processing.text_normalization.detokenizer import Detokenizer
+from nemo_text_processing.text_normalization.sentence_splitter import SentenceSplitter
+from nemo_text_processing.text_normalization.token_offsets import Span, get_shortest_path, get_token_spans, map_spans
 from nemo_text_processing.text_normalization.token_parser import PRESERVE_ORDER_KEY, TokenParser
+from nemo_text_processing.text_normalization.user_whitelist import UserWhitelist
 from nemo_text_processing.utils.logging import logger
 
-# this is to handle long input
-sys.setrecursionlimit(3000)
-
 SPACE_DUP = re.compile(' {2,}')
 
 
@@ -74,6 +71,11 @@ To integrate Normalizer in your script:
     >>> normalizer_en.normalize("<INPUT_TEXT>")
     # normalize list of entries
     >>> normalizer_en.normalize_list(["<INPUT_TEXT1>", "<INPUT_TEXT2>"])
+    # update whitelist replacements without rebuilding the grammars
+    >>> normalizer_en.load_user_whitelist(<PATH TO YOUR WHITELIST>)
+    # split long text (or a stream of text, e.g. an open file) into sentences and normalize them
+    >>> for normalized, start, end in normalizer_en.normalize_stream(open(<PATH TO .TXT FILE>), n_jobs=-1, batch_size=300):
+    ...     print(normalized, start, end)
     # normalize .json manifest entries
     >>> normalizer_en.normalize_manifest(manifest=<PATH TO INPUT .JSON MANIFEST>, n_jobs=-1, batch_size=300, 
                                         output_filename=<PATH TO OUTPUT .JSON MANIFEST>, text_field="text",
@@ -116,8 +118,15 @@ class Normalizer:
         assert input_case in ["lower_cased", "cased"]
 
         self.post_processor = None
+        # exact-match whitelist entries resolved before the tagger
+        self.whitelist_lookup = {}
+        # whitelist applied on top of the tagger, see load_user_whitelist()
+        self.user_whitelist = None
+        # number of grammar compositions skipped by the fast paths, reported by normalize_manifest()
+        self.stats = Counter()
 
         if lang == "en":
+            from nemo_text_processing.text_normalization.en.taggers.whitelist import get_whitelist_lookup
             from nemo_text_processing.text_normalization.en.verbalizers.post_processing import PostProcessingFst
             from nemo_text_processing.text_normalization.en.verbalizers.verbalize_final import VerbalizeFinalFst
 
@@ -126,6 +135,8 @@ class Normalizer:
 
             if deterministic:
                 from nemo_text_processing.text_normalization.en.taggers.tokenize_and_classify import ClassifyFst
+
+                self.whitelist_lookup = get_whitelist_lookup(input_case=input_case, input_file=whitelist)
             else:
                 if lm:
                     from nemo_text_processing.text_normalization.en.taggers.tokenize_and_classify_lm import ClassifyFst
@@ -209,7 +220,22 @@ class Normalizer:
         self.max_number_of_permutations_per_split = max_number_of_permutations_per_split
         self.parser = TokenParser()
         self.lang = lang
-        self.moses_detokenizer = MosesDetokenizer(lang=lang)
+        self.detokenizer = Detokenizer(lang=lang)
+        self.sentence_splitter = SentenceSplitter(lang=lang)
+
+    def load_user_whitelist(self, whitelist: Optional[str]):
+        """
+        Loads a user whitelist that is applied on top of the tagger grammar without rebuilding it.
+        The whitelist is replaced atomically, normalize() calls that are already running use the previous version.
+        User whitelist entries have priority over the grammar, including the whitelist passed to the constructor.
+
+        Args:
+            whitelist: path to a .tsv file with whitelist replacements, set to None to remove the user whitelist
+        """
+        user_whitelist = UserWhitelist(whitelist, input_case=self.input_case) if whitelist else None
+        self.user_whitelist = user_whitelist
+        if user_whitelist is not None:
+            logger.info(f"Loaded {len(user_whitelist)} user whitelist entries from {whitelist}")
 
     def normalize_list(
         self,
@@ -336,8 +362,13 @@ class Normalizer:
         return splits
 
     def normalize(
-        self, text: str, verbose: bool = False, punct_pre_process: bool = False, punct_post_process: bool = False
-    ) -> str:
+        self,
+        text: str,
+        verbose: bool = False,
+        punct_pre_process: bool = False,
+        punct_post_process: bool = False,
+        return_offsets: bool = False,
+    ) -> Union[str, Tuple[str, List[Tuple[Span, Span]]]]:
         """
         Main function. Normalizes tokens from written to spoken form
             e.g. 12 kg -> twelve kilograms
@@ -347,8 +378,11 @@ class Normalizer:
             punct_pre_process: whether to perform punctuation pre-processing, for example, [25] -> [ 25 ]
             punct_post_process: whether to normalize punctuation
             verbose: whether to print intermediate meta information
+            return_offsets: set to True to also return character spans of every token in the input and in the output.
+                Spans are derived from the shortest paths of the tagger and the verbalizer.
+                e.g. "costs $5" -> ("costs five dollars", [((0, 5), (0, 5)), ((6, 8), (6, 18))])
 
-        Returns: spoken form
+        Returns: spoken form, and (input span, output span) of every token if return_offsets is True
         """
         logger.setLevel('DEBUG' if verbose else 'INFO')
         if len(text.split()) > 500:
@@ -362,43 +396,100 @@ class Normalizer:
         text = text.strip()
         if not text:
             logger.debug(text)
-            return text
-        text = pynini.escape(text)
-        tagged_lattice = self.find_tags(text)
-        tagged_text = Normalizer.select_tag(tagged_lattice)
-        logger.debug(tagged_text)
-
-        self.parser(tagged_text)
-        tokens = self.parser.parse()
-        split_tokens = self._split_tokens_to_reduce_number_of_permutations(tokens)
-        output = ""
-        for s in split_tokens:
-            try:
-                tags_reordered = self.generate_permutations(s)
-                verbalizer_lattice = None
-                for tagged_text in tags_reordered:
-                    tagged_text = pynini.escape(tagged_text)
-
-                    verbalizer_lattice = self.find_verbalizer(tagged_text)
-                    if verbalizer_lattice.num_states() != 0:
-                        break
-                if verbalizer_lattice is None:
-                    logger.warning(f"No permutations were generated from tokens {s}")
-                    return text
-                output += ' ' + Normalizer.select_verbalizer(verbalizer_lattice)
-            except Exception as e:
-                logger.warning("Failed text: " + text + str(e))
-                return text
-        output = SPACE_DUP.sub(' ', output[1:])
+            return (text, []) if return_offsets else text
+        unescaped_text = text
+        # spans of every token in unescaped_text and in the output, None if tokens are not aligned
+        input_spans, output_spans = None, None
+        # the user whitelist could be replaced while normalization is running, use the same version for the whole text
+        user_whitelist = self.user_whitelist
+        if user_whitelist is not None and not user_whitelist.is_matched(text):
+            user_whitelist = None
+
+        if user_whitelist is None and text in self.whitelist_lookup:
+            # whitelisted input is normalized without the tagger and the verbalizer
+            output = SPACE_DUP.sub(' ', self.whitelist_lookup[text])
+            logger.debug(f"whitelist: {output}")
+            self.stats["whitelist_lookups"] += 1
+        else:
+            if user_whitelist is None:
+                text = pynini.escape(text)
+                tagged_lattice = self.find_tags(text)
+                if return_offsets:
+                    tagged_text, tagger_labels = get_shortest_path(tagged_lattice)
+                else:
+                    tagged_text = Normalizer.select_tag(tagged_lattice)
+            else:
+                tagged_text = user_whitelist.tag(
+                    text, lambda x: Normalizer.select_tag(self.find_tags(pynini.escape(x)))
+                )
+                text = pynini.escape(text)
+            logger.debug(tagged_text)
+
+            self.parser(tagged_text)
+            tokens = self.parser.parse()
+            if return_offsets and user_whitelist is None:
+                # labels of the path are characters of the unescaped text
+                input_spans = get_token_spans(
+                    unescaped_text, tagger_labels, tagged_text, len(tokens), tokens_on_input=False
+                )
+            split_tokens = self._split_tokens_to_reduce_number_of_permutations(tokens)
+            output = ""
+            verbalized_spans = []
+            for s in split_tokens:
+                try:
+                    tags_reordered = self.generate_permutations(s)
+                    verbalizer_lattice = None
+                    for unescaped_tagged_text in tags_reordered:
+                        tagged_text = pynini.escape(unescaped_tagged_text)
+
+                        verbalizer_lattice = self.find_verbalizer(tagged_text)
+                        if verbalizer_lattice.num_states() != 0:
+                            break
+                    if verbalizer_lattice is None:
+                        logger.warning(f"No permutations were generated from tokens {s}")
+                        return (text, []) if return_offsets else text
+                    if input_spans is None:
+                        verbalized = Normalizer.select_verbalizer(verbalizer_lattice)
+                    else:
+                        verbalized, verbalizer_labels = get_shortest_path(verbalizer_lattice)
+                        split_spans = get_token_spans(
+                            verbalized, verbalizer_labels, unescaped_tagged_text, len(s), tokens_on_input=True
+                        )
+                        if split_spans is None:
+                            input_spans = None
+                        else:
+                            # the output starts after a space that is removed below
+                            shift = len(output)
+                            verbalized_spans.extend((start + shift, end + shift) for start, end in split_spans)
+                    output += ' ' + verbalized
+                except Exception as e:
+                    logger.warning("Failed text: " + text + str(e))
+                    return (text, []) if return_offsets else text
+            if input_spans is not None:
+                output_spans = map_spans(output[1:], SPACE_DUP.sub(' ', output[1:]), verbalized_spans)
+            output = SPACE_DUP.sub(' ', output[1:])
 
         if self.lang in ["en", "hi", "vi"] and hasattr(self, 'post_processor') and self.post_processor is not None:
-            output = self.post_process(output)
+            post_processed = self.post_process(output)
+            if output_spans is not None:
+                output_spans = map_spans(output, post_processed, output_spans)
+            output = post_processed
 
         if punct_post_process:
-            # do post-processing based on Moses detokenizer
-            output = self.moses_detokenizer.detokenize([output], unescape=False)
-            output = post_process_punct(input=original_text, normalized_text=output)
-        return output
+            # do post-processing based on Moses detokenizer rules
+            detokenized = self.detokenizer.detokenize(output, unescape=False)
+            detokenized = post_process_punct(input=original_text, normalized_text=detokenized)
+            if output_spans is not None:
+                output_spans = map_spans(output, detokenized, output_spans)
+            output = detokenized
+
+        if not return_offsets:
+            return output
+        if output_spans is None:
+            # e.g. whitelisted input, only the whole text is aligned
+            return output, [((0, len(original_text)), (0, len(output)))]
+        input_spans = map_spans(unescaped_text, original_text, input_spans)
+        return output, list(zip(input_spans, output_spans))
 
     def normalize_line(
         self,
@@ -478,7 +569,10 @@ class Normalizer:
                 batch: list of texts
                 batch_idx: batch index
                 dir_name: path to output directory to save results
+
+            Returns: stats collected while processing the batch
             """
+            stats_start = self.stats.copy()
             normalized_lines = [
                 self.normalize_line(
                     line=line,
@@ -502,6 +596,7 @@ class Normalizer:
                     f_out.write(json.dumps(line, ensure_ascii=False) + '\n')
 
             logger.info(f"Batch -- {batch_idx} -- is complete")
+            return self.stats - stats_start
 
         if output_filename is None:
             output_filename = manifest.replace('.json', '_normalized.json')
@@ -519,7 +614,8 @@ class Normalizer:
             shutil.rmtree(tmp_dir)
         os.makedirs(tmp_dir)
 
-        Parallel(n_jobs=n_jobs)(
+        stats_start = self.stats.copy()
+        batch_stats = Parallel(n_jobs=n_jobs)(
             delayed(_process_batch)(
                 idx,
                 lines[i : i + batch],
@@ -540,42 +636,86 @@ class Normalizer:
                     lines = f_in.read()
                     f_out.write(lines)
 
+        # batches processed in other processes do not update self.stats
+        manifest_stats = sum(batch_stats, Counter())
+        self.stats = stats_start + manifest_stats
+        if manifest_stats:
+            logger.info(f"Grammar compositions skipped: {dict(manifest_stats)}")
         logger.warning(f'Normalized version saved at {output_filename}')
 
-    def split_text_into_sentences(self, text: str, additional_split_symbols: str = "") -> List[str]:
+    def normalize_stream(
+        self,
+        text: Union[str, Iterable[str]],
+        verbose: bool = False,
+        punct_pre_process: bool = False,
+        punct_post_process: bool = False,
+        additional_split_symbols: str = "",
+        batch_size: int = 1,
+        n_jobs: int = 1,
+        **kwargs,
+    ) -> Iterator[Tuple[str, int, int]]:
         r"""
-        Split text into sentences.
+        Splits text into sentences and normalizes them in a single streaming pass, e.g. to normalize a book
+        without loading it into memory. Sentences are normalized in batches by a pool of workers,
+        the output order matches the input.
 
         Args:
-            text: text
+            text: text or iterable of text chunks, e.g. an open text file
+            verbose: whether to print intermediate meta information
+            punct_pre_process: whether to do punctuation pre-processing
+            punct_post_process: whether to do punctuation post-processing
             additional_split_symbols: Symbols to split sentences if eos sentence split resulted in a long sequence.
                 Use '|' as a separator between symbols, for example: ';|:'. Use '\s' to split by space.
+            batch_size: Number of sentences for each process
+            n_jobs: the maximum number of concurrently running jobs. If -1 all CPUs are used. If 1 is given,
+                no parallel computing code is used at all, which is useful for debugging. For n_jobs below -1,
+                (n_cpus + 1 + n_jobs) are used. Thus for n_jobs = -2, all CPUs but one are used.
 
-        Returns list of sentences
+        Returns normalized sentences with start (inclusive) and end (exclusive) character offsets of
+            the corresponding input sentences
         """
-        lower_case_unicode = ""
-        upper_case_unicode = ""
 
-        if self.lang == "ru":
-            lower_case_unicode = '\u0430-\u04ff'
-            upper_case_unicode = '\u0410-\u042f'
+        def _process_batch(batch, verbose, punct_pre_process, punct_post_process, **kwargs):
+            """
+            Normalizes batch of sentences with their offsets
+            """
+            return [
+                (
+                    self.normalize(
+                        sentence,
+                        verbose=verbose,
+                        punct_pre_process=punct_pre_process,
+                        punct_post_process=punct_post_process,
+                        **kwargs,
+                    ),
+                    start,
+                    end,
+                )
+                for sentence, start, end in batch
+            ]
+
+        sentences = self.sentence_splitter.iter_sentences(text, additional_split_symbols)
+        batches = iter(lambda: list(itertools.islice(sentences, batch_size)), [])
 
-        # end of quoted speech - to be able to split sentences by full stop
-        text = re.sub(r"([\.\?\!])([\"\'])", r"\g<2>\g<1> ", text)
+        normalized_batches = Parallel(n_jobs=n_jobs, return_as="generator")(
+            delayed(_process_batch)(batch, verbose, punct_pre_process, punct_post_process, **kwargs)
+            for batch in batches
+        )
+        for normalized_batch in normalized_batches:
+            yield from normalized_batch
 
-        # remove extra space
-        text = re.sub(r" +", " ", text)
+    def split_text_into_sentences(self, text: str, additional_split_symbols: str = "") -> List[str]:
+        r"""
+        Split text into sentences.
 
-        # remove space in the middle of the lower case abbreviation to avoid splitting into separate sentences
-        matches = re.findall(rf"[a-z{lower_case_unicode}]\.\s[a-z{lower_case_unicode}]\.", text)
-        for match in matches:
-            text = text.replace(match, match.replace(". ", "."))
+        Args:
+            text: text
+            additional_split_symbols: Symbols to split sentences if eos sentence split resulted in a long sequence.
+                Use '|' as a separator between symbols, for example: ';|:'. Use '\s' to split by space.
 
-        # Read and split transcript by utterance (roughly, sentences)
-        split_pattern = rf"(?<!\w\.\w.)(?<![A-Z{upper_case_unicode}][a-z{lower_case_unicode}]+\.)(?<![A-Z{upper_case_unicode}]\.)(?<=\.|\?|\!|\.”|\?”\!”)\s(?![0-9]+[a-z]*\.)"
-        sentences = regex.split(split_pattern, text)
-        sentences = additional_split(sentences, additional_split_symbols)
-        return sentences
+        Returns list of sentences
+        """
+        return self.sentence_splitter.split(text, additional_split_symbols)
 
     def _permute(self, d: OrderedDict) -> List[str]:
         """
@@ -586,55 +726,88 @@ class Normalizer:
 
         Return permutations of different string serializations of key value pairs
         """
-        l = []
-        if PRESERVE_ORDER_KEY in d.keys():
-            d_permutations = [d.items()]
-        else:
-            d_permutations = itertools.permutations(d.items())
-        for perm in d_permutations:
-            subl = [""]
-            for k, v in perm:
-                if isinstance(v, str):
-                    subl = ["".join(x) for x in itertools.product(subl, [f"{k}: \"{v}\" "])]
-                elif isinstance(v, OrderedDict):
-                    rec = self._permute(v)
-                    subl = ["".join(x) for x in itertools.product(subl, [f" {k} {{ "], rec, [f" }} "])]
-                elif isinstance(v, bool):
-                    subl = ["".join(x) for x in itertools.product(subl, [f"{k}: true "])]
-                else:
-                    raise ValueError("Key: " + str(k) + " Value: " + str(v))
-            l.extend(subl)
-        return l
+        return list(self._serialize([d]))
 
-    def generate_permutations(self, tokens: List[dict]):
+    @staticmethod
+    def _expand(items: Tuple, rest: Optional[Tuple]) -> Optional[Tuple]:
         """
-        Generates permutations of string serializations of list of dictionaries
+        Prepends serialization pieces of ordered key value pairs to a linked list of pending pieces.
+        Strings are literal pieces, dictionaries are nested tokens whose reorderings are not yet chosen.
 
         Args:
-            tokens: list of dictionaries
+            items: ordered key value pairs of a dictionary
+            rest: linked list of pending pieces as (head, tail) tuples, None is the empty list
 
-        Returns string serialization of list of dictionaries
+        Returns linked list of pending pieces
         """
+        for k, v in reversed(items):
+            if isinstance(v, str):
+                rest = (f"{k}: \"{v}\" ", rest)
+            elif isinstance(v, OrderedDict):
+                rest = (f" {k} {{ ", (v, (" } ", rest)))
+            elif isinstance(v, bool):
+                rest = (f"{k}: true ", rest)
+            else:
+                raise ValueError("Key: " + str(k) + " Value: " + str(v))
+        return rest
 
-        def _helper(prefix: str, token_list: List[dict], idx: int):
-            """
-            Generates permutations of string serializations of given dictionary
+    def _serialize(self, tokens: List[dict]) -> Iterator[str]:
+        """
+        Lazily generates string serializations of all reorderings of a list of (nested) dictionaries.
+        Depth-first search with an explicit stack: every open dictionary keeps an iterator over its reorderings,
+        the pieces of the current serialization are kept in a single buffer, so that common prefixes are shared
+        and memory grows linearly with the number of tokens.
 
-            Args:
-                token_list: list of dictionaries
-                prefix: prefix string
-                idx:    index of next dictionary
+        Args:
+            tokens: list of dictionaries
 
-            Returns string serialization of dictionary
-            """
-            if idx == len(token_list):
-                yield prefix
+        Returns string serializations
+        """
+        buffer = []
+        stack = []
+        pending = None
+        for token in reversed(tokens):
+            pending = (token, pending)
+
+        while True:
+            # consume literal pieces until the next dictionary or the end of the serialization
+            while pending is not None:
+                piece, pending = pending
+                if isinstance(piece, str):
+                    buffer.append(piece)
+                    continue
+                if PRESERVE_ORDER_KEY in piece.keys():
+                    reorderings = iter([tuple(piece.items())])
+                else:
+                    reorderings = itertools.permutations(piece.items())
+                stack.append((reorderings, pending, len(buffer)))
+                break
+            else:
+                yield "".join(buffer)
+
+            # backtrack to the innermost dictionary with a reordering left
+            while stack:
+                reorderings, rest, prefix_len = stack[-1]
+                items = next(reorderings, None)
+                if items is None:
+                    stack.pop()
+                    continue
+                del buffer[prefix_len:]
+                pending = self._expand(items, rest)
+                break
+            else:
                 return
-            token_options = self._permute(token_list[idx])
-            for token_option in token_options:
-                yield from _helper(prefix + token_option, token_list, idx + 1)
 
-        return _helper("", tokens, 0)
+    def generate_permutations(self, tokens: List[dict]) -> Iterator[str]:
+        """
+        Generates permutations of string serializations of list of dictionaries
+
+        Args:
+            tokens: list of dictionaries
+
+        Returns string serialization of list of dictionaries
+        """
+        return self._serialize(tokens)
 
     def find_tags(self, text: str) -> 'pynini.FstLike':
         """
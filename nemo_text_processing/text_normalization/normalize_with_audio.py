@@ -12,19 +12,26 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
+import itertools
 import json
 import os
+import shutil
 from argparse import ArgumentParser
+from collections import Counter
+from glob import glob
 from time import perf_counter
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
-import editdistance
 import pynini
+from joblib import Parallel, delayed
 from pynini.lib import rewrite
 
+from nemo_text_processing.package_info import __version__
 from nemo_text_processing.text_normalization.data_loader_utils import post_process_punct, pre_process
 from nemo_text_processing.text_normalization.normalize import Normalizer
-from nemo_text_processing.text_normalization.utils_audio_based import get_alignment
+from nemo_text_processing.text_normalization.utils_audio_based import CERScorer, get_alignment
+from nemo_text_processing.utils.cache import PersistentCache
 from nemo_text_processing.utils.logging import logger
 
 """
@@ -48,6 +55,10 @@ To run this script with a .json manifest file, the manifest file should contain
             --batch_size=300 \
             --manifest_text_field="text"
 
+    The manifest is normalized in shards of --batch_size lines. Finished shards are saved to --checkpoint_dir,
+    re-run the same command to resume an interrupted run. Per-shard throughput and CER are saved to
+    <OUTPUT FILENAME>_stats.jsonl.
+
 To see possible normalization options for a text input without an audio file (could be used for debugging), run:
     python python normalize_with_audio.py --text "RAW TEXT"
 
@@ -70,6 +81,11 @@ class NormalizerWithAudio(Normalizer):
             Note: punct_post_process flag in normalize() supports all languages.
         max_number_of_permutations_per_split: a maximum number
                 of permutations which can be generated from input sequence of tokens.
+        options_cache_size: maximum number of inputs to cache non-deterministic normalization options for in memory,
+            e.g. to normalize repeated semiotic spans of a manifest once. Set to 0 to disable in-memory caching.
+        options_cache_path: path to a SQLite file to cache non-deterministic normalization options on disk, the file
+            is shared by the workers of normalize_manifest() and could be reused between runs, the entries are
+            keyed by the grammar fingerprint. Set to None to cache options only in memory.
     """
 
     def __init__(
@@ -82,6 +98,8 @@ class NormalizerWithAudio(Normalizer):
         lm: bool = False,
         post_process: bool = True,
         max_number_of_permutations_per_split: int = 729,
+        options_cache_size: int = 10000,
+        options_cache_path: Optional[str] = None,
     ):
 
         # initialize non-deterministic normalizer
@@ -114,6 +132,27 @@ class NormalizerWithAudio(Normalizer):
         else:
             self.tagger, self.verbalizer = None, None
         self.lm = lm
+        self.options_cache = PersistentCache(max_size=options_cache_size, path=options_cache_path, namespace="options")
+        self._grammar_fingerprint = None
+
+    @property
+    def grammar_fingerprint(self) -> str:
+        """
+        Returns hash of the non-deterministic grammars, used to invalidate options cached on disk after the grammars
+        are changed, e.g. with a different whitelist
+        """
+        if self._grammar_fingerprint is None:
+            md5 = hashlib.md5(f"{__version__}_{self.lang}_{self.input_case}_{self.lm}".encode())
+            for fst in [
+                self.tagger_non_deterministic.fst,
+                getattr(self.tagger_non_deterministic, "fst_no_digits", None),
+                self.verbalizer_non_deterministic.fst,
+                self.post_processor.fst if self.post_processor is not None else None,
+            ]:
+                if fst is not None:
+                    md5.update(fst.write_to_string())
+            self._grammar_fingerprint = md5.hexdigest()
+        return self._grammar_fingerprint
 
     def normalize(
         self,
@@ -123,6 +162,9 @@ class NormalizerWithAudio(Normalizer):
         verbose: bool = False,
         pred_text: Optional[str] = None,
         cer_threshold: float = -1,
+        deterministic_cer_threshold: float = 0,
+        prune_weight: float = -1,
+        max_options: int = -1,
         **kwargs,
     ) -> str:
         """
@@ -138,13 +180,25 @@ class NormalizerWithAudio(Normalizer):
             cer_threshold: if CER for pred_text and the normalization option is above the cer_threshold,
                 default deterministic normalization will be used. Set to -1 to disable cer-based filtering.
                 Specify the value in %, e.g. 100 not 1.
+            deterministic_cer_threshold: if CER for pred_text and the deterministic normalization of a semiotic span
+                is at or below the deterministic_cer_threshold, the deterministic normalization is used without
+                generating other options. Set to -1 to always generate all options. Specify the value in %.
+            prune_weight: tagged options with weight above the weight of the best option plus prune_weight
+                are discarded before verbalization. Set to -1 to disable pruning.
+            max_options: maximum number of normalization options to generate for the whole sentence, the budget is
+                shared between the semiotic spans. Set to -1 for no limit.
 
         Returns:
             normalized text options (usually there are multiple ways of normalizing a given semiotic class)
         """
         if pred_text is None or pred_text == "" or self.tagger is None:
             return self.normalize_non_deterministic(
-                text=text, n_tagged=n_tagged, punct_post_process=punct_post_process, verbose=verbose
+                text=text,
+                n_tagged=n_tagged,
+                punct_post_process=punct_post_process,
+                verbose=verbose,
+                prune_weight=prune_weight,
+                max_options=max_options,
             )
 
         try:
@@ -158,17 +212,38 @@ class NormalizerWithAudio(Normalizer):
             text, det_norm, pred_text, verbose=False
         )
 
+        # spans left to normalize and the number of options they can still generate
+        n_spans = sum(len(span) > 0 for span in semiotic_spans)
+        budget = max_options
+
         sem_tag_idx = 0
         for cur_semiotic_span, cur_pred_text, cur_deter_norm in zip(semiotic_spans, pred_text_spans, norm_spans):
             if len(cur_semiotic_span) == 0:
                 text_with_span_tags_list[masked_idx_list[sem_tag_idx]] = ""
+            elif (
+                deterministic_cer_threshold >= 0
+                and len(cur_pred_text) > 0
+                and CERScorer(cur_pred_text).score([cur_deter_norm])[0][1] <= deterministic_cer_threshold
+            ):
+                # deterministic normalization already matches the ASR output, other options are not generated
+                text_with_span_tags_list[masked_idx_list[sem_tag_idx]] = cur_deter_norm
+                self.stats["spans_short_circuited"] += 1
+                n_spans -= 1
             else:
+                # deterministic option comes from the alignment with the normalized sentence
+                span_max_options = -1 if budget < 0 else max(1, budget // n_spans)
                 non_deter_options = self.normalize_non_deterministic(
                     text=cur_semiotic_span,
                     n_tagged=n_tagged,
                     punct_post_process=punct_post_process,
                     verbose=verbose,
+                    deterministic_form=cur_deter_norm,
+                    prune_weight=prune_weight,
+                    max_options=span_max_options,
                 )
+                n_spans -= 1
+                if budget >= 0 and not isinstance(non_deter_options, str):
+                    budget = max(0, budget - len(non_deter_options))
                 try:
                     best_option, cer, _ = self.select_best_match(
                         normalized_texts=non_deter_options,
@@ -192,16 +267,85 @@ class NormalizerWithAudio(Normalizer):
         return normalized_text.replace("  ", " ")
 
     def normalize_non_deterministic(
-        self, text: str, n_tagged: int, punct_post_process: bool = True, verbose: bool = False
+        self,
+        text: str,
+        n_tagged: int,
+        punct_post_process: bool = True,
+        verbose: bool = False,
+        deterministic_form: Optional[str] = None,
+        prune_weight: float = -1,
+        max_options: int = -1,
     ):
-        # get deterministic option
-        if self.tagger:
+        """
+        Returns all normalization options for the text, the options are cached and reused for identical inputs
+
+        Args:
+            text: input text
+            n_tagged: number of tagged options to consider, -1 - to get all possible tagged options
+            punct_post_process: whether to normalize punctuation
+            verbose: whether to print intermediate meta information
+            deterministic_form: deterministic normalization of the text, e.g. a span of the deterministic
+                normalization of the whole sentence. If None, the text is normalized with the deterministic grammars.
+            prune_weight: tagged options with weight above the weight of the best option plus prune_weight
+                are discarded before verbalization. Set to -1 to disable pruning.
+            max_options: maximum number of normalization options to generate (the deterministic option could
+                be added on top). Set to -1 for no limit.
+
+        Returns:
+            set of normalization options (list of options and their weights for LM mode)
+        """
+        # get deterministic option, it is not used in LM mode
+        if deterministic_form is not None:
+            self.stats["deterministic_reused"] += 1
+        elif self.tagger and not self.lm:
             deterministic_form = super().normalize(
                 text=text, verbose=verbose, punct_pre_process=False, punct_post_process=punct_post_process
             )
+
+        key = (text, n_tagged, punct_post_process, prune_weight, max_options)
+        if self.options_cache.path is not None:
+            key = (self.lang, *key, self.grammar_fingerprint)
+        options = self.options_cache.get(key)
+        if options is not None:
+            self.stats["options_cache_hits"] += 1
         else:
-            deterministic_form = None
+            options = self._get_non_deterministic_options(
+                text=text,
+                n_tagged=n_tagged,
+                punct_post_process=punct_post_process,
+                verbose=verbose,
+                prune_weight=prune_weight,
+                max_options=max_options,
+            )
+            self.options_cache.put(key, options)
+
+        if isinstance(options, str):
+            # normalization failed, input is returned
+            return options
+        if self.lm:
+            normalized_texts, weights = options
+            return list(normalized_texts), weights
+
+        normalized_texts = set(options)
+        if deterministic_form is not None:
+            normalized_texts.add(deterministic_form)
+        return normalized_texts
 
+    def _get_non_deterministic_options(
+        self,
+        text: str,
+        n_tagged: int,
+        punct_post_process: bool,
+        verbose: bool,
+        prune_weight: float = -1,
+        max_options: int = -1,
+    ):
+        """
+        Normalizes text with the non-deterministic grammars, see normalize_non_deterministic() for the args
+
+        Returns:
+            list of normalization options (and their weights for LM mode), or input text if normalization failed
+        """
         original_text = text
 
         text = pre_process(text)  # to handle []
@@ -217,21 +361,17 @@ class NormalizerWithAudio(Normalizer):
                 raise ValueError(f"{self.lang} is not supported in LM mode")
 
             if self.lang == "en":
-                # this to keep arpabet phonemes in the list of options
-                if "[" in text and "]" in text:
-
-                    lattice = rewrite.rewrite_lattice(text, self.tagger_non_deterministic.fst)
-                else:
-                    try:
-                        lattice = rewrite.rewrite_lattice(text, self.tagger_non_deterministic.fst_no_digits)
-                    except pynini.lib.rewrite.Error:
-                        lattice = rewrite.rewrite_lattice(text, self.tagger_non_deterministic.fst)
+                lattice = self._get_tagged_lattice(text)
+                if prune_weight >= 0:
+                    lattice = pynini.prune(lattice, weight=prune_weight)
                 lattice = rewrite.lattice_to_nshortest(lattice, n_tagged)
                 tagged_texts = [(x[1], float(x[2])) for x in lattice.paths().items()]
                 tagged_texts.sort(key=lambda x: x[1])
+                if max_options >= 0:
+                    tagged_texts = tagged_texts[:max_options]
                 tagged_texts, weights = list(zip(*tagged_texts))
         else:
-            tagged_texts = self._get_tagged_text(text, n_tagged)
+            tagged_texts = self._get_tagged_text(text, n_tagged, prune_weight=prune_weight, max_options=max_options)
 
         # non-deterministic Eng normalization uses tagger composed with verbalizer, no permutation in between
         if self.lang == "en":
@@ -241,15 +381,20 @@ class NormalizerWithAudio(Normalizer):
             normalized_texts = []
             for tagged_text in tagged_texts:
                 self._verbalize(tagged_text, normalized_texts, n_tagged, verbose=verbose)
+                if 0 <= max_options <= len(normalized_texts):
+                    # every tagged option is verbalized across all permutations of its tokens, stop once
+                    # the budget is spent
+                    normalized_texts = normalized_texts[:max_options]
+                    break
 
         if len(normalized_texts) == 0:
             logger.warning("Failed text: " + text + ", normalized_texts: " + str(normalized_texts))
             return text
 
         if punct_post_process:
-            # do post-processing based on Moses detokenizer
-            if self.moses_detokenizer:
-                normalized_texts = [self.moses_detokenizer.detokenize([t]) for t in normalized_texts]
+            # do post-processing based on Moses detokenizer rules
+            if self.detokenizer:
+                normalized_texts = self.detokenizer.detokenize_batch(normalized_texts)
                 normalized_texts = [
                     post_process_punct(input=original_text, normalized_text=t) for t in normalized_texts
                 ]
@@ -258,11 +403,6 @@ class NormalizerWithAudio(Normalizer):
             remove_dup = sorted(list(set(zip(normalized_texts, weights))), key=lambda x: x[1])
             normalized_texts, weights = zip(*remove_dup)
             return list(normalized_texts), weights
-
-        if deterministic_form is not None:
-            normalized_texts.append(deterministic_form)
-
-        normalized_texts = set(normalized_texts)
         return normalized_texts
 
     def normalize_line(
@@ -276,6 +416,9 @@ class NormalizerWithAudio(Normalizer):
         asr_pred_field: str = "pred_text",
         output_field: str = "normalized",
         cer_threshold: float = -1,
+        deterministic_cer_threshold: float = 0,
+        prune_weight: float = -1,
+        max_options: int = -1,
     ):
         """
         Normalizes "text_field" in line from a .json manifest
@@ -292,6 +435,13 @@ class NormalizerWithAudio(Normalizer):
             cer_threshold: if CER for pred_text and the normalization option is above the cer_threshold,
                 default deterministic normalization will be used. Set to -1 to disable cer-based filtering.
                 Specify the value in %, e.g. 100 not 1.
+            deterministic_cer_threshold: if CER for pred_text and the deterministic normalization of a semiotic span
+                is at or below the deterministic_cer_threshold, the deterministic normalization is used without
+                generating other options. Set to -1 to always generate all options. Specify the value in %.
+            prune_weight: tagged options with weight above the weight of the best option plus prune_weight
+                are discarded before verbalization. Set to -1 to disable pruning.
+            max_options: maximum number of normalization options to generate for the whole sentence.
+                Set to -1 for no limit.
         """
         line = json.loads(line)
 
@@ -302,46 +452,288 @@ class NormalizerWithAudio(Normalizer):
             punct_post_process=punct_post_process,
             pred_text=line[asr_pred_field],
             cer_threshold=cer_threshold,
+            deterministic_cer_threshold=deterministic_cer_threshold,
+            prune_weight=prune_weight,
+            max_options=max_options,
         )
         line[output_field] = normalized_text
         return line
 
-    def _get_tagged_text(self, text, n_tagged):
+    def normalize_manifest(
+        self,
+        manifest: str,
+        n_jobs: int,
+        punct_pre_process: bool,
+        punct_post_process: bool,
+        batch_size: int,
+        output_filename: Optional[str] = None,
+        text_field: str = "text",
+        verbose: bool = False,
+        asr_pred_field: str = "pred_text",
+        output_field: str = "normalized",
+        id_field: Optional[str] = None,
+        checkpoint_dir: Optional[str] = None,
+        resume: bool = True,
+        **kwargs,
+    ):
+        """
+        Normalizes "text_field" from .json manifest. The manifest is read and normalized in shards of batch_size
+        lines, every finished shard is saved to checkpoint_dir, so an interrupted run could be resumed without
+        normalizing the finished shards again. The output is written in the manifest order as the shards finish.
+        Throughput and CER of every shard are saved to "<output_filename without extension>_stats.jsonl".
+
+        Args:
+            manifest: path to .json manifest file
+            n_jobs: the maximum number of concurrently running jobs. If -1 all CPUs are used. If 1 is given,
+                no parallel computing code is used at all, which is useful for debugging. For n_jobs below -1,
+                (n_cpus + 1 + n_jobs) are used. Thus for n_jobs = -2, all CPUs but one are used.
+            punct_pre_process: set to True to do punctuation pre-processing
+            punct_post_process: set to True to do punctuation post-processing
+            batch_size: number of lines in a shard
+            output_filename: path to .json file to save normalized text
+            text_field: name of the field in the manifest to normalize
+            verbose: set to True to see intermediate output of normalization
+            asr_pred_field: name of the field in the manifest with ASR predictions
+            output_field: name of the field in the manifest to save normalized text
+            id_field: name of the field with a unique line id, e.g. "audio_filepath". If set, lines with ids
+                that are already normalized in the existing output_filename are copied from it instead of
+                being normalized again (e.g. after new lines were added to the manifest).
+            checkpoint_dir: path to a dir to save finished shards, "<output_filename without extension>_parts"
+                by default. The dir is removed once the output is saved. The shards are reused only if the manifest,
+                batch_size, normalization arguments and grammars are the same, otherwise all shards are normalized
+                again.
+            resume: set to False to normalize all shards again and ignore the existing output
+            **kwargs are passed to normalize_line(), e.g. n_tagged
+        """
+
+        def _process_shard(shard_idx: int, lines: List[str], normalized: Dict[str, dict]):
+            """
+            Normalizes a shard of the manifest and saves it to checkpoint_dir
+
+            Args:
+                shard_idx: shard index
+                lines: manifest lines
+                normalized: already normalized lines of the shard by their ids
+
+            Returns: shard statistics
+            """
+            start = perf_counter()
+            stats_start = self.stats.copy()
+            shard_stats = {"shard": shard_idx, "lines": len(lines), "reused": 0}
+            cers = []
+            with open(os.path.join(checkpoint_dir, f"{shard_idx:06}.json.tmp"), "w", encoding="utf-8") as f_out:
+                for line in lines:
+                    line_id = json.loads(line).get(id_field) if id_field else None
+                    if line_id is not None and line_id in normalized:
+                        f_out.write(json.dumps(normalized[line_id], ensure_ascii=False) + '\n')
+                        shard_stats["reused"] += 1
+                        continue
+
+                    line = self.normalize_line(
+                        line=line,
+                        verbose=verbose,
+                        punct_pre_process=punct_pre_process,
+                        punct_post_process=punct_post_process,
+                        text_field=text_field,
+                        asr_pred_field=asr_pred_field,
+                        output_field=output_field,
+                        **kwargs,
+                    )
+                    if isinstance(line[output_field], set):
+                        if len(line[output_field]) > 1:
+                            logger.warning("Len of " + str(line[output_field]) + " > 1 ")
+                        line[output_field] = line[output_field].pop()
+                    if len(line[asr_pred_field]) > 0:
+                        cers.append(
+                            CERScorer(line[asr_pred_field], remove_punct=True).score([line[output_field]])[0][1]
+                        )
+                    f_out.write(json.dumps(line, ensure_ascii=False) + '\n')
+
+            seconds = perf_counter() - start
+            shard_stats["seconds"] = round(seconds, 3)
+            shard_stats["lines_per_second"] = round(len(lines) / seconds, 3) if seconds > 0 else None
+            shard_stats["cer"] = round(sum(cers) / len(cers), 3) if cers else None
+            # batches processed in other processes do not update self.stats
+            shard_stats["stats"] = dict(self.stats - stats_start)
+            with open(os.path.join(checkpoint_dir, f"{shard_idx:06}.stats.json"), "w") as f_out:
+                json.dump(shard_stats, f_out)
+            # the shard is finished once it is renamed
+            os.replace(
+                os.path.join(checkpoint_dir, f"{shard_idx:06}.json.tmp"),
+                os.path.join(checkpoint_dir, f"{shard_idx:06}.json"),
+            )
+            logger.info(f"Shard -- {shard_idx} -- is complete")
+            return shard_stats
+
+        def _shards(normalized: Dict[str, dict], finished: Set[int]):
+            """
+            Reads manifest lazily, yields shards that are not finished yet
+            """
+            with open(manifest, "r", encoding="utf-8") as f_in:
+                lines = iter(lambda: list(itertools.islice(f_in, batch_size)), [])
+                for shard_idx, shard in enumerate(lines):
+                    if shard_idx in finished:
+                        continue
+                    shard_normalized = {}
+                    if normalized:
+                        for line in shard:
+                            line_id = json.loads(line).get(id_field)
+                            if line_id in normalized:
+                                shard_normalized[line_id] = normalized[line_id]
+                    yield shard_idx, shard, shard_normalized
+
+        if output_filename is None:
+            output_filename = manifest.replace('.json', '_normalized.json')
+        output_prefix = os.path.splitext(output_filename)[0]
+        if checkpoint_dir is None:
+            checkpoint_dir = output_prefix + "_parts"
+        stats_filename = output_prefix + "_stats.jsonl"
+
+        # shards are identified by their index, they are reused only if the manifest is split and normalized the same
+        # way
+        manifest_stat = os.stat(manifest)
+        config = {
+            "manifest": os.path.abspath(manifest),
+            "manifest_size": manifest_stat.st_size,
+            "manifest_mtime": manifest_stat.st_mtime,
+            "batch_size": batch_size,
+            "punct_pre_process": punct_pre_process,
+            "punct_post_process": punct_post_process,
+            "text_field": text_field,
+            "asr_pred_field": asr_pred_field,
+            "output_field": output_field,
+            "id_field": id_field,
+            "kwargs": kwargs,
+            "grammar_fingerprint": self.grammar_fingerprint,
+        }
+        # e.g. tuples become lists
+        config = json.loads(json.dumps(config, default=str))
+        config_f = os.path.join(checkpoint_dir, "config.json")
+        reuse_shards = resume
+        if resume and os.path.exists(checkpoint_dir):
+            existing = None
+            if os.path.exists(config_f):
+                with open(config_f, "r") as f_in:
+                    existing = json.load(f_in)
+            if existing != config:
+                logger.warning(
+                    f"{checkpoint_dir} contains shards created with {existing}, current settings are {config}. "
+                    f"Normalizing all shards again."
+                )
+                reuse_shards = False
+        if not reuse_shards and os.path.exists(checkpoint_dir):
+            shutil.rmtree(checkpoint_dir)
+        if not os.path.exists(config_f):
+            os.makedirs(checkpoint_dir, exist_ok=True)
+            with open(config_f, "w") as f_out:
+                json.dump(config, f_out)
+
+        finished = {}
+        for stats_file in glob(os.path.join(checkpoint_dir, "*.stats.json")):
+            shard_idx = int(os.path.basename(stats_file).split(".")[0])
+            if os.path.exists(os.path.join(checkpoint_dir, f"{shard_idx:06}.json")):
+                with open(stats_file, "r") as f_in:
+                    finished[shard_idx] = json.load(f_in)
+        if finished:
+            logger.warning(f"Resuming normalization of {manifest}, {len(finished)} shard(s) are already finished")
+
+        normalized = {}
+        if resume and id_field and os.path.exists(output_filename):
+            with open(output_filename, "r", encoding="utf-8") as f_in:
+                for line in f_in:
+                    line = json.loads(line)
+                    if id_field in line and output_field in line:
+                        normalized[line[id_field]] = line
+
+        stats_start = self.stats.copy()
+        manifest_stats = Counter()
+        shard_stats = Parallel(n_jobs=n_jobs, return_as="generator")(
+            delayed(_process_shard)(shard_idx, shard, shard_normalized)
+            for shard_idx, shard, shard_normalized in _shards(normalized, set(finished))
+        )
+
+        # shards are written in the manifest order, finished shards are written as soon as all previous ones are
+        next_shard = 0
+        with open(output_filename + ".tmp", "w", encoding="utf-8") as f_out, open(stats_filename, "w") as f_stats:
+
+            def _write_finished(until: int) -> int:
+                shard_idx = next_shard
+                while shard_idx < until and shard_idx in finished:
+                    with open(os.path.join(checkpoint_dir, f"{shard_idx:06}.json"), "r", encoding="utf-8") as f_in:
+                        shutil.copyfileobj(f_in, f_out)
+                    f_stats.write(json.dumps(finished[shard_idx]) + "\n")
+                    shard_idx += 1
+                f_out.flush()
+                return shard_idx
+
+            for stats in shard_stats:
+                finished[stats["shard"]] = stats
+                manifest_stats += Counter(stats["stats"])
+                next_shard = _write_finished(stats["shard"] + 1)
+            next_shard = _write_finished(max(finished, default=-1) + 1)
+
+        os.replace(output_filename + ".tmp", output_filename)
+        shutil.rmtree(checkpoint_dir)
+
+        self.stats = stats_start + manifest_stats
+        if manifest_stats:
+            logger.info(f"Grammar compositions skipped: {dict(manifest_stats)}")
+        n_lines = sum(stats["lines"] for stats in finished.values())
+        n_seconds = sum(stats["seconds"] for stats in finished.values())
+        logger.info(f"Normalized {n_lines} line(s) in {len(finished)} shard(s), {round(n_seconds, 2)} s of compute")
+        logger.warning(f'Normalized version saved at {output_filename}, statistics saved at {stats_filename}')
+
+    def _get_tagged_lattice(self, text: str) -> pynini.Fst:
+        """
+        Returns lattice of tagged options for the text
+        """
+        if self.lang == "en":
+            # this to keep arpabet phonemes in the list of options
+            if "[" in text and "]" in text:
+                return rewrite.rewrite_lattice(text, self.tagger_non_deterministic.fst)
+            try:
+                # try self.tagger graph that produces output without digits
+                return rewrite.rewrite_lattice(text, self.tagger_non_deterministic.fst_no_digits)
+            except pynini.lib.rewrite.Error:
+                return rewrite.rewrite_lattice(text, self.tagger_non_deterministic.fst)
+        return rewrite.rewrite_lattice(text, self.tagger_non_deterministic.fst)
+
+    def _get_tagged_text(self, text: str, n_tagged: int, prune_weight: float = -1, max_options: int = -1) -> List[str]:
         """
         Returns text after tokenize and classify
-        Args;
-            text: input  text
+
+        Args:
+            text: input text
             n_tagged: number of tagged options to consider, -1 - return all possible tagged options
+            prune_weight: paths of the tagged lattice with weight above the weight of the shortest path
+                plus prune_weight are discarded before the options are extracted. Set to -1 to disable pruning.
+            max_options: maximum number of tagged options to return, the options with the lowest weights are kept.
+                Set to -1 to return all options.
+
+        Returns:
+            tagged options, equivalent options that differ only in spaces are removed
         """
+        lattice = self._get_tagged_lattice(text)
+        if prune_weight >= 0:
+            lattice = pynini.prune(lattice, weight=prune_weight)
+
         if n_tagged == -1:
-            if self.lang == "en":
-                # this to keep arpabet phonemes in the list of options
-                if "[" in text and "]" in text:
-                    tagged_texts = rewrite.rewrites(text, self.tagger_non_deterministic.fst)
-                else:
-                    try:
-                        tagged_texts = rewrite.rewrites(text, self.tagger_non_deterministic.fst_no_digits)
-                    except pynini.lib.rewrite.Error:
-                        tagged_texts = rewrite.rewrites(text, self.tagger_non_deterministic.fst)
-            else:
-                tagged_texts = rewrite.rewrites(text, self.tagger_non_deterministic.fst)
+            lattice = rewrite.lattice_to_dfa(lattice, False)
         else:
-            if self.lang == "en":
-                # this to keep arpabet phonemes in the list of options
-                if "[" in text and "]" in text:
-                    tagged_texts = rewrite.top_rewrites(text, self.tagger_non_deterministic.fst, nshortest=n_tagged)
-                else:
-                    try:
-                        # try self.tagger graph that produces output without digits
-                        tagged_texts = rewrite.top_rewrites(
-                            text, self.tagger_non_deterministic.fst_no_digits, nshortest=n_tagged
-                        )
-                    except pynini.lib.rewrite.Error:
-                        tagged_texts = rewrite.top_rewrites(
-                            text, self.tagger_non_deterministic.fst, nshortest=n_tagged
-                        )
-            else:
-                tagged_texts = rewrite.top_rewrites(text, self.tagger_non_deterministic.fst, nshortest=n_tagged)
+            lattice = rewrite.lattice_to_nshortest(lattice, n_tagged)
+
+        if max_options >= 0:
+            paths = sorted(lattice.paths().items(), key=lambda x: float(x[2]))
+            tagged_texts = [x[1] for x in paths]
+        else:
+            tagged_texts = rewrite.lattice_to_strings(lattice)
+
+        unique_texts = {}
+        for tagged_text in tagged_texts:
+            unique_texts.setdefault(" ".join(tagged_text.split()), tagged_text)
+        tagged_texts = list(unique_texts.values())
+        if max_options >= 0:
+            tagged_texts = tagged_texts[:max_options]
         return tagged_texts
 
     def _verbalize(self, tagged_text: str, normalized_texts: List[str], n_tagged: int, verbose: bool = False):
@@ -389,9 +781,7 @@ class NormalizerWithAudio(Normalizer):
         Returns:
             normalized text with the lowest CER and CER value
         """
-        normalized_texts_cer = calculate_cer(normalized_texts, pred_text, remove_punct)
-        normalized_texts_cer = sorted(normalized_texts_cer, key=lambda x: x[1])
-        normalized_text, cer, idx = normalized_texts_cer[0]
+        normalized_text, cer, idx = CERScorer(pred_text, remove_punct=remove_punct).top_k(normalized_texts, k=1)[0]
 
         if verbose:
             logger.info('-' * 30)
@@ -411,16 +801,7 @@ def calculate_cer(normalized_texts: List[str], pred_text: str, remove_punct=Fals
 
     Returns: normalized options with corresponding CER
     """
-    normalized_options = []
-    for i, text in enumerate(normalized_texts):
-        text_clean = text.replace('-', ' ').lower()
-        if remove_punct:
-            for punct in "!?:;,.-()*+-/<=>@^_":
-                text_clean = text_clean.replace(punct, " ").replace("  ", " ")
-
-        cer = editdistance.eval(pred_text, text_clean) * 100.0 / len(pred_text)
-        normalized_options.append((text, cer, i))
-    return normalized_options
+    return CERScorer(pred_text, remove_punct=remove_punct).score(normalized_texts)
 
 
 def parse_args():
@@ -485,7 +866,46 @@ def parse_args():
         type=float,
         help="if CER for pred_text and the normalization option is above the cer_threshold, default deterministic normalization will be used. Set to -1 to disable cer-based filtering. Specify the value in %, e.g. 100 not 1.",
     )
+    parser.add_argument(
+        "--deterministic_cer_threshold",
+        default=0,
+        type=float,
+        help="if CER for pred_text and the deterministic normalization of a semiotic span is at or below the deterministic_cer_threshold, other normalization options are not generated for the span. Set to -1 to always generate all options. Specify the value in %%.",
+    )
+    parser.add_argument(
+        "--prune_weight",
+        default=-1,
+        type=float,
+        help="tagged options with weight above the weight of the best option plus prune_weight are discarded before verbalization. Set to -1 to disable pruning.",
+    )
+    parser.add_argument(
+        "--max_options",
+        default=-1,
+        type=int,
+        help="maximum number of normalization options to generate per sentence. Set to -1 for no limit.",
+    )
     parser.add_argument("--batch_size", default=200, type=int, help="Number of examples for each process")
+    parser.add_argument(
+        "--manifest_id_field",
+        default=None,
+        type=str,
+        help="A field in .json manifest with a unique line id, e.g. audio_filepath. Lines with ids that are already normalized in --output_filename are not normalized again.",
+    )
+    parser.add_argument(
+        "--checkpoint_dir",
+        default=None,
+        type=str,
+        help="path to a dir to save finished shards of the manifest, <output_filename>_parts by default",
+    )
+    parser.add_argument(
+        "--options_cache_path",
+        default=None,
+        type=str,
+        help="path to a SQLite file to cache normalization options of semiotic spans, could be reused between runs",
+    )
+    parser.add_argument(
+        "--no_resume", help="set to True to ignore finished shards and the existing output", action="store_true"
+    )
     parser.add_argument(
         "--max_number_of_permutations_per_split",
         default=729,
@@ -508,6 +928,7 @@ if __name__ == "__main__":
             whitelist=args.whitelist,
             lm=args.lm,
             max_number_of_permutations_per_split=args.max_number_of_permutations_per_split,
+            options_cache_path=args.options_cache_path,
         )
         start = perf_counter()
         if os.path.exists(args.text):
@@ -519,6 +940,8 @@ if __name__ == "__main__":
             n_tagged=args.n_tagged,
             punct_post_process=not args.no_punct_post_process,
             verbose=args.verbose,
+            prune_weight=args.prune_weight,
+            max_options=args.max_options,
         )
         for option in options:
             logger.info(option)
@@ -530,6 +953,7 @@ if __name__ == "__main__":
             overwrite_cache=args.overwrite_cache,
             whitelist=args.whitelist,
             max_number_of_permutations_per_split=args.max_number_of_permutations_per_split,
+            options_cache_path=args.options_cache_path,
         )
         start = perf_counter()
         normalizer.normalize_manifest(
@@ -542,7 +966,13 @@ if __name__ == "__main__":
             n_tagged=args.n_tagged,
             text_field=args.manifest_text_field,
             asr_pred_field=args.manifest_asr_pred_field,
+            id_field=args.manifest_id_field,
+            checkpoint_dir=args.checkpoint_dir,
+            resume=not args.no_resume,
             cer_threshold=args.cer_threshold,
+            deterministic_cer_threshold=args.deterministic_cer_threshold,
+            prune_weight=args.prune_weight,
+            max_options=args.max_options,
             verbose=args.verbose,
         )
     else:
@@ -18,6 +18,7 @@ import os
 import pynini
 from pynini.lib import pynutil
 
+from nemo_text_processing.text_normalization.en.graph_utils import get_whitelist_cache_key
 from nemo_text_processing.text_normalization.pt.graph_utils import (
     NEMO_WHITE_SPACE,
     GraphFst,
@@ -68,7 +69,7 @@ class ClassifyFst(GraphFst):
         far_file = None
         if cache_dir is not None and cache_dir != "None":
             os.makedirs(cache_dir, exist_ok=True)
-            whitelist_file = os.path.basename(whitelist) if whitelist else ""
+            whitelist_file = get_whitelist_cache_key(whitelist)
             far_file = os.path.join(
                 cache_dir,
                 f"_{input_case}_pt_tn_{deterministic}_deterministic{whitelist_file}.far",
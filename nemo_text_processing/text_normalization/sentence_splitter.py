@@ -0,0 +1,236 @@
+# Copyright (c) 2024, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+import regex
+
+from nemo_text_processing.text_normalization.preprocessing_utils import additional_split
+
+# number of characters before a sentence that the lookbehind of the split pattern could need
+SPLIT_CONTEXT = 4
+
+
+class SentenceSplitter:
+    """
+    Splits text into sentences. Regular expressions are compiled once per language.
+
+    Args:
+        lang: language, affects the lower and upper case letters used to detect abbreviations
+    """
+
+    def __init__(self, lang: str = "en"):
+        self.lang = lang
+        lower_case_unicode = ""
+        upper_case_unicode = ""
+
+        if lang == "ru":
+            lower_case_unicode = '\u0430-\u04ff'
+            upper_case_unicode = '\u0410-\u042f'
+
+        # end of quoted speech - to be able to split sentences by full stop
+        self.quote_pattern = re.compile(r"([\.\?\!])([\"\'])")
+        self.quote_replacement = r"\g<2>\g<1> "
+        self.space_pattern = re.compile(r" {2,}")
+        self.abbreviation_pattern = re.compile(rf"[a-z{lower_case_unicode}]\.\s[a-z{lower_case_unicode}]\.")
+        # end of a word followed by whitespace, preprocessing of the text before it doesn't depend on the text after
+        self.safe_cut_pattern = re.compile(r"\w\s(?=\S)")
+        self.split_pattern = regex.compile(
+            rf"(?<!\w\.\w.)(?<![A-Z{upper_case_unicode}][a-z{lower_case_unicode}]+\.)(?<![A-Z{upper_case_unicode}]\.)(?<=\.|\?|\!|\.”|\?”\!”)\s(?![0-9]+[a-z]*\.)"
+        )
+
+    def split(self, text: str, additional_split_symbols: str = "") -> List[str]:
+        r"""
+        Split text into sentences.
+
+        Args:
+            text: text
+            additional_split_symbols: Symbols to split sentences if eos sentence split resulted in a long sequence.
+                Use '|' as a separator between symbols, for example: ';|:'. Use '\s' to split by space.
+
+        Returns list of sentences
+        """
+        text, _ = self._preprocess(text)
+        sentences = self.split_pattern.split(text)
+        return additional_split(sentences, additional_split_symbols)
+
+    def iter_sentences(
+        self, text: Union[str, Iterable[str]], additional_split_symbols: str = "", max_buffer_length: int = 10000
+    ) -> Iterator[Tuple[str, int, int]]:
+        r"""
+        Lazily splits text into sentences. The input could be a string or a stream of strings, e.g. an open text file,
+        only the unfinished sentence is kept in memory and every character is preprocessed and scanned once.
+        The sentences are the same as returned by split() for the concatenated input unless a sentence is longer than
+        max_buffer_length.
+
+        Args:
+            text: text or iterable of text chunks
+            additional_split_symbols: Symbols to split sentences if eos sentence split resulted in a long sequence.
+                Use '|' as a separator between symbols, for example: ';|:'. Use '\s' to split by space.
+            max_buffer_length: unfinished sentences longer than max_buffer_length are split at the last whitespace
+
+        Returns sentences with start (inclusive) and end (exclusive) character offsets in the input
+        """
+        if isinstance(text, str):
+            text = [text]
+
+        pending = ""  # input text after head, its preprocessing could depend on the text that is not read yet
+        head = ""  # preprocessed text, starts a few characters before the unfinished sentence
+        head_offsets = []  # input position of every character of head
+        head_end = 0  # input position of pending
+        sentence_start = 0  # start of the unfinished sentence in head
+        searched = 0  # split points of head before this position are found already
+        forced = False  # True if the last sentence was split because of max_buffer_length
+
+        def _sentence(start: int, end: int) -> Iterator[Tuple[str, int, int]]:
+            offsets = head_offsets[start:end] + [head_offsets[end] if end < len(head) else head_end]
+            yield from self._additional_split(head[start:end], offsets, additional_split_symbols)
+
+        for chunk in text:
+            scan_from = max(len(pending) - 2, 0)
+            pending += chunk
+            cut = 0
+            for match in self.safe_cut_pattern.finditer(pending, scan_from):
+                cut = match.end()
+            if cut == 0 and len(pending) > max_buffer_length:
+                cut = max(pending.rfind(" "), pending.rfind("\n")) + 1 or len(pending)
+            if cut == 0:
+                continue
+
+            processed, offsets = self._preprocess(pending[:cut], list(range(head_end, head_end + cut)))
+            head += processed
+            head_offsets.extend(offsets)
+            head_end += cut
+            pending = pending[cut:]
+
+            # split points before the end of head don't depend on the text after it
+            for match in self.split_pattern.finditer(head, searched):
+                yield from _sentence(sentence_start, match.start())
+                sentence_start = match.end()
+                forced = False
+            searched = len(head)
+
+            if len(head) - sentence_start > max_buffer_length:
+                end = len(head) - 1 if head[-1].isspace() else len(head)
+                yield from _sentence(sentence_start, end)
+                sentence_start = len(head)
+                forced = True
+
+            # keep a few characters before the sentence for the lookbehind of the split pattern
+            drop = sentence_start - SPLIT_CONTEXT
+            if drop > 0:
+                head = head[drop:]
+                head_offsets = head_offsets[drop:]
+                sentence_start -= drop
+                searched -= drop
+
+        if pending:
+            processed, offsets = self._preprocess(pending, list(range(head_end, head_end + len(pending))))
+            head += processed
+            head_offsets.extend(offsets)
+            head_end += len(pending)
+        for match in self.split_pattern.finditer(head, searched):
+            yield from _sentence(sentence_start, match.start())
+            sentence_start = match.end()
+            forced = False
+        if not (forced and sentence_start == len(head)):
+            yield from _sentence(sentence_start, len(head))
+
+    def _preprocess(self, text: str, offsets: Optional[List[int]] = None) -> Tuple[str, Optional[List[int]]]:
+        """
+        Normalizes quotes and spaces before the split. If offsets are provided, keeps track of the original position
+        of every character.
+        """
+        text, offsets = _sub(self.quote_pattern, self.quote_replacement, text, offsets)
+
+        # remove extra space
+        text, offsets = _sub(self.space_pattern, " ", text, offsets)
+
+        # remove space in the middle of the lower case abbreviation to avoid splitting into separate sentences
+        text, offsets = _sub(self.abbreviation_pattern, _join_abbreviation, text, offsets)
+        return text, offsets
+
+    def _additional_split(
+        self, sentence: str, offsets: List[int], additional_split_symbols: str
+    ) -> Iterator[Tuple[str, int, int]]:
+        """
+        Applies additional split to a sentence and computes start and end offsets of the parts
+        """
+        if len(additional_split_symbols) == 0:
+            yield sentence, offsets[0], _end_offset(offsets, 0, len(sentence))
+            return
+
+        idx = 0
+        for part in additional_split([sentence], additional_split_symbols):
+            part_idx = sentence.find(part, idx)
+            if part_idx == -1:
+                yield part, offsets[0], _end_offset(offsets, 0, len(sentence))
+            else:
+                idx = part_idx + len(part)
+                yield part, offsets[part_idx], _end_offset(offsets, part_idx, idx)
+
+
+def _join_abbreviation(match: re.Match) -> str:
+    """
+    Removes space in the middle of the lower case abbreviation, e.g. "a. b." -> "a.b."
+    """
+    return match.group(0).replace(". ", ".")
+
+
+def _end_offset(offsets: List[int], start: int, end: int) -> int:
+    """
+    Returns exclusive end offset of the [start:end] span given original positions of its characters
+    """
+    if start == end:
+        return offsets[start]
+    return offsets[end - 1] + 1
+
+
+def _sub(
+    pattern: re.Pattern,
+    replacement: Union[str, Callable[[re.Match], str]],
+    text: str,
+    offsets: Optional[List[int]] = None,
+) -> Tuple[str, Optional[List[int]]]:
+    """
+    re.sub() that optionally keeps track of the original positions of characters.
+    Characters of a replacement are mapped to the positions of the replaced characters.
+
+    Args:
+        pattern: compiled pattern
+        replacement: replacement, could contain group references, or a function that returns the replacement
+            of a match
+        text: text
+        offsets: original position of every character in text, set to None to skip offset tracking
+
+    Returns: text after substitution and offsets
+    """
+    if offsets is None:
+        return pattern.sub(replacement, text), None
+
+    parts = []
+    new_offsets = []
+    last = 0
+    for match in pattern.finditer(text):
+        start, end = match.span()
+        new = replacement(match) if callable(replacement) else match.expand(replacement)
+        parts.append(text[last:start])
+        new_offsets.extend(offsets[last:start])
+        parts.append(new)
+        new_offsets.extend(offsets[min(start + i, end - 1)] for i in range(len(new)))
+        last = end
+    parts.append(text[last:])
+    new_offsets.extend(offsets[last:])
+    return "".join(parts), new_offsets
@@ -0,0 +1,163 @@
+# Copyright (c) 2024, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+from difflib import SequenceMatcher
+from typing import List, Optional, Tuple
+
+import pynini
+
+# start of a token in tagged text
+TOKEN_START = re.compile(r"tokens \{")
+
+Span = Tuple[int, int]
+
+
+def get_shortest_path(lattice: 'pynini.FstLike', token_type: str = "byte") -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    Returns output string of the shortest path of the lattice and the labels of its arcs
+
+    Args:
+        lattice: lattice, e.g. composition of the input with the tagger
+        token_type: labels of the lattice, "byte" (pynini default) or "utf8"
+
+    Returns: output string, (input label, output label) of every arc of the path, 0 for epsilon
+    """
+    path = pynini.shortestpath(lattice, nshortest=1, unique=True)
+    labels = []
+    state = path.start()
+    while state != pynini.NO_STATE_ID and path.num_arcs(state) > 0:
+        arc = next(iter(path.arcs(state)))
+        labels.append((arc.ilabel, arc.olabel))
+        state = arc.nextstate
+    return path.string(token_type=token_type), labels
+
+
+def map_label_positions(labels: List[Tuple[int, int]], positions: List[int], from_input: bool) -> List[int]:
+    """
+    Maps positions among the labels on one side of a path to the number of labels on the other side that precede them
+
+    Args:
+        labels: (input label, output label) of every arc of the path
+        positions: positions among the non-epsilon labels of one side, the number of such labels for the end
+        from_input: True if positions are input positions
+
+    Returns: number of preceding labels on the other side for every position
+    """
+    src, dst = (0, 1) if from_input else (1, 0)
+    before = []
+    count = 0
+    for arc in labels:
+        if arc[src]:
+            before.append(count)
+        if arc[dst]:
+            count += 1
+    before.append(count)
+    return [before[p] for p in positions]
+
+
+def label_offsets(text: str, n_labels: int) -> List[int]:
+    """
+    Returns character index of every label of text and len(text) for the end. Labels are either UTF-8 bytes
+    (the default pynini token type) or Unicode code points.
+    """
+    if n_labels == len(text):
+        return list(range(len(text) + 1))
+    offsets = [i for i, ch in enumerate(text) for _ in range(len(ch.encode("utf-8")))]
+    if len(offsets) != n_labels:
+        raise ValueError(f"Labels of the path don't match {text}")
+    return offsets + [len(text)]
+
+
+def char_to_label(text: str, pos: int, n_labels: int) -> int:
+    """
+    Returns label position of the character position of text, see label_offsets()
+    """
+    if n_labels == len(text):
+        return pos
+    return len(text[:pos].encode("utf-8"))
+
+
+def get_token_spans(
+    text: str, labels: List[Tuple[int, int]], token_text: str, n_tokens: int, tokens_on_input: bool
+) -> Optional[List[Span]]:
+    """
+    Returns spans of the tokens in text, the text on the other side of a path with tagged tokens.
+    The spans are derived from the shortest path, tokens are expected in the order of the text.
+        e.g. the tagger path of "12 kg" -> "tokens { measure { ... } }"
+
+    Args:
+        text: unescaped input or output of the path without tokens
+        labels: (input label, output label) of every arc of the path
+        token_text: unescaped tagged text on the other side of the path
+        n_tokens: number of tokens in token_text
+        tokens_on_input: True if tagged text is the input of the path, e.g. for the verbalizer
+
+    Returns: (start, end) of every token in text without surrounding spaces, None if tokens can't be found
+    """
+    token_side, text_side = (0, 1) if tokens_on_input else (1, 0)
+    n_token_labels = sum(1 for arc in labels if arc[token_side])
+    n_text_labels = sum(1 for arc in labels if arc[text_side])
+
+    starts = [m.start() for m in TOKEN_START.finditer(token_text)]
+    if len(starts) != n_tokens:
+        return None
+    boundaries = [char_to_label(token_text, pos, n_token_labels) for pos in starts] + [n_token_labels]
+    try:
+        offsets = label_offsets(text, n_text_labels)
+    except ValueError:
+        return None
+    boundaries = [offsets[x] for x in map_label_positions(labels, boundaries, from_input=tokens_on_input)]
+
+    spans = []
+    for start, end in zip(boundaries[:-1], boundaries[1:]):
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        spans.append((start, end))
+    return spans
+
+
+def map_spans(source: str, target: str, spans: List[Span]) -> List[Span]:
+    """
+    Maps spans of source to target, a modified version of source, e.g. after post-processing. Characters of
+    the replaced parts of source are mapped to the whole replacement.
+
+    Args:
+        source: source text
+        target: target text
+        spans: (start, end) spans in source
+
+    Returns: (start, end) spans in target
+    """
+    if source == target:
+        return list(spans)
+
+    blocks = SequenceMatcher(None, source, target, autojunk=False).get_matching_blocks()
+
+    def _map(pos: int, is_end: bool) -> int:
+        # for start: first target position of the source positions >= pos, for end: after the positions < pos
+        prev_target_end = 0
+        for a, b, size in blocks:
+            if is_end and a < pos <= a + size:
+                return b + pos - a
+            if not is_end and a <= pos < a + size:
+                return b + pos - a
+            if pos < a + (1 if is_end else 0):
+                return b if is_end else prev_target_end
+            prev_target_end = b + size
+        return len(target)
+
+    return [(_map(start, False), max(_map(start, False), _map(end, True))) for start, end in spans]
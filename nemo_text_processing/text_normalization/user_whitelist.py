@@ -0,0 +1,120 @@
+# Copyright (c) 2024, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import csv
+import string
+from typing import Callable, List, Optional, Tuple
+
+from nemo_text_processing.text_normalization.en.graph_utils import INPUT_LOWER_CASED, NEMO_NON_BREAKING_SPACE
+from nemo_text_processing.utils.logging import logger
+
+
+class UserWhitelist:
+    """
+    User whitelist that is applied on top of the prebuilt tagger grammar, e.g. to update pronunciations without
+    rebuilding the grammars. Whitelist entries are matched against whole words of the input (longest match first,
+    trailing punctuation marks are allowed) and take priority over all other semiotic classes, the rest of the input
+    is tagged with the grammar.
+        e.g. with "NVIDIA" -> "en vidia" entry: "NVIDIA costs $5" ->
+            tokens { name: "en vidia" } + <tagger output for "costs $5">
+
+    Args:
+        input_file: path to a .tsv file with whitelist replacements, one "<written form><TAB><spoken form>" entry per line
+        input_case: accepting either "lower_cased" or "cased" input, keys are lower cased for "lower_cased"
+    """
+
+    def __init__(self, input_file: str, input_case: str = "cased"):
+        self.input_file = input_file
+        self.input_case = input_case
+        self.lookup = {}
+
+        with open(input_file, encoding="utf-8") as f:
+            for line in csv.reader(f, delimiter="\t"):
+                if len(line) < 2 or not line[0].strip():
+                    continue
+                key, value = " ".join(line[0].split()), line[1].strip()
+                if '"' in value:
+                    logger.warning(f"Skipping whitelist entry {line} from {input_file}: quotes are not supported")
+                    continue
+                if input_case == INPUT_LOWER_CASED:
+                    key = key.lower()
+                self.lookup[key] = value
+
+        self.max_words = max((len(key.split()) for key in self.lookup), default=0)
+
+    def __len__(self) -> int:
+        return len(self.lookup)
+
+    def is_matched(self, text: str) -> bool:
+        """
+        Returns True if text contains at least one whitelist entry
+        """
+        words = text.split()
+        return any(self._match(words, i) is not None for i in range(len(words)))
+
+    def tag(self, text: str, tagger: Callable[[str], str]) -> str:
+        """
+        Tags text: whitelist entries are converted to tokens, the rest is tagged with the tagger
+
+        Args:
+            text: input text (not escaped)
+            tagger: function that returns tagged text for an input span
+
+        Returns: tagged text
+        """
+        words = text.split()
+        tagged = []
+        pending: List[str] = []
+        i = 0
+        while i < len(words):
+            match = self._match(words, i)
+            if match is None:
+                pending.append(words[i])
+                i += 1
+                continue
+            n_words, value, punct = match
+            if pending:
+                tagged.append(tagger(" ".join(pending)))
+                pending = []
+            value = value.replace(" ", NEMO_NON_BREAKING_SPACE)
+            tagged.append(f'tokens {{ name: "{value}" }}')
+            i += n_words
+            if punct:
+                # punctuation attached to the entry, e.g. "Dr.," is tagged together with the next words
+                pending.append(punct)
+
+        if pending:
+            tagged.append(tagger(" ".join(pending)))
+        return " ".join(tagged)
+
+    def _match(self, words: List[str], start: int) -> Optional[Tuple[int, str, str]]:
+        """
+        Finds the longest whitelist entry that starts at words[start], the entry could be followed by punctuation marks
+
+        Returns: number of matched words, replacement and punctuation marks after the entry,
+            None if there is no match
+        """
+        for n_words in range(min(self.max_words, len(words) - start), 0, -1):
+            key = " ".join(words[start : start + n_words])
+            value = self.lookup.get(key)
+            if value is not None:
+                return n_words, value, ""
+
+            # keys could end with punctuation marks too, e.g. "Dr." in "Dr.,"
+            n_punct = len(key) - len(key.rstrip(string.punctuation))
+            for end in range(len(key) - 1, max(len(key) - n_punct, 1) - 1, -1):
+                value = self.lookup.get(key[:end])
+                if value is not None:
+                    return n_words, value, key[end:]
+        return None
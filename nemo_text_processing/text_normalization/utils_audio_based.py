@@ -12,15 +12,103 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Dict
+import heapq
+from typing import Dict, Iterable, List, Tuple
 
-from cdifflib import CSequenceMatcher
+import editdistance
+import numpy as np
 
 from nemo_text_processing.utils.logging import logger
 
 MATCH = "match"
 NONMATCH = "non-match"
 SEMIOTIC_TAG = "[SEMIOTIC_SPAN]"
+CER_PUNCT = "!?:;,.-()*+-/<=>@^_"
+
+
+def _lcs_row(a: List[int], b: List[int]) -> np.ndarray:
+    """
+    Computes the last row of the LCS (longest common subsequence) table of a and b, i.e. LCS lengths of a and
+    every prefix of b, with the bit-parallel algorithm: a row of the table is stored as bits of a Python integer
+    and updated with a few arithmetic operations per token of a.
+
+    Returns: array of len(b) + 1 LCS lengths
+    """
+    masks = {}
+    for j, token in enumerate(b):
+        masks[token] = masks.get(token, 0) | (1 << j)
+
+    full = (1 << len(b)) - 1
+    # bit j is 0 if LCS(a[:i], b[:j + 1]) = LCS(a[:i], b[:j]) + 1
+    v = full
+    for token in a:
+        u = v & masks.get(token, 0)
+        v = ((v + u) | (v - u)) & full
+
+    bits = np.unpackbits(np.frombuffer(v.to_bytes((len(b) + 7) // 8, "little"), dtype=np.uint8), bitorder="little")[
+        : len(b)
+    ]
+    return np.concatenate([[0], np.cumsum(1 - bits.astype(np.int64))])
+
+
+def _lcs_pairs(a: List[int], b: List[int], a_start: int, b_start: int, pairs: List[Tuple[int, int]]):
+    """
+    Finds the longest common subsequence of a and b with the Hirschberg's divide and conquer algorithm that uses
+    linear space, matched positions shifted by a_start and b_start are added to pairs
+    """
+    # common prefix and suffix are matched directly, e.g. words outside semiotic spans
+    prefix = 0
+    while prefix < min(len(a), len(b)) and a[prefix] == b[prefix]:
+        pairs.append((a_start + prefix, b_start + prefix))
+        prefix += 1
+    suffix = 0
+    while suffix < min(len(a), len(b)) - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    a, b = a[prefix : len(a) - suffix], b[prefix : len(b) - suffix]
+    a_start, b_start = a_start + prefix, b_start + prefix
+
+    if len(a) > 0 and len(b) > 0:
+        if len(a) == 1:
+            if a[0] in b:
+                pairs.append((a_start, b_start + b.index(a[0])))
+        else:
+            mid = len(a) // 2
+            forward = _lcs_row(a[:mid], b)
+            backward = _lcs_row(a[mid:][::-1], b[::-1])
+            split = int(np.argmax(forward + backward[::-1]))
+            _lcs_pairs(a[:mid], b[:split], a_start, b_start, pairs)
+            _lcs_pairs(a[mid:], b[split:], a_start + mid, b_start + split, pairs)
+
+    for i in range(len(a), len(a) + suffix):
+        pairs.append((a_start + i, b_start + len(b) + i - len(a)))
+
+
+def get_matching_blocks(a: List[str], b: List[str]) -> List[Tuple[int, int, int]]:
+    """
+    Aligns two sequences of words by their longest common subsequence
+
+    Returns:
+        list of triples (i, j, n), such that a[i:i+n] == b[j:j+n], monotonically increasing in i and in j,
+        the last triple is (len(a), len(b), 0) (same format as difflib.SequenceMatcher.get_matching_blocks()), e.g.:
+            >>> get_matching_blocks(["a", "b", "c"], ["a", "b", "d", "f"])
+            [(0, 0, 2), (3, 4, 0)]
+    """
+    # words are encoded as integers to compare them faster
+    vocab = {}
+    a_ids = [vocab.setdefault(word, len(vocab)) for word in a]
+    b_ids = [vocab.setdefault(word, len(vocab)) for word in b]
+
+    pairs = []
+    _lcs_pairs(a_ids, b_ids, 0, 0, pairs)
+
+    blocks = []
+    for i, j in pairs:
+        if blocks and blocks[-1][0] + blocks[-1][2] == i and blocks[-1][1] + blocks[-1][2] == j:
+            blocks[-1][2] += 1
+        else:
+            blocks.append([i, j, 1])
+    blocks.append([len(a), len(b), 0])
+    return [tuple(block) for block in blocks]
 
 
 def _get_alignment(a: str, b: str) -> Dict:
@@ -38,10 +126,9 @@ def _get_alignment(a: str, b: str) -> Dict:
     a = a.lower().split()
     b = b.lower().split()
 
-    s = CSequenceMatcher(None, a, b, autojunk=False)
     # s contains a list of triples. Each triple is of the form (i, j, n), and means that a[i:i+n] == b[j:j+n].
     # The triples are monotonically increasing in i and in j.
-    s = s.get_matching_blocks()
+    s = get_matching_blocks(a, b)
 
     diffs = {}
     non_match_start_l = 0
@@ -92,9 +179,13 @@ def adjust_boundaries(norm_raw_diffs: Dict, norm_pred_diffs: Dict, raw: str, nor
             raw_text_mask_idx: [1, 4]
     """
 
+    raw_list = raw.split()
+    pred_text_list = pred_text.split()
+    norm_list = norm.split()
+
     raw_pred_spans = []
     word_id = 0
-    while word_id < len(norm.split()):
+    while word_id < len(norm_list):
         norm_raw, norm_pred = norm_raw_diffs[word_id], norm_pred_diffs[word_id]
         # if there is a mismatch in norm_raw and norm_pred, expand the boundaries of the shortest mismatch to align with the longest one
         # e.g., norm_raw = (1, 2, 'match') norm_pred = (1, 5, 'non-match') => expand norm_raw until the next matching sequence or the end of string to align with norm_pred
@@ -104,7 +195,7 @@ def adjust_boundaries(norm_raw_diffs: Dict, norm_pred_diffs: Dict, raw: str, nor
             non_match_pred_start = norm_pred[0]
             done = False
             word_id += 1
-            while word_id < len(norm.split()) and not done:
+            while word_id < len(norm_list) and not done:
                 norm_raw, norm_pred = norm_raw_diffs[word_id], norm_pred_diffs[word_id]
                 if norm_raw[2] == MATCH and norm_pred[2] == MATCH:
                     non_match_raw_end = norm_raw_diffs[word_id - 1][1]
@@ -114,8 +205,8 @@ def adjust_boundaries(norm_raw_diffs: Dict, norm_pred_diffs: Dict, raw: str, nor
                 else:
                     word_id += 1
             if not done:
-                non_match_raw_end = len(raw.split())
-                non_match_pred_end = len(pred_text.split())
+                non_match_raw_end = len(raw_list)
+                non_match_pred_end = len(pred_text_list)
             raw_pred_spans.append(
                 (
                     mismatched_id,
@@ -161,19 +252,15 @@ def adjust_boundaries(norm_raw_diffs: Dict, norm_pred_diffs: Dict, raw: str, nor
     else:
         spans_merged_neighbors.append(
             [
-                [raw_pred_spans[idx - 1][0], len(norm.split())],
-                [item[1][0], len(raw.split())],
-                [item[2][0], len(pred_text.split())],
+                [raw_pred_spans[idx - 1][0], len(norm_list)],
+                [item[1][0], len(raw_list)],
+                [item[2][0], len(pred_text_list)],
                 item[1][2],
             ]
         )
 
-    raw_list = raw.split()
-    pred_text_list = pred_text.split()
-    norm_list = norm.split()
-
     # increase boundaries between raw and pred_text if some spans contain empty pred_text
-    extended_spans = []
+    extended_spans = set()
     raw_norm_spans_corrected_for_pred_text = []
     idx = 0
     while idx < len(spans_merged_neighbors):
@@ -208,7 +295,7 @@ def adjust_boundaries(norm_raw_diffs: Dict, norm_pred_diffs: Dict, raw: str, nor
                     pred_end = spans_merged_neighbors[idx][2][1]
                 cur_item = [[raw_start, raw_end], [norm_start, norm_end], [pred_start, pred_end], NONMATCH]
                 raw_norm_spans_corrected_for_pred_text.append(cur_item)
-                extended_spans.append(len(raw_norm_spans_corrected_for_pred_text) - 1)
+                extended_spans.add(len(raw_norm_spans_corrected_for_pred_text) - 1)
             idx += 1
         else:
             raw_norm_spans_corrected_for_pred_text.append(item)
@@ -255,6 +342,83 @@ def adjust_boundaries(norm_raw_diffs: Dict, norm_pred_diffs: Dict, raw: str, nor
     return semiotic_spans, pred_texts, norm_spans, raw_text_masked_list, raw_text_mask_idx
 
 
+class CERScorer:
+    """
+    Computes character error rate (CER) of normalization options with respect to the ASR prediction.
+    Edit distance is computed with the bit-parallel algorithm of the editdistance package. When only the best
+    options are needed, options that can't beat the current k best ones are skipped based on their length
+    and no full sort is done.
+
+    Args:
+        pred_text: ASR model transcript
+        remove_punct: whether to remove punctuation from the options before calculating CER
+    """
+
+    def __init__(self, pred_text: str, remove_punct: bool = False):
+        self.pred_text = pred_text
+        self.remove_punct = remove_punct
+
+    def clean(self, text: str) -> str:
+        """
+        Normalizes option before comparing it with the ASR prediction
+        """
+        text = text.replace('-', ' ').lower()
+        if self.remove_punct:
+            for punct in CER_PUNCT:
+                text = text.replace(punct, " ").replace("  ", " ")
+        return text
+
+    def distance(self, text: str) -> int:
+        """
+        Returns Levenshtein distance between the ASR prediction and text
+        """
+        return editdistance.eval(self.pred_text, text)
+
+    def score(self, normalized_texts: Iterable[str]) -> List[Tuple[str, float, int]]:
+        """
+        Calculates CER of every option
+
+        Args:
+            normalized_texts: normalized text options
+
+        Returns: options with their CER and index, in the input order
+        """
+        return [
+            (text, self.distance(self.clean(text)) * 100.0 / len(self.pred_text), i)
+            for i, text in enumerate(normalized_texts)
+        ]
+
+    def top_k(self, normalized_texts: Iterable[str], k: int = 1) -> List[Tuple[str, float, int]]:
+        """
+        Selects k options with the lowest CER without scoring options that can't be among them,
+        ties are resolved in favor of the option that comes first.
+
+        Args:
+            normalized_texts: normalized text options
+            k: number of options to return
+
+        Returns: up to k options with their CER and index, sorted by CER
+        """
+        if k < 1:
+            return []
+
+        m = len(self.pred_text)
+        # max-heap of the best options found so far: (-distance, -index, text)
+        best = []
+        for i, text in enumerate(normalized_texts):
+            text_clean = self.clean(text)
+            if len(best) == k and abs(len(text_clean) - m) >= -best[0][0]:
+                # edit distance is at least the difference in length
+                continue
+            dist = self.distance(text_clean)
+            if len(best) < k:
+                heapq.heappush(best, (-dist, -i, text))
+            elif dist < -best[0][0]:
+                heapq.heapreplace(best, (-dist, -i, text))
+
+        return [(text, -dist * 100.0 / m, -i) for dist, i, text in sorted(best, reverse=True)]
+
+
 def get_alignment(raw: str, norm: str, pred_text: str, verbose: bool = False):
     """
     Aligns raw text with deterministically normalized text and ASR output, finds semiotic spans
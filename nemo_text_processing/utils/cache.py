@@ -0,0 +1,154 @@
+# Copyright (c) 2024, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import sqlite3
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+from nemo_text_processing.utils.logging import logger
+
+
+class PersistentCache:
+    """
+    Bounded in-memory LRU cache that is optionally backed by a SQLite database on local disk. The database could be
+    shared by multiple processes, e.g. joblib workers, and reused between runs. Keys and values are stored as JSON,
+    so values read from disk have lists in place of tuples.
+
+    Args:
+        max_size: maximum number of entries to keep in memory, set to 0 to keep entries only on disk
+        path: path to a SQLite database file, set to None to keep entries only in memory
+        namespace: name of the table to store the entries in, e.g. to keep different caches in one file
+    """
+
+    def __init__(self, max_size: int = 10000, path: Optional[str] = None, namespace: str = "cache"):
+        self.max_size = max_size
+        self.path = path
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._connection = None
+        self._pid = None
+        if path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._connect()
+
+    def __getstate__(self) -> Dict:
+        # SQLite connections can't be shared between processes, every process opens its own one
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        state["_pid"] = None
+        return state
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        Returns the share of lookups that were found in the cache
+        """
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Returns cached value or None if key is not in the cache
+        """
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return self._memory[key]
+
+        value = None
+        if self.path is not None:
+            row = (
+                self._connect()
+                .execute(f"SELECT value FROM {self.namespace} WHERE key = ?", (self._serialize(key),))
+                .fetchone()
+            )
+            if row is not None:
+                value = json.loads(row[0])
+                self._remember(key, value)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        """
+        Adds value to the cache
+        """
+        self.update([(key, value)])
+
+    def update(self, items: Iterable[Tuple[Hashable, Any]]):
+        """
+        Adds multiple values to the cache, values are written to disk in a single transaction
+        """
+        rows = []
+        for key, value in items:
+            self._remember(key, value)
+            if self.path is not None:
+                rows.append((self._serialize(key), json.dumps(value, ensure_ascii=False)))
+
+        if rows:
+            connection = self._connect()
+            try:
+                with connection:
+                    connection.executemany(f"INSERT OR REPLACE INTO {self.namespace} (key, value) VALUES (?, ?)", rows)
+            except sqlite3.OperationalError as e:
+                # e.g. the database is locked by another process for too long, the entries stay in memory
+                logger.warning(f"Failed to save {len(rows)} cache entries to {self.path}: {e}")
+
+    def clear(self):
+        """
+        Removes all entries from memory and disk
+        """
+        self._memory.clear()
+        if self.path is not None:
+            with self._connect() as connection:
+                connection.execute(f"DELETE FROM {self.namespace}")
+
+    def _remember(self, key: Hashable, value: Any):
+        """
+        Adds value to the in-memory cache, the least recently used entries are removed
+        """
+        if self.max_size > 0:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            if len(self._memory) > self.max_size:
+                self._memory.popitem(last=False)
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Returns connection to the database of the current process
+        """
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=60)
+            self._pid = os.getpid()
+            # readers do not block the writer
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.namespace} (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    @staticmethod
+    def _serialize(key: Hashable) -> str:
+        return json.dumps(key, ensure_ascii=False)
@@ -14,7 +14,7 @@
 
 import pytest
 
-from nemo_text_processing.text_normalization.utils_audio_based import get_alignment
+from nemo_text_processing.text_normalization.utils_audio_based import CERScorer, get_alignment, get_matching_blocks
 
 
 class TestAudioBasedTNUtils:
@@ -34,3 +34,32 @@ class TestAudioBasedTNUtils:
             [1, 4],
         )
         assert output == reference
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_long_utterance(self):
+        raw = 'This is #4 ranking on G.S.K.T.'
+        pred_text = 'this iss for ranking on g k p'
+        norm = 'This is nubmer four ranking on GSKT'
+
+        assert get_matching_blocks(['a', 'b', 'c'], ['a', 'b', 'd', 'f']) == [(0, 0, 2), (3, 4, 0)]
+
+        n = 200
+        output = get_alignment(" ".join([raw] * n), " ".join([norm] * n), " ".join([pred_text] * n))
+        assert output[0] == ['is #4', 'G.S.K.T.'] * n
+        assert output[1] == ['iss for', 'g k p'] * n
+        assert output[2] == ['is nubmer four', 'GSKT'] * n
+        assert output[4] == [i * 5 + j for i in range(n) for j in [1, 4]]
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_cer_scorer(self):
+        pred_text = 'twenty twenty'
+        options = ['two thousand twenty', 'twenty-twenty', 'Twenty, twenty', 'twenty twenty']
+        scorer = CERScorer(pred_text, remove_punct=True)
+
+        scores = scorer.score(options)
+        assert [x[1] for x in scores] == [9 * 100.0 / 13, 0, 0, 0]
+        # ties are resolved in favor of the first option
+        assert scorer.top_k(options, k=2) == [('twenty-twenty', 0, 1), ('Twenty, twenty', 0, 2)]
+        assert scorer.top_k(options, k=10) == sorted(scores, key=lambda x: x[1])
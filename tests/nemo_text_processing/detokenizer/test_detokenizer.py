@@ -0,0 +1,57 @@
+# Copyright (c) 2024, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from parameterized import parameterized
+from sacremoses import MosesDetokenizer
+
+from nemo_text_processing.text_normalization.detokenizer import Detokenizer
+
+from ..utils import parse_test_case_file
+
+TEST_FILES = [
+    ("en", "en/data_text_normalization/test_cases_punctuation.txt"),
+    ("en", "en/data_text_normalization/test_cases_punctuation_match_input.txt"),
+    ("en", "en/data_text_normalization/test_cases_money.txt"),
+    ("de", "de/data_text_normalization/test_cases_measure.txt"),
+    ("fr", "fr/data_text_normalization/test_cases_word.txt"),
+    ("it", "it/data_text_normalization/test_cases_measure.txt"),
+    ("zh", "zh/data_text_normalization/test_cases_date.txt"),
+    ("ko", "ko/data_text_normalization/test_cases_cardinal.txt"),
+]
+
+
+class TestDetokenizer:
+    @parameterized.expand(TEST_FILES)
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_sacremoses_compatibility(self, lang, test_file):
+        moses_detokenizer = MosesDetokenizer(lang=lang)
+        detokenizer = Detokenizer(lang=lang, cache_size=0)
+        for written, spoken in parse_test_case_file(test_file):
+            spoken = spoken if isinstance(spoken, list) else [spoken]
+            for text in [written] + spoken:
+                text = text.replace(",", " , ").replace(".", " . ").replace('"', ' " ')
+                for unescape in [True, False]:
+                    expected = moses_detokenizer.detokenize([text], unescape=unescape)
+                    assert detokenizer.detokenize(text, unescape=unescape) == expected, f"|{text}|"
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_batch(self):
+        detokenizer = Detokenizer(lang="en", cache_size=2, check_compatibility=True)
+        texts = ['he said " hi " .', "it costs $ five .", 'he said " hi " .', "it 's john' s ( car ) ."]
+        expected = ['he said "hi".', "it costs $five.", 'he said "hi".', "it's john' s (car)."]
+        assert detokenizer.detokenize_batch(texts) == expected
+        assert len(detokenizer._cache) == 2
@@ -12,10 +12,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
+import os
+
 import pytest
 from parameterized import parameterized
 
 from nemo_text_processing.text_normalization.normalize_with_audio import NormalizerWithAudio
+from nemo_text_processing.utils.cache import PersistentCache
 
 from ..utils import CACHE_DIR, get_test_cases_multiple
 
@@ -34,3 +38,156 @@ class TestNormalizeWithAudio:
             assert len(set(pred).intersection(set(expected))) == len(
                 expected
             ), f'missing: {set(expected).difference(set(pred))}'
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_norm_with_pred_text(self):
+        text = "It costs $5 on Jan 5, 2020."
+        pred_text = "it costs five bucks on january fifth twenty twenty"
+        expected = "It costs five dollars on january fifth, twenty twenty."
+
+        stats = self.normalizer_with_audio_en.stats.copy()
+        pred = self.normalizer_with_audio_en.normalize(text, n_tagged=30, pred_text=pred_text, punct_post_process=True)
+        assert pred == expected
+        # deterministic options of the spans are taken from the normalized sentence
+        assert self.normalizer_with_audio_en.stats["deterministic_reused"] > stats["deterministic_reused"]
+
+        # options of the same spans are reused
+        stats = self.normalizer_with_audio_en.stats.copy()
+        pred = self.normalizer_with_audio_en.normalize(text, n_tagged=30, pred_text=pred_text, punct_post_process=True)
+        assert pred == expected
+        assert self.normalizer_with_audio_en.stats["options_cache_hits"] > stats["options_cache_hits"]
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_norm_with_pred_text_short_circuit(self):
+        text = "It costs $5 on Jan 5, 2020."
+        pred_text = "it costs five dollars on january fifth twenty twenty"
+        expected = "It costs five dollars on january fifth, twenty twenty."
+
+        # "$5" -> "five dollars" matches the ASR output, other options are not generated for the span
+        stats = self.normalizer_with_audio_en.stats.copy()
+        pred = self.normalizer_with_audio_en.normalize(text, n_tagged=30, pred_text=pred_text, punct_post_process=True)
+        assert pred == expected
+        assert self.normalizer_with_audio_en.stats["spans_short_circuited"] == stats["spans_short_circuited"] + 1
+
+        stats = self.normalizer_with_audio_en.stats.copy()
+        pred = self.normalizer_with_audio_en.normalize(
+            text, n_tagged=30, pred_text=pred_text, punct_post_process=True, deterministic_cer_threshold=-1
+        )
+        assert pred == expected
+        assert self.normalizer_with_audio_en.stats["spans_short_circuited"] == stats["spans_short_circuited"]
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_norm_pruned(self):
+        text = "They bought 23 books for $123.02."
+        expected = "They bought twenty three books for one hundred and twenty three dollars and two cents."
+
+        all_options = self.normalizer_with_audio_en.normalize(text, n_tagged=-1, punct_post_process=True)
+        pruned = self.normalizer_with_audio_en.normalize(text, n_tagged=-1, punct_post_process=True, prune_weight=0.5)
+        assert expected in pruned
+        assert pruned.issubset(all_options) and len(pruned) < len(all_options)
+
+        # the deterministic option is added on top of the budget
+        limited = self.normalizer_with_audio_en.normalize(text, n_tagged=-1, punct_post_process=True, max_options=5)
+        assert expected in limited
+        assert limited.issubset(all_options) and len(limited) <= 6
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_norm_manifest_resume(self, tmp_path, monkeypatch):
+        lines = [
+            {"id": i, "text": text, "pred_text": pred_text}
+            for i, (text, pred_text) in enumerate(
+                [
+                    ("It costs $5.", "it costs five bucks"),
+                    ("Call me at 5 pm.", "call me at five p m"),
+                    ("It was 1998.", "it was nineteen ninety eight"),
+                ]
+            )
+        ]
+        manifest = tmp_path / "manifest.json"
+        manifest.write_text("".join(json.dumps(line) + "\n" for line in lines))
+        output = tmp_path / "manifest_normalized.json"
+        normalizer = self.normalizer_with_audio_en
+        normalize_line = normalizer.normalize_line
+        normalized_texts = []
+
+        def _normalize_line(line, **kwargs):
+            text = json.loads(line)["text"]
+            if text.startswith("It was"):
+                raise RuntimeError("interrupted")
+            normalized_texts.append(text)
+            return normalize_line(line=line, **kwargs)
+
+        kwargs = dict(
+            manifest=str(manifest),
+            n_jobs=1,
+            punct_pre_process=False,
+            punct_post_process=True,
+            batch_size=2,
+            output_filename=str(output),
+            n_tagged=30,
+        )
+        monkeypatch.setattr(normalizer, "normalize_line", _normalize_line)
+        with pytest.raises(RuntimeError):
+            normalizer.normalize_manifest(**kwargs)
+        assert os.path.exists(tmp_path / "manifest_normalized_parts" / "000000.json")
+
+        # the first shard is not normalized again
+        monkeypatch.setattr(normalizer, "normalize_line", normalize_line)
+        normalizer.normalize_manifest(**kwargs)
+        assert normalized_texts == ["It costs $5.", "Call me at 5 pm."]
+        with open(output) as f:
+            normalized = [json.loads(line) for line in f]
+        assert [line["id"] for line in normalized] == [0, 1, 2]
+        assert normalized[0]["normalized"] == "It costs five dollars."
+        assert not os.path.exists(tmp_path / "manifest_normalized_parts")
+
+        with open(tmp_path / "manifest_normalized_stats.jsonl") as f:
+            stats = [json.loads(line) for line in f]
+        assert [x["shard"] for x in stats] == [0, 1] and [x["lines"] for x in stats] == [2, 1]
+
+        # already normalized lines are copied from the output
+        monkeypatch.setattr(normalizer, "normalize_line", _normalize_line)
+        normalizer.normalize_manifest(id_field="id", **kwargs)
+        with open(tmp_path / "manifest_normalized_stats.jsonl") as f:
+            assert sum(json.loads(line)["reused"] for line in f) == 3
+
+        # shards of a run with another batch size are not reused
+        normalized_texts.clear()
+        output.unlink()
+        with pytest.raises(RuntimeError):
+            normalizer.normalize_manifest(**kwargs)
+        normalized_texts.clear()
+
+        def _record_line(line, **kwargs):
+            normalized_texts.append(json.loads(line)["text"])
+            return normalize_line(line=line, **kwargs)
+
+        monkeypatch.setattr(normalizer, "normalize_line", _record_line)
+        normalizer.normalize_manifest(**{**kwargs, "batch_size": 1})
+        assert normalized_texts == ["It costs $5.", "Call me at 5 pm.", "It was 1998."]
+        with open(output) as f:
+            assert [json.loads(line)["id"] for line in f] == [0, 1, 2]
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_norm_options_disk_cache(self, tmp_path, monkeypatch):
+        normalizer = self.normalizer_with_audio_en
+        cache_path = str(tmp_path / "options.db")
+        text = "It costs $5."
+
+        monkeypatch.setattr(normalizer, "options_cache", PersistentCache(path=cache_path, namespace="options"))
+        expected = normalizer.normalize(text, n_tagged=10, punct_post_process=True)
+        assert normalizer.options_cache.misses == 1
+
+        # options are read from disk, e.g. by another process
+        monkeypatch.setattr(
+            normalizer, "options_cache", PersistentCache(max_size=0, path=cache_path, namespace="options")
+        )
+        stats = normalizer.stats.copy()
+        assert normalizer.normalize(text, n_tagged=10, punct_post_process=True) == expected
+        assert normalizer.options_cache.hit_rate == 1
+        assert normalizer.stats["options_cache_hits"] == stats["options_cache_hits"] + 1
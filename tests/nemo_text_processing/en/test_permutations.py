@@ -0,0 +1,47 @@
+# Copyright (c) 2024, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import OrderedDict
+
+import pytest
+
+from nemo_text_processing.text_normalization.normalize import Normalizer
+
+from ..utils import CACHE_DIR
+
+
+class TestPermutations:
+    normalizer_en = Normalizer(
+        input_case='cased', lang='en', cache_dir=CACHE_DIR, overwrite_cache=False, post_process=True
+    )
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_generate_permutations_order(self):
+        tokens = [
+            OrderedDict([("tokens", OrderedDict([("name", "on")]))]),
+            OrderedDict([("tokens", OrderedDict([("date", OrderedDict([("month", "june"), ("day", "five")]))]))]),
+        ]
+        expected = [
+            ' tokens { name: "on"  }  tokens {  date { month: "june" day: "five"  }  } ',
+            ' tokens { name: "on"  }  tokens {  date { day: "five" month: "june"  }  } ',
+        ]
+        assert list(self.normalizer_en.generate_permutations(tokens)) == expected
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_long_input(self):
+        tokens = [OrderedDict([("tokens", OrderedDict([("name", "word")]))])] * 5000
+        permutations = list(self.normalizer_en.generate_permutations(tokens))
+        assert permutations == [' tokens { name: "word"  } ' * 5000]
@@ -15,6 +15,7 @@
 import pytest
 from parameterized import parameterized
 
+from nemo_text_processing.text_normalization.data_loader_utils import post_process_punct
 from nemo_text_processing.text_normalization.normalize import Normalizer
 
 from ..utils import CACHE_DIR, parse_test_case_file
@@ -43,3 +44,11 @@ class TestPunctuation:
     def test_norm_python_punct_post_process(self, test_input, expected):
         pred = self.normalizer_en.normalize(test_input, verbose=True, punct_post_process=True)
         assert pred == expected, f"for input |{test_input}|: pred: |{pred}| != expected: |{expected}|"
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_post_process_punct_unicode(self):
+        text = 'He said «hello» — twice.'
+        normalized_text = 'He said « hello » — twice .'
+        assert post_process_punct(text, normalized_text) == 'He said « hello » — twice.'
+        assert post_process_punct(text, normalized_text, add_unicode_punct=True) == text
@@ -40,3 +40,36 @@ class TestTextSentenceSplit:
         for s, gt in zip(sentences, gt_sentences):
             print(s, gt)
         assert gt_sentences == sentences
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_text_sentence_split_stream(self):
+        text = "This is an example. He paid $123 for this desk.  It cost Mr. Smith $5 on Dec. 1. 2020. And Jan. 17th."
+        chunks = [text[i : i + 7] for i in range(0, len(text), 7)]
+        sentences = list(self.normalizer_en.sentence_splitter.iter_sentences(iter(chunks)))
+        assert [s for s, _, _ in sentences] == self.normalizer_en.split_text_into_sentences(text)
+        assert [text[start:end] for _, start, end in sentences] == [
+            'This is an example.',
+            'He paid $123 for this desk.',
+            'It cost Mr. Smith $5 on Dec. 1. 2020.',
+            'And Jan. 17th.',
+        ]
+
+        normalized = list(self.normalizer_en.normalize_stream(iter(chunks), batch_size=2, n_jobs=2))
+        assert normalized == [
+            ('This is an example.', 0, 19),
+            ('He paid one hundred and twenty three dollars for this desk.', 20, 47),
+            ('It cost mister Smith five dollars on december first. twenty twenty.', 49, 86),
+            ('And january seventeenth.', 87, 101),
+        ]
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_text_sentence_split_stream_max_buffer_length(self):
+        text = "word " * 1000 + "The end."
+        chunks = [text[i : i + 100] for i in range(0, len(text), 100)]
+        sentences = list(self.normalizer_en.sentence_splitter.iter_sentences(iter(chunks), max_buffer_length=1000))
+        assert len(sentences) > 1
+        assert all(len(s) <= 1100 for s, _, _ in sentences)
+        assert " ".join(s for s, _, _ in sentences) == text
+        assert all(text[start:end] == s for s, start, end in sentences)
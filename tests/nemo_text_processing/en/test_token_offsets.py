@@ -0,0 +1,86 @@
+# Copyright (c) 2024, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pynini
+import pytest
+from pynini.lib import pynutil
+
+from nemo_text_processing.text_normalization.normalize import Normalizer
+from nemo_text_processing.text_normalization.token_offsets import get_shortest_path, get_token_spans, map_spans
+
+from ..utils import CACHE_DIR
+
+
+def _aligned(text, output, spans):
+    return [(text[a:b], output[c:d]) for (a, b), (c, d) in spans]
+
+
+class TestTokenOffsets:
+    normalizer_en = Normalizer(
+        input_case='cased', lang='en', cache_dir=CACHE_DIR, overwrite_cache=False, post_process=True
+    )
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_normalize_offsets(self):
+        text = "Zürich is 12 kg [heavy] on Jan. 5, 2012."
+        output, spans = self.normalizer_en.normalize(text, return_offsets=True)
+        assert output == self.normalizer_en.normalize(text)
+        assert _aligned(text, output, spans) == [
+            ("Zürich", "Zürich"),
+            ("is", "is"),
+            ("12 kg", "twelve kilograms"),
+            ("[heavy]", "[heavy]"),
+            ("on", "on"),
+            ("Jan. 5, 2012", "january fifth, twenty twelve"),
+            (".", "."),
+        ]
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_normalize_offsets_punct_process(self):
+        text = "  It costs $5 [approx]."
+        output, spans = self.normalizer_en.normalize(
+            text, punct_pre_process=True, punct_post_process=True, return_offsets=True
+        )
+        assert output == "It costs five dollars [approx]."
+        assert _aligned(text, output, spans) == [
+            ("It", "It"),
+            ("costs", "costs"),
+            ("$5", "five dollars"),
+            ("[", "["),
+            ("approx", "approx"),
+            ("]", "]"),
+            (".", "."),
+        ]
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_get_token_spans_non_ascii(self):
+        # toy tagger that reads words of a non-ASCII alphabet and tags every word as a token
+        word = pynini.union(*"абвгдеёжзийклмнопрстуфхцчшщъыьэюя").plus
+        token = pynutil.insert("tokens { name: \"") + word + pynutil.insert("\" }")
+        tagger = (token + (pynini.cross(" ", " ") + token).star).optimize()
+        text = "три кота"
+        tagged, labels = get_shortest_path(text @ tagger)
+        assert tagged == 'tokens { name: "три" } tokens { name: "кота" }'
+        assert get_token_spans(text, labels, tagged, 2, tokens_on_input=False) == [(0, 3), (4, 8)]
+        assert get_token_spans(text, labels, tagged, 3, tokens_on_input=False) is None
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_map_spans(self):
+        source = "a  b , c"
+        target = "a b, c"
+        assert map_spans(source, target, [(0, 1), (3, 4), (5, 6), (7, 8)]) == [(0, 1), (2, 3), (3, 4), (5, 6)]
@@ -80,3 +80,39 @@ class TestWhitelist:
                 test_input, n_tagged=10, punct_post_process=False
             )
             assert expected in pred_non_deterministic
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_norm_whitelist_lookup(self, monkeypatch):
+        # whitelisted input bypasses the grammars, the output should be the same as with the tagger and verbalizer
+        entries = list(self.normalizer_en.whitelist_lookup)[::100] + ["&", "Dr.", "e.g."]
+        preds = [self.normalizer_en.normalize(x, punct_post_process=True) for x in entries]
+        assert "A.B.C." not in self.normalizer_en.whitelist_lookup
+
+        monkeypatch.setattr(self.normalizer_en, "whitelist_lookup", {})
+        expected = [self.normalizer_en.normalize(x, punct_post_process=True) for x in entries]
+        assert preds == expected
+
+    normalizer_user_whitelist = Normalizer(input_case='cased', cache_dir=CACHE_DIR, overwrite_cache=False)
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_norm_user_whitelist(self, tmp_path):
+        text = "NVIDIA, Dr. Smith paid $5 for the GPUs."
+        expected = "NVIDIA, doctor Smith paid five dollars for the GPU's."
+        assert self.normalizer_user_whitelist.normalize(text) == expected
+
+        whitelist = tmp_path / "whitelist.tsv"
+        whitelist.write_text("NVIDIA\ten vidia\nDr.\tdrive\n$5\tfive bucks\n")
+        self.normalizer_user_whitelist.load_user_whitelist(str(whitelist))
+        pred = self.normalizer_user_whitelist.normalize(text)
+        assert pred == "en vidia, drive Smith paid five bucks for the GPU's."
+
+        whitelist_updated = tmp_path / "whitelist_updated.tsv"
+        whitelist_updated.write_text("GPUs\tgraphics cards\n")
+        self.normalizer_user_whitelist.load_user_whitelist(str(whitelist_updated))
+        pred = self.normalizer_user_whitelist.normalize(text)
+        assert pred == "NVIDIA, doctor Smith paid five dollars for the graphics cards."
+
+        self.normalizer_user_whitelist.load_user_whitelist(None)
+        assert self.normalizer_user_whitelist.normalize(text) == expected
@@ -0,0 +1,185 @@
+# Copyright (c) 2024, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import string
+from functools import lru_cache
+from glob import glob
+
+import pynini
+import pytest
+
+from nemo_text_processing.fst_alignment.alignment import (
+    UTF8_TOKEN_TYPE,
+    Aligner,
+    create_symbol_table,
+    decode_labels,
+    get_string_alignment,
+    indexed_map_to_output,
+    remove,
+)
+from nemo_text_processing.text_normalization.normalize import Normalizer
+
+from ..utils import CACHE_DIR, parse_test_case_file
+
+# input case of the deterministic TN grammars used in the language tests
+TN_INPUT_CASE = {
+    "ar": "cased",
+    "de": "cased",
+    "en": "cased",
+    "es": "cased",
+    "fr": "cased",
+    "hi": "cased",
+    "hu": "cased",
+    "hy": "lower_cased",
+    "it": "cased",
+    "ja": "cased",
+    "ko": "lower_cased",
+    "pt": "cased",
+    "rw": "cased",
+    "sv": "cased",
+    "vi": "cased",
+    "zh": "cased",
+}
+
+
+@lru_cache(maxsize=None)
+def get_tn_normalizer(lang: str) -> Normalizer:
+    """
+    Returns deterministic TN normalizer of the language, grammars of every language are built once
+    """
+    return Normalizer(input_case=TN_INPUT_CASE[lang], lang=lang, cache_dir=CACHE_DIR, overwrite_cache=False)
+
+
+def get_tn_test_inputs(lang: str):
+    """
+    Returns texts of the TN test cases of the language, both columns are returned as their order differs between files
+    """
+    tests_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    inputs = []
+    for file_name in sorted(glob(os.path.join(tests_dir, lang, "data_text_normalization", "test_cases_*.txt"))):
+        if file_name.endswith("normalize_with_audio.txt"):
+            continue
+        for first, second in parse_test_case_file(os.path.relpath(file_name, tests_dir)):
+            inputs.append(first)
+            inputs.extend(second if isinstance(second, list) else [second])
+    return list(dict.fromkeys(x for x in inputs if x.strip()))
+
+
+class TestAlignment:
+    sigma = pynini.union(
+        *map(pynini.escape, string.ascii_letters + string.digits + string.punctuation + " ")
+    ).closure()
+    fst = pynini.cdrewrite(pynini.string_map([("1", "one"), ("2", "two"), ("$", "dollars")]), "", "", sigma)
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_map_words(self):
+        aligner = Aligner(fst=self.fst)
+        text = "I have 2 cats and 1 dog"
+        _, output_text, input_spans, output_spans = next(aligner.map_words([text]))
+        assert output_text == "I have two cats and one dog"
+        mapped = [(text[s:e], output_text[os:oe]) for (s, e), (os, oe) in zip(input_spans, output_spans)]
+        assert mapped == [
+            ("I", "I"),
+            ("have", "have"),
+            ("2", "two"),
+            ("cats", "cats"),
+            ("and", "and"),
+            ("1", "one"),
+            ("dog", "dog"),
+        ]
+
+        # the same mapping as for a single span
+        alignment, _ = get_string_alignment(fst=self.fst, input_text=text, symbol_table=create_symbol_table())
+        for (start, end), output_span in zip(input_spans, output_spans):
+            assert indexed_map_to_output(alignment, start, end, mode="tn") == output_span
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_decode_labels(self):
+        labels = list("aü 中".encode("utf-8"))
+        assert decode_labels(labels) == [ord("a"), 0, ord("ü"), ord(" "), 0, 0, ord("中")]
+        assert decode_labels([0] + labels[:2] + [0] + labels[2:3]) == [0, ord("a"), 0, 0, ord("ü")]
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    @pytest.mark.parametrize("token_type", ["byte", UTF8_TOKEN_TYPE])
+    def test_map_words_non_ascii(self, token_type):
+        chars = pynini.union(*[pynini.accep(x, token_type=token_type) for x in "авдикотуяжин 12中文"])
+        digits = pynini.string_map(
+            [("1", "один"), ("2", "два")], input_token_type=token_type, output_token_type=token_type
+        )
+        fst = pynini.cdrewrite(digits, "", "", chars.closure())
+        aligner = Aligner(fst=fst, token_type=token_type)
+        text = "я вижу 2 кота и 1 中文"
+        _, output_text, input_spans, output_spans = next(aligner.map_words([text]))
+        assert output_text == "я вижу два кота и один 中文"
+        mapped = [(text[s:e], output_text[os:oe]) for (s, e), (os, oe) in zip(input_spans, output_spans)]
+        assert mapped == [
+            ("я", "я"),
+            ("вижу", "вижу"),
+            ("2", "два"),
+            ("кота", "кота"),
+            ("и", "и"),
+            ("1", "один"),
+            ("中文", "中文"),
+        ]
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    @pytest.mark.parametrize(
+        "lang,text,spans,expected",
+        [
+            # Latin
+            ("en", "I have 2 cats and 10 dogs", None, ["I", "have", "two", "cats", "and", "ten", "dogs"]),
+            ("en", "It costs $5.", [(9, 10), (10, 11)], ["dollars", "five"]),
+            # Cyrillic words pass through the English grammar
+            ("en", "у меня 2 кошки и 10 собак", None, ["у", "меня", "two", "кошки", "и", "ten", "собак"]),
+            ("en", "Москва 3 km", None, ["Москва", "three", "kilometers"]),
+            # CJK texts are not split by whitespace
+            ("zh", "我有2只猫", [(2, 3)], ["二"]),
+            ("zh", "今天是2024年1月5日", [(3, 7), (8, 9), (10, 11)], ["二零二四", "一", "五"]),
+            ("ja", "猫が2匹います", [(2, 3)], ["二"]),
+            # Devanagari vowel signs belong to the words
+            ("hi", "राम के 3 बेटे हैं", None, ["राम", "के", "तीन", "बेटे", "हैं"]),
+            ("hi", "यह ₹5 का है", [(3, 4), (4, 5)], ["रुपए", "पाँच"]),
+        ],
+    )
+    def test_align_scripts(self, lang, text, spans, expected):
+        aligner = Aligner(fst=get_tn_normalizer(lang).tagger.fst)
+        output_text, _, output_spans = aligner.map_spans(text, spans)
+        assert [output_text[start:end] for start, end in output_spans] == expected
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    @pytest.mark.skipif(
+        CACHE_DIR is None,
+        reason="builds the grammars of all languages, run with --tn_cache_dir to use cached grammars",
+    )
+    @pytest.mark.parametrize("lang", sorted(TN_INPUT_CASE))
+    def test_align_tn_test_cases(self, lang):
+        normalizer = get_tn_normalizer(lang)
+        aligner = Aligner(fst=normalizer.tagger.fst)
+        for text in get_tn_test_inputs(lang):
+            index = aligner.align(text)
+            assert "".join(remove(x) for x, _ in index.alignment) == text
+            # output characters are decoded from the labels of the tagger path
+            normalizer.parser(index.output_text)
+            assert len(normalizer.parser.parse()) > 0
+
+            _, input_spans, output_spans = aligner.map_spans(text)
+            assert len(input_spans) == len(output_spans)
+            for start, end in output_spans:
+                assert 0 <= start <= end <= len(index.output_text)
@@ -0,0 +1,96 @@
+# Copyright (c) 2024, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+import pytest
+
+from nemo_text_processing.hybrid import hybrid_normalizer
+from nemo_text_processing.hybrid.hybrid_normalizer import HybridNormalizer
+from nemo_text_processing.hybrid.ngram_scorer import NGramScorer
+
+from .test_ngram_scorer import ARPA
+
+
+def _init_worker(normalizer_kwargs):
+    pass
+
+
+def _get_options(text, n_tagged, delta, punct_post_process):
+    """
+    WFST options stand-in, every third text takes longer to make the workers finish out of order
+    """
+    if text == "fail":
+        raise ValueError("normalization failed")
+    if int(text[1:]) % 3 == 0:
+        time.sleep(0.05)
+    return [f"< dog > {text}", f"< the > {text}"], [0.0, 0.0]
+
+
+class TestHybridNormalizer:
+    @pytest.fixture
+    def normalizer(self, tmp_path, monkeypatch):
+        # forked workers use the stand-ins of the WFST normalizer
+        monkeypatch.setattr(hybrid_normalizer, "_init_worker", _init_worker)
+        monkeypatch.setattr(hybrid_normalizer, "_get_options", _get_options)
+        lm_path = tmp_path / "lm.arpa"
+        lm_path.write_text(ARPA, encoding="utf-8")
+        with HybridNormalizer(
+            scorer=NGramScorer(str(lm_path)), n_jobs=2, queue_size=3, batch_size=2, mp_context="fork"
+        ) as normalizer:
+            yield normalizer
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_normalize_stream_order(self, normalizer):
+        texts = [f"t{i}" for i in range(20)]
+        assert list(normalizer.normalize_stream(texts)) == [f"the {text}" for text in texts]
+        assert normalizer.normalize("t1") == "the t1"
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_normalize_stream_backpressure(self, normalizer):
+        n_read = 0
+
+        def _texts():
+            nonlocal n_read
+            for i in range(20):
+                n_read += 1
+                yield f"t{i}"
+
+        results = []
+        for normalized in normalizer.normalize_stream(_texts()):
+            results.append(normalized)
+            time.sleep(0.01)
+            assert n_read <= len(results) + normalizer.queue_size
+        assert len(results) == 20
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_normalize_stream_errors(self, normalizer):
+        results = []
+        with pytest.raises(ValueError, match="normalization failed"):
+            for normalized in normalizer.normalize_stream(["t1", "fail", "t2"]):
+                results.append(normalized)
+        assert results == ["the t1"]
+
+        def _texts():
+            yield "t1"
+            raise RuntimeError("input failed")
+
+        with pytest.raises(RuntimeError, match="input failed"):
+            list(normalizer.normalize_stream(_texts()))
+
+        # the workers are still usable
+        assert list(normalizer.normalize_stream(["t4", "t5"])) == ["the t4", "the t5"]
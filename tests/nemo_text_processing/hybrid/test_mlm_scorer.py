@@ -0,0 +1,190 @@
+# Copyright (c) 2024, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from nemo_text_processing.hybrid.mlm_scorer import MLMScorer
+
+VOCAB = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + (
+    "the a cat dog sat on mat it costs five dollars twenty three street saint st one two . ,".split()
+)
+SENTENCES = [
+    "the cat sat",
+    "it costs twenty three dollars",
+    "a",
+    "the dog sat on the mat , it costs five dollars . the cat sat on the mat , it costs two dollars .",
+]
+
+
+def _save_tiny_mlm(path: str, seed: int = 0):
+    """
+    saves a randomly initialized tiny BERT with a word level vocabulary
+    """
+    with open(f"{path}/vocab.txt", "w") as f:
+        f.write("\n".join(VOCAB) + "\n")
+    transformers.BertTokenizerFast(f"{path}/vocab.txt").save_pretrained(path)
+    torch.manual_seed(seed)
+    config = transformers.BertConfig(
+        vocab_size=len(VOCAB),
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+        max_position_embeddings=64,
+    )
+    transformers.BertForMaskedLM(config).save_pretrained(path)
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory):
+    path = tmp_path_factory.mktemp("tiny_mlm")
+    _save_tiny_mlm(str(path))
+    return str(path)
+
+
+def _score_one_by_one(model_dir: str, sentence: str) -> float:
+    """
+    reference MLM score of the sentence, every masked copy is scored by the model separately without padding
+    """
+    tokenizer = transformers.AutoTokenizer.from_pretrained(model_dir, use_fast=False)
+    model = transformers.AutoModelForMaskedLM.from_pretrained(model_dir).eval()
+    token_ids = tokenizer.convert_tokens_to_ids(tokenizer.tokenize(sentence))
+    score = 0.0
+    for i, token_id in enumerate(token_ids):
+        masked = token_ids.copy()
+        masked[i] = tokenizer.mask_token_id
+        input_ids = torch.tensor([[tokenizer.cls_token_id] + masked + [tokenizer.sep_token_id]])
+        with torch.no_grad():
+            logits = model(input_ids=input_ids).logits
+        score += torch.log_softmax(logits[0, i + 1], dim=-1)[token_id].item()
+    return score
+
+
+class TestMLMScorer:
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_batched_scores(self, model_dir):
+        expected = [_score_one_by_one(model_dir, sentence) for sentence in SENTENCES]
+        # masked copies of sentences of different lengths are scored in padded batches
+        for batch_size in [1, 3, 64]:
+            scorer = MLMScorer(model_dir, batch_size=batch_size, cache_size=0)
+            assert scorer.score_sentences(SENTENCES) == pytest.approx(expected, abs=1e-4)
+        assert scorer.score_sentence(SENTENCES[1]) == pytest.approx(expected[1], abs=1e-4)
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_backends(self, model_dir):
+        scores = MLMScorer(model_dir, batch_size=4).score_sentences(SENTENCES)
+
+        scorer = MLMScorer(model_dir, batch_size=4, backend="torchscript")
+        assert scorer.score_sentences(SENTENCES) == pytest.approx(scores, abs=1e-4)
+        # inputs of different lengths are padded to different shapes and traced separately
+        assert len(scorer._traced) > 1
+
+        int8_scores = MLMScorer(model_dir, batch_size=4, backend="int8").score_sentences(SENTENCES)
+        assert int8_scores == pytest.approx(scores, rel=0.01)
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_diff_positions(self):
+        sentences = [[1, 2, 3, 4], [1, 2, 9, 4], [1, 2, 3, 7, 8, 4]]
+        # replaced and inserted tokens, and the tokens around them within the window
+        assert MLMScorer._get_diff_positions(sentences, window=0) == [[2], [2], [2, 3, 4]]
+        assert MLMScorer._get_diff_positions(sentences, window=1) == [[1, 2, 3], [1, 2, 3], [1, 2, 3, 4, 5]]
+        # only the context of the deleted token is scored in the shorter sentence
+        assert MLMScorer._get_diff_positions([[1, 2, 3, 4, 5], [1, 2, 4, 5]], window=1) == [[1, 2, 3], [1, 2]]
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_score_sentence_groups(self, model_dir):
+        groups = [
+            ["the cat sat on the mat", "the dog sat on the mat", "a cat sat on a mat"],
+            [
+                "it costs twenty three dollars",
+                "it costs twenty three",
+                "it costs two dollars",
+                "it costs one two three dollars .",
+            ],
+            ["saint street", "st street", "street"],
+        ]
+        # full MLM scores of every sentence, every masked copy is scored separately
+        reference = [[_score_one_by_one(model_dir, sentence) for sentence in group] for group in groups]
+        scorer = MLMScorer(model_dir, batch_size=8, cache_size=0)
+
+        # all tokens are scored if the window covers the sentences
+        group_scores = scorer.score_sentence_groups(groups, window=100)
+        for scores, expected in zip(group_scores, reference):
+            assert scores == pytest.approx(expected, abs=1e-4)
+
+        # the options are ranked the same way as by the full scores, substituted tokens are scored separately
+        for window in [0, 1]:
+            group_scores = scorer.score_sentence_groups(groups, window=window)
+            for scores, expected in zip(group_scores, reference):
+                assert len(set(round(x, 4) for x in scores)) == len(scores)
+                assert sorted(range(len(scores)), key=lambda i: scores[i]) == sorted(
+                    range(len(expected)), key=lambda i: expected[i]
+                )
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    @pytest.mark.parametrize("cache_size", [0, 100])
+    def test_substituted_tokens(self, model_dir, cache_size):
+        # options that differ by one token share the masked text of that token, but not its score
+        sentences = ["the cat sat on the mat", "the dog sat on the mat", "a cat sat on the mat"]
+        expected = [_score_one_by_one(model_dir, sentence) for sentence in sentences]
+        assert len(set(round(x, 4) for x in expected)) == len(sentences)
+
+        scorer = MLMScorer(model_dir, batch_size=4, cache_size=cache_size)
+        assert scorer.score_sentences(sentences) == pytest.approx(expected, abs=1e-4)
+        # the scores of the previous call are reused for the masked copies of the same sentences
+        assert scorer.score_sentences(sentences[::-1]) == pytest.approx(expected[::-1], abs=1e-4)
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_cache(self, model_dir, tmp_path, monkeypatch):
+        cache_path = str(tmp_path / "scores.db")
+        other_model_dir = tmp_path / "other_mlm"
+        other_model_dir.mkdir()
+        _save_tiny_mlm(str(other_model_dir), seed=1)
+
+        def _scores(scorer):
+            """returns scores and the number of forward passes"""
+            n_passes = 0
+            forward = scorer._forward
+
+            def _forward(*args):
+                nonlocal n_passes
+                n_passes += 1
+                return forward(*args)
+
+            monkeypatch.setattr(scorer, "_forward", _forward)
+            return scorer.score_sentences(SENTENCES), n_passes
+
+        scorer = MLMScorer(model_dir, batch_size=4, cache_path=cache_path)
+        scores, n_passes = _scores(scorer)
+        assert n_passes > 0
+        assert _scores(scorer) == (scores, 0)
+        # scores are read from disk by a new scorer of the same model and backend
+        assert _scores(MLMScorer(model_dir, batch_size=4, cache_path=cache_path)) == (scores, 0)
+
+        # other backends and models don't reuse the scores
+        for other in [
+            MLMScorer(model_dir, batch_size=4, cache_path=cache_path, backend="int8"),
+            MLMScorer(str(other_model_dir), batch_size=4, cache_path=cache_path),
+        ]:
+            other_scores, n_passes = _scores(other)
+            assert n_passes > 0 and other_scores != scores
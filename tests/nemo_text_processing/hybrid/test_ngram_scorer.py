@@ -0,0 +1,77 @@
+# Copyright (c) 2024, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+
+import pytest
+
+from nemo_text_processing.hybrid import model_utils
+from nemo_text_processing.hybrid.ngram_scorer import NGramScorer
+
+ARPA = """
+\\data\\
+ngram 1=5
+ngram 2=3
+
+\\1-grams:
+-1.0\t<s>\t-0.5
+-0.7\t</s>
+-0.8\tthe\t-0.3
+-1.2\tcat\t-0.2
+-1.5\t<unk>
+
+\\2-grams:
+-0.2\t<s> the
+-0.4\tthe cat
+-0.1\tcat </s>
+
+\\end\\
+"""
+
+
+class TestNGramScorer:
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_score_sentences(self, tmp_path):
+        lm_path = tmp_path / "lm.arpa"
+        lm_path.write_text(ARPA, encoding="utf-8")
+        scorer = NGramScorer(str(lm_path))
+
+        scores = scorer.score_sentences(["the cat", "cat the dog", ""])
+        expected = [
+            -0.2 - 0.4 - 0.1,
+            # back-off from <s>, cat and the, dog is unknown
+            (-0.5 - 1.2) + (-0.2 - 0.8) + (-0.3 - 1.5) + -0.7,
+            -0.5 - 0.7,
+        ]
+        assert scores == pytest.approx([x * math.log(10) for x in expected], abs=1e-5)
+
+        npz_path = str(tmp_path / "lm.npz")
+        scorer.save(npz_path)
+        assert NGramScorer(npz_path, do_lower=True).score_sentences(["The cat"]) == pytest.approx(scores[:1])
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_init_models_ngram(self, tmp_path):
+        lm_path = tmp_path / "lm.arpa"
+        lm_path.write_text(ARPA, encoding="utf-8")
+        model_name = f"{model_utils.NGRAM_PREFIX}{lm_path}"
+        models = model_utils.init_models(model_name)
+        assert isinstance(models[model_name], NGramScorer)
+        assert isinstance(models[model_name], model_utils.Scorer)
+
+        # lower scores are better, the spans of the option with the best score are scored in context
+        options = ["< the > cat", "< cat > cat", "< dog > cat"]
+        scores = model_utils.score_options(options, context_len=None, model=models[model_name])
+        assert scores.index(min(scores)) == 0
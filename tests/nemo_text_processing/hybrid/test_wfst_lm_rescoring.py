@@ -0,0 +1,126 @@
+# Copyright (c) 2024, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import pytest
+
+from nemo_text_processing.hybrid import wfst_lm_rescoring
+
+from .test_ngram_scorer import ARPA
+
+# examples in the "<text>~~<label>" format of utils.iter_data(), the n-gram LM prefers "the cat"
+DATA = """the 1~~RAW
+the cat~~1
+the dog~~0
+
+the 2~~RAW
+the cat~~1
+
+the 3~~RAW
+the cat~~1
+the dog~~0
+"""
+
+
+class _Normalizer:
+    """
+    WFST normalizer stand-in, counts normalized texts
+    """
+
+    n_calls = 0
+
+    def __init__(self, **kwargs):
+        pass
+
+    def normalize(self, text, n_tagged, punct_post_process):
+        _Normalizer.n_calls += 1
+        return ["the <dog>", "the <cat>"], [0.0, 0.1]
+
+
+class TestWFSTLMRescoring:
+    @pytest.fixture
+    def run(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(wfst_lm_rescoring, "NormalizerWithAudio", _Normalizer)
+        monkeypatch.setattr(_Normalizer, "n_calls", 0)
+        data_path = tmp_path / "data.txt"
+        data_path.write_text(DATA, encoding="utf-8")
+        lm_path = tmp_path / "lm.arpa"
+        lm_path.write_text(ARPA, encoding="utf-8")
+        work_dir = str(tmp_path / "work_dir")
+
+        def _run(*args):
+            argv = ["--data", str(data_path), "--model_name", f"ngram:{lm_path}", "--work_dir", work_dir]
+            return wfst_lm_rescoring.main(argv + ["--n_jobs", "1", "--batch_size", "2", *args])
+
+        _run.work_dir = work_dir
+        return _run
+
+    @staticmethod
+    def _count_calls(monkeypatch, module, name):
+        """counts calls of the module function"""
+        calls = []
+        f = getattr(module, name)
+
+        def _f(*args, **kwargs):
+            calls.append(args)
+            return f(*args, **kwargs)
+
+        monkeypatch.setattr(module, name, _f)
+        return calls
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_resume(self, run, monkeypatch):
+        get_labels = wfst_lm_rescoring.utils.get_labels
+
+        def _interrupted(targets, **kwargs):
+            # labeling of the second shard is interrupted after its WFST options are written
+            if len(targets) == 1:
+                raise KeyboardInterrupt
+            return get_labels(targets, **kwargs)
+
+        monkeypatch.setattr(wfst_lm_rescoring.utils, "get_labels", _interrupted)
+        with pytest.raises(KeyboardInterrupt):
+            run()
+        assert _Normalizer.n_calls == 3
+        assert sorted(os.listdir(os.path.join(run.work_dir, "wfst"))) == ["00000.jsonl", "00001.jsonl"]
+        assert os.listdir(os.path.join(run.work_dir, "labeled_0.2")) == ["00000.jsonl"]
+        (ranked_dir,) = [x for x in os.listdir(run.work_dir) if x.startswith("ranked_")]
+        assert os.listdir(os.path.join(run.work_dir, ranked_dir)) == ["00000.jsonl"]
+
+        # only the missing stages are run when the run is restarted with the same settings
+        monkeypatch.setattr(wfst_lm_rescoring.utils, "get_labels", get_labels)
+        labeled = self._count_calls(monkeypatch, wfst_lm_rescoring.utils, "get_labels")
+        ranked = self._count_calls(monkeypatch, wfst_lm_rescoring, "_rank_example")
+        assert run() is True
+        assert _Normalizer.n_calls == 3
+        assert len(labeled) == 1 and len(ranked) == 1
+        assert run() is True
+        assert len(labeled) == 1 and len(ranked) == 1
+
+        # only the dog options are left with the smaller threshold, the WFST options are reused
+        assert run("--threshold", "0.05") is False
+        ranked_dirs = [x for x in os.listdir(run.work_dir) if x.startswith("ranked_")]
+        assert _Normalizer.n_calls == 3
+        assert len(labeled) == 3 and len(ranked) == 4 and len(ranked_dirs) == 2
+        assert run("--context_len", "1", "--threshold", "0.05") is False
+        assert len(labeled) == 3 and len(ranked) == 7
+
+        # the shards of other WFST settings are not reused
+        with pytest.raises(ValueError, match="--regenerate_wfst"):
+            run("--n_tagged", "10")
+        assert run("--n_tagged", "10", "--regenerate_wfst") is True
+        assert _Normalizer.n_calls == 6
+        assert len(os.listdir(run.work_dir)) == 4
@@ -0,0 +1,143 @@
+# Copyright (c) 2024, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import math
+import os
+import sys
+
+import pynini
+import pytest
+
+# the export scripts are run from their directory
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, os.pardir, "tools", "text_processing_deployment")
+)
+
+from compare_grammars import compare_builds, format_report, measure_build  # noqa: E402
+from pynini_export import MANIFEST_NAME, get_far_stats  # noqa: E402
+
+from nemo_text_processing.text_normalization.en.graph_utils import generator_main  # noqa: E402
+
+TAGGER = ("en/classify/tokenize_and_classify.far", "TOKENIZE_AND_CLASSIFY")
+VERBALIZER = ("en/verbalize/verbalize.far", "ALL")
+REMOVED = ("en/verbalize/verbalize.far", "REDUP")
+ADDED = ("en/verbalize/verbalize.far", "POSTPROCESSOR")
+
+
+def _metrics(num_states, num_arcs, size, load_time, compose_time=None):
+    return {
+        "num_states": num_states,
+        "num_arcs": num_arcs,
+        "size": size,
+        "load_time": load_time,
+        "compose_time": compose_time,
+    }
+
+
+class TestCompareGrammars:
+    baseline = {
+        TAGGER: _metrics(100, 0, 1000, 0.1, 0.02),
+        VERBALIZER: _metrics(10, 20, 500, 0.001),
+        REMOVED: _metrics(1, 0, 500, 0.001),
+    }
+    candidate = {
+        TAGGER: _metrics(120, 5, 1000, 0.105, 0.05),
+        VERBALIZER: _metrics(10, 20, 400, 0.004),
+        ADDED: _metrics(2, 1, 400, 0.004),
+    }
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_compare_builds(self):
+        thresholds = {"num_states": 0.1, "num_arcs": 0.1, "load_time": 0.01, "compose_time": 0.5}
+        rows, violations = compare_builds(self.baseline, self.candidate, thresholds)
+        assert [(row["far_file"], row["rule"]) for row in rows] == sorted([TAGGER, VERBALIZER, REMOVED, ADDED])
+        changes = {(row["far_file"], row["rule"]): row.get("change") for row in rows}
+        assert changes[TAGGER]["num_states"] == pytest.approx(0.2)
+        assert changes[TAGGER]["num_arcs"] == math.inf
+        assert changes[VERBALIZER] == pytest.approx({"num_states": 0, "num_arcs": 0, "size": -0.2, "load_time": 3.0})
+        assert changes[ADDED] is None
+
+        # timings that increased by less than 10ms are not reported
+        assert violations == [
+            "en/classify/tokenize_and_classify.far:TOKENIZE_AND_CLASSIFY num_states increased by 20.0% (100 -> 120), "
+            "the threshold is 10.0%",
+            "en/classify/tokenize_and_classify.far:TOKENIZE_AND_CLASSIFY num_arcs increased by inf% (0 -> 5), "
+            "the threshold is 10.0%",
+            "en/classify/tokenize_and_classify.far:TOKENIZE_AND_CLASSIFY compose_time increased by 150.0% "
+            "(0.02 -> 0.05), the threshold is 50.0%",
+            "en/verbalize/verbalize.far:REDUP is missing in the candidate build",
+        ]
+        _, violations = compare_builds(self.baseline, self.candidate, thresholds, min_time_increase=0.001)
+        assert len(violations) == 6
+        _, violations = compare_builds(self.baseline, self.candidate, {})
+        assert violations == ["en/verbalize/verbalize.far:REDUP is missing in the candidate build"]
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_format_report(self):
+        rows, _ = compare_builds(self.baseline, self.candidate, {})
+        lines = format_report(rows).split("\n")
+        assert lines[0].split("\t") == [
+            "far_file",
+            "rule",
+            "num_states (baseline -> candidate, change)",
+            "num_arcs (baseline -> candidate, change)",
+            "size (baseline -> candidate, change)",
+            "load_time (baseline -> candidate, change)",
+            "compose_time (baseline -> candidate, change)",
+        ]
+        assert lines[1].split("\t") == [
+            *TAGGER,
+            "100 -> 120 (+20.0%)",
+            "0 -> 5 (+inf%)",
+            "1000 -> 1000 (+0.0%)",
+            "100.0ms -> 105.0ms (+5.0%)",
+            "20.0ms -> 50.0ms (+150.0%)",
+        ]
+        # compose_time is not measured for verbalizers
+        assert lines[2].split("\t") == [
+            *VERBALIZER,
+            "10 -> 10 (+0.0%)",
+            "20 -> 20 (+0.0%)",
+            "500 -> 400 (-20.0%)",
+            "1.0ms -> 4.0ms (+300.0%)",
+            "- -> -",
+        ]
+        assert lines[3].split("\t") == [*ADDED, "- -> 2", "- -> 1", "- -> 400", "- -> 4.0ms", "- -> -"]
+        assert lines[4].split("\t") == [*REMOVED, "1 -> -", "0 -> -", "500 -> -", "1.0ms -> -", "- -> -"]
+        assert len(lines) == 5
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_measure_build(self, tmp_path):
+        far_file, rule = TAGGER
+        os.makedirs(tmp_path / "en" / "classify")
+        fst = pynini.cross("1", "one") | pynini.cross("2", "two")
+        generator_main(str(tmp_path / far_file), {rule: fst.optimize()})
+        far_stats = get_far_stats(str(tmp_path / far_file))
+        expected = far_stats["fsts"][rule]
+
+        def _measure(stats):
+            manifest = {"targets": {"en_tn_grammars_cased": {"files": {far_file: stats}}}}
+            (tmp_path / MANIFEST_NAME).write_text(json.dumps(manifest), encoding="utf-8")
+            (metrics,) = measure_build(str(tmp_path), probes=["1", "2"], repeats=1).values()
+            return {x: metrics[x] for x in ["num_states", "num_arcs", "size"]}
+
+        # states and arcs of an unchanged file are read from the manifest
+        manifest_stats = dict(far_stats, fsts={rule: {"num_states": 100, "num_arcs": 200}})
+        assert _measure(manifest_stats) == {"num_states": 100, "num_arcs": 200, "size": far_stats["size"]}
+        # the file of the same size was rebuilt after the export
+        assert _measure(dict(manifest_stats, md5="0" * 32)) == dict(expected, size=far_stats["size"])
@@ -0,0 +1,85 @@
+# Copyright (c) 2024, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+
+import pytest
+
+# the export scripts are run from their directory
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, os.pardir, "tools", "text_processing_deployment")
+)
+
+import pynini_export  # noqa: E402
+
+
+class TestPyniniExport:
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_parse_targets(self, monkeypatch):
+        def _import_grammar_classes(language):
+            raise AssertionError("grammars are imported only by the export workers")
+
+        monkeypatch.setattr(pynini_export, "import_grammar_classes", _import_grammar_classes)
+        assert pynini_export.parse_targets(["en:tn:cased", "ru:itn", "en:tn_grammars:cased"]) == [
+            ("en", "tn_grammars", "cased"),
+            ("ru", "itn_grammars", "cased"),
+        ]
+        assert pynini_export.parse_targets(["de:*:*"]) == [
+            ("de", "tn_grammars", "lower_cased"),
+            ("de", "tn_grammars", "cased"),
+            ("de", "itn_grammars", "lower_cased"),
+            ("de", "itn_grammars", "cased"),
+        ]
+        # languages without exportable TN grammars are skipped
+        tn_languages = [language for language, _, _ in pynini_export.parse_targets(["*:tn:cased"])]
+        assert "en" in tn_languages and "hy" not in tn_languages
+        assert not set(tn_languages) & set(pynini_export.ITN_ONLY_LANGUAGES)
+
+        with pytest.raises(ValueError, match="tn_grammars could not be exported for ru"):
+            pynini_export.parse_targets(["ru:tn"])
+        with pytest.raises(KeyError):
+            pynini_export.parse_targets(["xx:tn"])
+        with pytest.raises(ValueError, match="Invalid input case"):
+            pynini_export.parse_targets(["en:tn:upper_cased"])
+        with pytest.raises(ValueError, match="Invalid target"):
+            pynini_export.parse_targets(["en"])
+
+    @pytest.mark.run_only_on('CPU')
+    @pytest.mark.unit
+    def test_export_targets_skip_unchanged(self, tmp_path):
+        output_dir = str(tmp_path)
+        target = ("hy", "itn_grammars", "cased")
+
+        def _mtimes():
+            manifest = pynini_export.export_targets([target], output_dir=output_dir, **kwargs)
+            entry = manifest["targets"][pynini_export.get_target_name(*target)]
+            return {x: os.stat(os.path.join(output_dir, x)).st_mtime_ns for x in entry["files"]}
+
+        kwargs = {}
+        mtimes = _mtimes()
+        assert sorted(mtimes) == [
+            "hy_itn_grammars_cased/classify/tokenize_and_classify.far",
+            "hy_itn_grammars_cased/verbalize/verbalize.far",
+        ]
+        # the target is unchanged since the previous export
+        assert _mtimes() == mtimes
+
+        # the target is exported again if its files are missing or the cache is overwritten
+        os.remove(os.path.join(output_dir, "hy_itn_grammars_cased/verbalize/verbalize.far"))
+        new_mtimes = _mtimes()
+        assert sorted(new_mtimes) == sorted(mtimes) and new_mtimes != mtimes
+        kwargs = {"overwrite_cache": True}
+        assert _mtimes() != new_mtimes
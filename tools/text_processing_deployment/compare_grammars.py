@@ -0,0 +1,307 @@
+# Copyright (c) 2024, NVIDIA CORPORATION & AFFILIATES.  All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+from argparse import ArgumentParser
+from typing import Dict, List, Optional, Tuple
+
+import pynini
+from pynini import Far
+from pynini_export import MANIFEST_NAME, export_targets, get_fst_stats, parse_targets
+
+from nemo_text_processing.utils.logging import logger
+
+# This script compares FSTs of two grammar builds, e.g. a release and a branch, and reports size and speed regressions.
+# A build is a directory with .far files: the output dir of pynini_export.py or a .far cache dir of the grammars.
+# For every FST of every FAR file the report lists the number of states and arcs, FAR file size, load time and
+# composition time on a fixed probe set (for taggers and post-processors, the FSTs that take raw text).
+#
+#   python compare_grammars.py --baseline=<RELEASE_DIR> --candidate=<NEW_DIR> --max_states_increase=0.1
+#
+# The candidate could be exported first with pynini_export.py, unchanged targets are skipped:
+#   python compare_grammars.py --baseline=<RELEASE_DIR> --candidate=<NEW_DIR> --targets en:tn:cased --cache_dir=<DIR>
+#
+# The script exits with code 1 if any of the configured thresholds is exceeded or an FST of the baseline is missing.
+
+# inputs of the composition benchmark if no probe file is given
+DEFAULT_PROBES = [
+    "1",
+    "25",
+    "2,000,000",
+    "-12.5",
+    "3/4",
+    "1st",
+    "$5.99",
+    "12 kg",
+    "10:30",
+    "01/02/2023",
+    "Jan. 5, 2012",
+    "+1 (408) 555-0199",
+    "www.nvidia.com",
+    "Dr. Smith paid 100 dollars on 3 May 2021 at 9:45.",
+    "The 2nd of 3 trains left at 7 pm, 15 minutes late.",
+]
+METRICS = ["num_states", "num_arcs", "size", "load_time", "compose_time"]
+TIME_METRICS = ["load_time", "compose_time"]
+# smallest increase of the timings in seconds that is reported as a violation, smaller changes are measurement noise
+MIN_TIME_INCREASE = 0.01
+
+
+def parse_args():
+    parser = ArgumentParser()
+    parser.add_argument("--baseline", help="directory with .far files of the baseline build", required=True, type=str)
+    parser.add_argument("--candidate", help="directory with .far files of the build to check", required=True, type=str)
+    parser.add_argument(
+        "--targets",
+        help="export these pynini_export.py targets to the candidate dir before the comparison, e.g. en:tn:cased",
+        nargs="+",
+        default=None,
+        type=str,
+    )
+    parser.add_argument("--cache_dir", help="path to a dir with .far grammar files for the export", default=None)
+    parser.add_argument("--n_jobs", help="number of targets to export in parallel", default=1, type=int)
+    parser.add_argument("--probe_file", help="file with probe texts, one per line", default=None, type=str)
+    parser.add_argument("--repeats", help="number of timing runs, the fastest one is reported", default=3, type=int)
+    for metric in METRICS:
+        parser.add_argument(
+            f"--max_{metric.replace('num_', '')}_increase",
+            dest=f"max_{metric}_increase",
+            help=f"maximum relative increase of {metric}, e.g. 0.1 for 10%%, not checked by default",
+            default=None,
+            type=float,
+        )
+    parser.add_argument(
+        "--min_time_increase",
+        help="minimum increase of the timings in seconds to exceed their thresholds, smaller changes are noise",
+        default=MIN_TIME_INCREASE,
+        type=float,
+    )
+    parser.add_argument("--report", help="path to save the report as .json", default=None, type=str)
+    return parser.parse_args()
+
+
+def find_far_files(build_dir: str) -> List[str]:
+    """
+    Returns paths of all .far files of the build relative to the build directory
+    """
+    far_files = []
+    for root, dirs, file_names in os.walk(build_dir):
+        dirs.sort()
+        for file_name in sorted(file_names):
+            if file_name.endswith(".far"):
+                far_files.append(os.path.relpath(os.path.join(root, file_name), build_dir))
+    return far_files
+
+
+def takes_raw_text(rule: str) -> bool:
+    """
+    Returns True for FSTs that take raw text as input, taggers and post-processors, verbalizers take tagged text
+    """
+    rule = rule.lower()
+    return "classify" in rule or "tokenize" in rule or "post" in rule
+
+
+def time_load(far_path: str, repeats: int) -> float:
+    """
+    Returns time to load all FSTs of the FAR file in seconds
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        far = Far(far_path, mode="r")
+        while not far.done():
+            far.get_fst()
+            far.next()
+        best = min(best, time.perf_counter() - start_time)
+    return best
+
+
+def time_compose(fst: "pynini.Fst", probes: List[str], repeats: int) -> float:
+    """
+    Returns time to compose all probes with the FST and to find their shortest paths in seconds
+    """
+    probes = [pynini.accep(pynini.escape(x)) for x in probes]
+    best = float("inf")
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        for probe in probes:
+            lattice = probe @ fst
+            if lattice.num_states() > 0:
+                pynini.shortestpath(lattice, nshortest=1, unique=True)
+        best = min(best, time.perf_counter() - start_time)
+    return best
+
+
+def measure_build(build_dir: str, probes: List[str], repeats: int = 3) -> Dict[Tuple[str, str], Dict]:
+    """
+    Measures all FSTs of a build
+
+    Args:
+        build_dir: directory with .far files
+        probes: probe texts to compose with the FSTs that take raw text
+        repeats: number of timing runs, the fastest one is reported
+
+    Returns: metrics of every (FAR path, rule) of the build
+    """
+    # states and arcs of the exported files are in the manifest of pynini_export.py, they are reused for the files
+    # with the same content
+    known_stats = {}
+    manifest_path = os.path.join(build_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            for entry in json.load(f)["targets"].values():
+                for far_file, far_stats in entry["files"].items():
+                    known_stats[far_file] = far_stats
+
+    results = {}
+    for far_file in find_far_files(build_dir):
+        far_path = os.path.join(build_dir, far_file)
+        size = os.path.getsize(far_path)
+        load_time = time_load(far_path, repeats)
+        far_stats = known_stats.get(far_file)
+        if far_stats is not None:
+            # the file could be rebuilt after the export, e.g. with the same size
+            with open(far_path, "rb") as f:
+                if far_stats.get("md5") != hashlib.md5(f.read()).hexdigest():
+                    far_stats = None
+
+        far = Far(far_path, mode="r")
+        while not far.done():
+            rule = far.get_key()
+            fst = far.get_fst()
+            if far_stats is not None and rule in far_stats["fsts"]:
+                stats = dict(far_stats["fsts"][rule])
+            else:
+                stats = get_fst_stats(fst)
+            stats["size"] = size
+            stats["load_time"] = load_time
+            stats["compose_time"] = time_compose(fst, probes, repeats) if takes_raw_text(rule) else None
+            results[(far_file, rule)] = stats
+            far.next()
+    return results
+
+
+def compare_builds(
+    baseline: Dict[Tuple[str, str], Dict],
+    candidate: Dict[Tuple[str, str], Dict],
+    thresholds: Dict[str, float],
+    min_time_increase: float = MIN_TIME_INCREASE,
+) -> Tuple[List[Dict], List[str]]:
+    """
+    Compares metrics of two builds
+
+    Args:
+        baseline: metrics of the baseline build, see measure_build()
+        candidate: metrics of the candidate build
+        thresholds: maximum relative increase of the metrics, metrics without a threshold are not checked
+        min_time_increase: minimum increase of the timings in seconds to exceed their thresholds
+
+    Returns: rows of the report and the list of exceeded thresholds
+    """
+    rows = []
+    violations = []
+    for key in sorted(set(baseline) | set(candidate)):
+        far_file, rule = key
+        row = {"far_file": far_file, "rule": rule, "baseline": baseline.get(key), "candidate": candidate.get(key)}
+        rows.append(row)
+        if row["candidate"] is None:
+            violations.append(f"{far_file}:{rule} is missing in the candidate build")
+            continue
+        if row["baseline"] is None:
+            continue
+
+        row["change"] = {}
+        for metric in METRICS:
+            old, new = row["baseline"][metric], row["candidate"][metric]
+            if old is None or new is None:
+                continue
+            if old > 0:
+                change = (new - old) / old
+            else:
+                # any increase from zero exceeds the threshold
+                change = math.inf if new > old else 0.0
+            row["change"][metric] = change
+            threshold = thresholds.get(metric)
+            if metric in TIME_METRICS and new - old < min_time_increase:
+                continue
+            if threshold is not None and change > threshold:
+                violations.append(
+                    f"{far_file}:{rule} {metric} increased by {change:.1%} ({old:.4g} -> {new:.4g}), "
+                    f"the threshold is {threshold:.1%}"
+                )
+    return rows, violations
+
+
+def format_report(rows: List[Dict]) -> str:
+    """
+    Returns the report as a text table
+    """
+
+    def _value(stats: Optional[Dict], metric: str) -> str:
+        if stats is None or stats[metric] is None:
+            return "-"
+        if metric.endswith("_time"):
+            return f"{stats[metric] * 1000:.1f}ms"
+        return str(stats[metric])
+
+    header = ["far_file", "rule"] + [f"{metric} (baseline -> candidate, change)" for metric in METRICS]
+    lines = ["\t".join(header)]
+    for row in rows:
+        cells = [row["far_file"], row["rule"]]
+        for metric in METRICS:
+            cell = f"{_value(row['baseline'], metric)} -> {_value(row['candidate'], metric)}"
+            change = row.get("change", {}).get(metric)
+            if change is not None:
+                cell += f" ({change:+.1%})"
+            cells.append(cell)
+        lines.append("\t".join(cells))
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    if args.targets is not None:
+        export_targets(
+            targets=parse_targets(args.targets),
+            output_dir=args.candidate,
+            cache_dir=args.cache_dir,
+            n_jobs=args.n_jobs,
+        )
+
+    if args.probe_file is not None:
+        with open(args.probe_file, "r", encoding="utf-8") as f:
+            probes = [line.strip() for line in f if line.strip()]
+    else:
+        probes = DEFAULT_PROBES
+
+    thresholds = {metric: getattr(args, f"max_{metric}_increase") for metric in METRICS}
+    baseline = measure_build(args.baseline, probes, repeats=args.repeats)
+    candidate = measure_build(args.candidate, probes, repeats=args.repeats)
+    rows, violations = compare_builds(baseline, candidate, thresholds, min_time_increase=args.min_time_increase)
+
+    print(format_report(rows))
+    if args.report is not None:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"rows": rows, "violations": violations}, f, indent=2)
+
+    for violation in violations:
+        logger.error(violation)
+    sys.exit(1 if violations else 0)
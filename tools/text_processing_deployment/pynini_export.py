@@ -15,38 +15,111 @@
 # limitations under the License.
 
 
+import hashlib
+import importlib
+import itertools
+import json
+import multiprocessing
 import os
+import sys
 import time
 from argparse import ArgumentParser
+from typing import Dict, List, Optional, Tuple
 
 import pynini
+from pynini import Far
 
+import nemo_text_processing
 from nemo_text_processing.text_normalization.en.graph_utils import generator_main
+from nemo_text_processing.utils.logging import logger
 
 # This script exports compiled grammars inside nemo_text_processing into OpenFst finite state archive files
 # tokenize_and_classify.far and verbalize.far for production purposes
+#
+# To export several languages in parallel, e.g. for a release, pass targets as language:grammars:input_case,
+# "*" selects all supported values:
+#   python pynini_export.py --output_dir=<OUTPUT_DIR> --targets en:tn:cased de:itn:* "ja:*:cased" --n_jobs=4
+# A manifest.json with content hashes, build times and FST sizes of the targets is written to the output dir,
+# targets whose sources, data files and arguments are unchanged since the previous export are skipped.
+
+LANGUAGES = [
+    "en",
+    "de",
+    "es",
+    "pt",
+    "ru",
+    'fr',
+    'hu',
+    'sv',
+    'vi',
+    'zh',
+    'ar',
+    'it',
+    'es_en',
+    'he',
+    'hi',
+    'hi_en',
+    'hy',
+    'mr',
+    'ja',
+    'rw',
+    'ko',
+]
+GRAMMARS = ["tn_grammars", "itn_grammars"]
+INPUT_CASES = ["lower_cased", "cased"]
+# only ITN grammars could be deployed in Sparrowhawk for these languages
+ITN_ONLY_LANGUAGES = ['ru', 'es_en', 'hi_en', 'mr']
+MANIFEST_NAME = "manifest.json"
+# files of the grammar directories that are not used to build the grammars
+IGNORED_EXTENSIONS = (".pyc", ".far", ".md", ".rst")
+# grammars exported for every language, mapped to whether the language has a post-processing verbalizer for them
+EXPORTED_GRAMMARS = {
+    'en': {'tn_grammars': True, 'itn_grammars': False},
+    'de': {'tn_grammars': False, 'itn_grammars': False},
+    'es': {'tn_grammars': False, 'itn_grammars': False},
+    'pt': {'tn_grammars': False, 'itn_grammars': False},
+    'ru': {'itn_grammars': False},
+    'fr': {'tn_grammars': False, 'itn_grammars': False},
+    'hu': {'tn_grammars': False},
+    'sv': {'tn_grammars': False, 'itn_grammars': False},
+    'vi': {'tn_grammars': True, 'itn_grammars': False},
+    'zh': {'tn_grammars': True, 'itn_grammars': False},
+    'ar': {'tn_grammars': False, 'itn_grammars': False},
+    'it': {'tn_grammars': False},
+    'es_en': {'itn_grammars': False},
+    'he': {'itn_grammars': False},
+    'hi': {'tn_grammars': True, 'itn_grammars': False},
+    'hi_en': {'itn_grammars': False},
+    'hy': {'itn_grammars': False},
+    'mr': {'itn_grammars': False},
+    'ja': {'tn_grammars': True, 'itn_grammars': True},
+    'rw': {'tn_grammars': False},
+    'ko': {'tn_grammars': False, 'itn_grammars': False},
+}
+# prefix of the class names and package of the grammar types, see import_grammar_classes()
+GRAMMAR_PACKAGES = {'tn_grammars': ('TN', 'text_normalization'), 'itn_grammars': ('ITN', 'inverse_text_normalization')}
 
 
-def itn_grammars(**kwargs):
+def itn_grammars(classes: Dict[str, Optional[type]], **kwargs):
     d = {}
     d['classify'] = {
-        'TOKENIZE_AND_CLASSIFY': ITNClassifyFst(
+        'TOKENIZE_AND_CLASSIFY': classes["ITNClassifyFst"](
             cache_dir=kwargs["cache_dir"],
             overwrite_cache=kwargs["overwrite_cache"],
             whitelist=kwargs["whitelist"],
             input_case=kwargs["input_case"],
         ).fst
     }
-    d['verbalize'] = {'ALL': ITNVerbalizeFst().fst, 'REDUP': pynini.accep("REDUP")}
-    if ITNPostProcessingFst is not None:
-        d['post_process'] = {'POSTPROCESSOR': ITNPostProcessingFst().fst}
+    d['verbalize'] = {'ALL': classes["ITNVerbalizeFst"]().fst, 'REDUP': pynini.accep("REDUP")}
+    if classes["ITNPostProcessingFst"] is not None:
+        d['post_process'] = {'POSTPROCESSOR': classes["ITNPostProcessingFst"]().fst}
     return d
 
 
-def tn_grammars(**kwargs):
+def tn_grammars(classes: Dict[str, Optional[type]], **kwargs):
     d = {}
     d['classify'] = {
-        'TOKENIZE_AND_CLASSIFY': TNClassifyFst(
+        'TOKENIZE_AND_CLASSIFY': classes["TNClassifyFst"](
             input_case=kwargs["input_case"],
             deterministic=True,
             cache_dir=kwargs["cache_dir"],
@@ -54,12 +127,15 @@ def tn_grammars(**kwargs):
             whitelist=kwargs["whitelist"],
         ).fst
     }
-    d['verbalize'] = {'ALL': TNVerbalizeFst(deterministic=True).fst, 'REDUP': pynini.accep("REDUP")}
-    if TNPostProcessingFst is not None:
-        d['post_process'] = {'POSTPROCESSOR': TNPostProcessingFst().fst}
+    d['verbalize'] = {'ALL': classes["TNVerbalizeFst"](deterministic=True).fst, 'REDUP': pynini.accep("REDUP")}
+    if classes["TNPostProcessingFst"] is not None:
+        d['post_process'] = {'POSTPROCESSOR': classes["TNPostProcessingFst"]().fst}
     return d
 
 
+GRAMMAR_FUNCTIONS = {"tn_grammars": tn_grammars, "itn_grammars": itn_grammars}
+
+
 def export_grammars(output_dir, grammars):
     """
     Exports tokenizer_and_classify and verbalize Fsts as OpenFst finite state archive (FAR) files.
@@ -81,44 +157,321 @@ def export_grammars(output_dir, grammars):
         generator_main(f"{out_dir}/{category}.far", graphs)
 
 
+def import_grammar_classes(language: str) -> Dict[str, Optional[type]]:
+    """
+    Imports grammar classes of the language
+
+    Args:
+        language: language to export
+
+    Returns: mapping of TNClassifyFst, TNVerbalizeFst, ITNClassifyFst, ITNVerbalizeFst and the post-processing
+        classes to the classes of the language, the classes that the language doesn't have are missing or None
+    """
+    if language not in EXPORTED_GRAMMARS:
+        raise KeyError(f"Language {language} is not defined for export.")
+    classes = {"TNPostProcessingFst": None, "ITNPostProcessingFst": None}
+    for grammars, post_process in EXPORTED_GRAMMARS[language].items():
+        prefix, package = GRAMMAR_PACKAGES[grammars]
+        module = f"nemo_text_processing.{package}.{language}"
+        classes[f"{prefix}ClassifyFst"] = importlib.import_module(
+            f"{module}.taggers.tokenize_and_classify"
+        ).ClassifyFst
+        classes[f"{prefix}VerbalizeFst"] = importlib.import_module(f"{module}.verbalizers.verbalize").VerbalizeFst
+        if post_process:
+            classes[f"{prefix}PostProcessingFst"] = importlib.import_module(
+                f"{module}.verbalizers.post_processing"
+            ).PostProcessingFst
+    return classes
+
+
+def get_supported_grammars(language: str) -> List[str]:
+    """
+    Returns grammar types that could be exported for the language, the grammar modules are not imported
+    """
+    return [x for x in GRAMMARS if x in EXPORTED_GRAMMARS[language]]
+
+
+def parse_targets(targets: List[str]) -> List[Tuple[str, str, str]]:
+    """
+    Parses export targets, e.g. ["en:tn:cased", "de:*:*"]
+
+    Args:
+        targets: targets as language:grammars:input_case, grammars could be tn, itn, tn_grammars or itn_grammars,
+            "*" selects all supported values, input case could be omitted for "cased". Languages of "*" that don't
+            support the selected grammars are skipped
+
+    Returns: unique (language, grammars, input_case) targets in the given order
+    """
+    parsed = []
+    for target in targets:
+        parts = target.split(":")
+        if len(parts) == 2:
+            parts.append("cased")
+        if len(parts) != 3:
+            raise ValueError(f"Invalid target {target}, expected language:grammars:input_case")
+        language, grammars, input_case = parts
+
+        all_languages = language == "*"
+        languages = LANGUAGES if all_languages else [language]
+        for language in languages:
+            if language not in LANGUAGES:
+                raise KeyError(f"Language {language} is not defined for export.")
+            supported = get_supported_grammars(language)
+            if grammars == "*":
+                selected_grammars = supported
+            else:
+                selected_grammars = [grammars if grammars.endswith("_grammars") else f"{grammars}_grammars"]
+                if selected_grammars[0] not in supported:
+                    if all_languages:
+                        continue
+                    raise ValueError(f"{selected_grammars[0]} could not be exported for {language}")
+            input_cases = INPUT_CASES if input_case == "*" else [input_case]
+            if any(x not in INPUT_CASES for x in input_cases):
+                raise ValueError(f"Invalid input case in {target}, expected one of {INPUT_CASES}")
+            parsed.extend(itertools.product([language], selected_grammars, input_cases))
+    return list(dict.fromkeys(parsed))
+
+
+def get_target_name(language: str, grammars: str, input_case: str) -> str:
+    """
+    Returns name of the output subdirectory of the target
+    """
+    return f"{language}_{grammars}_{input_case}"
+
+
+def get_grammar_hash(language: str, grammars: str, input_case: str, whitelist: Optional[str] = None) -> str:
+    """
+    Returns content hash of an export target: sources of all nemo_text_processing modules loaded by the current
+    process, all files of their language directories (e.g. .tsv data), the whitelist, export arguments and Pynini
+    version. Should be called in a process that has only imported the grammar classes of the target.
+    """
+    package_dir = os.path.dirname(os.path.abspath(nemo_text_processing.__file__))
+    files = set()
+    language_dirs = set()
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if not path or not name.startswith("nemo_text_processing"):
+            continue
+        path = os.path.abspath(path)
+        files.add(path)
+        parts = os.path.relpath(path, package_dir).split(os.sep)
+        if len(parts) > 2 and parts[0] in ("text_normalization", "inverse_text_normalization"):
+            language_dirs.add(os.path.join(package_dir, parts[0], parts[1]))
+
+    for language_dir in language_dirs:
+        for root, dirs, file_names in os.walk(language_dir):
+            dirs[:] = [x for x in dirs if x != "__pycache__"]
+            files.update(os.path.join(root, x) for x in file_names if not x.endswith(IGNORED_EXTENSIONS))
+    # the export script defines the exported rules
+    files.add(os.path.abspath(__file__))
+    if whitelist:
+        files.add(os.path.abspath(whitelist))
+
+    digest = hashlib.md5(json.dumps([language, grammars, input_case, pynini.__version__]).encode("utf-8"))
+    for path in sorted(files):
+        digest.update(os.path.relpath(path, package_dir).encode("utf-8"))
+        with open(path, "rb") as f:
+            digest.update(hashlib.md5(f.read()).digest())
+    return digest.hexdigest()
+
+
+def get_fst_stats(fst: "pynini.Fst") -> Dict[str, int]:
+    """
+    Returns number of states and arcs of the FST
+    """
+    return {"num_states": fst.num_states(), "num_arcs": sum(fst.num_arcs(state) for state in fst.states())}
+
+
+def get_far_stats(far_path: str) -> Dict:
+    """
+    Returns size, md5 hash and FST sizes of a FAR file
+    """
+    with open(far_path, "rb") as f:
+        md5 = hashlib.md5(f.read()).hexdigest()
+    fsts = {}
+    far = Far(far_path, mode="r")
+    while not far.done():
+        fsts[far.get_key()] = get_fst_stats(far.get_fst())
+        far.next()
+    return {"size": os.path.getsize(far_path), "md5": md5, "fsts": fsts}
+
+
+def export_target(
+    target: Tuple[str, str, str],
+    output_dir: str,
+    cache_dir: Optional[str] = None,
+    overwrite_cache: bool = False,
+    whitelist: Optional[str] = None,
+    previous: Optional[Dict] = None,
+) -> Dict:
+    """
+    Exports grammars of a single target to output_dir/<language>_<grammars>_<input_case>,
+    should be run in a new process, see get_grammar_hash()
+
+    Args:
+        target: (language, grammars, input_case)
+        output_dir: directory to export FAR files to
+        cache_dir: path to a dir with .far grammar files
+        overwrite_cache: set to True to rebuild the grammars even if the target is unchanged
+        whitelist: path to a file with whitelist replacements
+        previous: manifest entry of the target from the previous export
+
+    Returns: manifest entry of the target
+    """
+    language, grammars, input_case = target
+    classes = import_grammar_classes(language)
+    content_hash = get_grammar_hash(language, grammars, input_case, whitelist)
+
+    if (
+        previous is not None
+        and not overwrite_cache
+        and previous.get("hash") == content_hash
+        and all(os.path.exists(os.path.join(output_dir, x)) for x in previous.get("files", {}))
+    ):
+        return dict(previous, skipped=True)
+
+    start_time = time.perf_counter()
+    target_dir = os.path.join(output_dir, get_target_name(*target))
+    export_grammars(
+        output_dir=target_dir,
+        grammars=GRAMMAR_FUNCTIONS[grammars](
+            classes,
+            input_case=input_case,
+            cache_dir=cache_dir,
+            # cached .far files are stale if the sources changed since the previous export
+            overwrite_cache=overwrite_cache or previous is not None,
+            whitelist=whitelist,
+        ),
+    )
+    build_time = time.perf_counter() - start_time
+
+    files = {}
+    for root, _, file_names in os.walk(target_dir):
+        for file_name in sorted(file_names):
+            if file_name.endswith(".far"):
+                path = os.path.join(root, file_name)
+                files[os.path.relpath(path, output_dir)] = get_far_stats(path)
+    return {
+        "language": language,
+        "grammars": grammars,
+        "input_case": input_case,
+        "hash": content_hash,
+        "build_time": round(build_time, 2),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "files": files,
+        "skipped": False,
+    }
+
+
+def _export_target_job(
+    job: Tuple[Tuple[str, str, str], Dict],
+) -> Tuple[Tuple[str, str, str], Optional[Dict], Optional[str]]:
+    """
+    Runs export_target() in a pool worker
+
+    Args:
+        job: target and keyword arguments of export_target()
+
+    Returns: target, its manifest entry and the error message if the export failed
+    """
+    target, kwargs = job
+    try:
+        return target, export_target(target, **kwargs), None
+    except Exception as e:
+        return target, None, str(e)
+
+
+def load_manifest(output_dir: str) -> Dict:
+    """
+    Returns manifest of the previous export to output_dir, empty manifest if there is none
+    """
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"targets": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(output_dir: str, manifest: Dict):
+    """
+    Writes the manifest atomically, so that an interrupted export keeps the entries of the finished targets
+    """
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def export_targets(
+    targets: List[Tuple[str, str, str]],
+    output_dir: str,
+    cache_dir: Optional[str] = None,
+    overwrite_cache: bool = False,
+    whitelist: Optional[str] = None,
+    n_jobs: int = 1,
+) -> Dict:
+    """
+    Exports targets in a process pool, every target is built in a new process. Unchanged targets are skipped,
+    the manifest in output_dir is updated after every target.
+
+    Args:
+        targets: (language, grammars, input_case) targets
+        output_dir: directory to export FAR files and the manifest to
+        cache_dir: path to a dir with .far grammar files
+        overwrite_cache: set to True to rebuild all targets
+        whitelist: path to a file with whitelist replacements
+        n_jobs: number of targets to build in parallel
+
+    Returns: updated manifest
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    failed = []
+    jobs = [
+        (
+            target,
+            {
+                "output_dir": output_dir,
+                "cache_dir": cache_dir,
+                "overwrite_cache": overwrite_cache,
+                "whitelist": whitelist,
+                "previous": manifest["targets"].get(get_target_name(*target)),
+            },
+        )
+        for target in targets
+    ]
+    # a new worker process is started for every target
+    with multiprocessing.get_context("spawn").Pool(processes=max(1, n_jobs), maxtasksperchild=1) as pool:
+        for target, entry, error in pool.imap_unordered(_export_target_job, jobs):
+            name = get_target_name(*target)
+            if error is not None:
+                logger.error(f"Failed to export {name}: {error}")
+                failed.append(name)
+                continue
+            if entry.pop("skipped"):
+                logger.info(f"Skipped {name}, grammars are unchanged")
+            else:
+                logger.info(f"Exported {name} in {entry['build_time']:.1f}s")
+            manifest["targets"][name] = entry
+            save_manifest(output_dir, manifest)
+
+    if failed:
+        raise RuntimeError(f"Failed to export {', '.join(failed)}")
+    return manifest
+
+
 def parse_args():
     parser = ArgumentParser()
     parser.add_argument("--output_dir", help="output directory for grammars", required=True, type=str)
     parser.add_argument(
         "--language",
         help="language",
-        choices=[
-            "en",
-            "de",
-            "es",
-            "pt",
-            "ru",
-            'fr',
-            'hu',
-            'sv',
-            'vi',
-            'zh',
-            'ar',
-            'it',
-            'es_en',
-            'he',
-            'hi',
-            'hi_en',
-            'hy',
-            'mr',
-            'ja',
-            'rw',
-            'ko',
-        ],
+        choices=LANGUAGES,
         type=str,
         default='en',
     )
-    parser.add_argument(
-        "--grammars", help="grammars to be exported", choices=["tn_grammars", "itn_grammars"], type=str, required=True
-    )
-    parser.add_argument(
-        "--input_case", help="input capitalization", choices=["lower_cased", "cased"], default="cased", type=str
-    )
+    parser.add_argument("--grammars", help="grammars to be exported", choices=GRAMMARS, type=str, required=False)
+    parser.add_argument("--input_case", help="input capitalization", choices=INPUT_CASES, default="cased", type=str)
     parser.add_argument(
         "--whitelist",
         help="Path to a file with with whitelist replacements,"
@@ -134,233 +487,36 @@ def parse_args():
         default=None,
         type=str,
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--targets",
+        help="targets to export as language:grammars:input_case, e.g. en:tn:cased or de:itn_grammars:*, "
+        "\"*\" selects all supported values. Overrides --language, --grammars and --input_case",
+        nargs="+",
+        default=None,
+        type=str,
+    )
+    parser.add_argument("--n_jobs", help="number of targets to build in parallel", default=1, type=int)
+    args = parser.parse_args()
+    if args.targets is None and args.grammars is None:
+        parser.error("either --grammars or --targets is required")
+    return args
 
 
 if __name__ == '__main__':
     args = parse_args()
 
-    if args.language in ['ru', 'es_en', 'hi_en', 'mr'] and args.grammars == 'tn_grammars':
-        raise ValueError('Only ITN grammars could be deployed in Sparrowhawk for the selected languages.')
-    TNPostProcessingFst = None
-    ITNPostProcessingFst = None
-    if args.language == 'en':
-        from nemo_text_processing.inverse_text_normalization.en.taggers.tokenize_and_classify import (
-            ClassifyFst as ITNClassifyFst,
-        )
-        from nemo_text_processing.inverse_text_normalization.en.verbalizers.verbalize import (
-            VerbalizeFst as ITNVerbalizeFst,
-        )
-        from nemo_text_processing.text_normalization.en.taggers.tokenize_and_classify import (
-            ClassifyFst as TNClassifyFst,
-        )
-        from nemo_text_processing.text_normalization.en.verbalizers.post_processing import (
-            PostProcessingFst as TNPostProcessingFst,
-        )
-        from nemo_text_processing.text_normalization.en.verbalizers.verbalize import VerbalizeFst as TNVerbalizeFst
-
-    elif args.language == 'de':
-        from nemo_text_processing.inverse_text_normalization.de.taggers.tokenize_and_classify import (
-            ClassifyFst as ITNClassifyFst,
-        )
-        from nemo_text_processing.inverse_text_normalization.de.verbalizers.verbalize import (
-            VerbalizeFst as ITNVerbalizeFst,
-        )
-        from nemo_text_processing.text_normalization.de.taggers.tokenize_and_classify import (
-            ClassifyFst as TNClassifyFst,
-        )
-        from nemo_text_processing.text_normalization.de.verbalizers.verbalize import VerbalizeFst as TNVerbalizeFst
-    elif args.language == 'ru':
-        from nemo_text_processing.inverse_text_normalization.ru.taggers.tokenize_and_classify import (
-            ClassifyFst as ITNClassifyFst,
-        )
-        from nemo_text_processing.inverse_text_normalization.ru.verbalizers.verbalize import (
-            VerbalizeFst as ITNVerbalizeFst,
-        )
-    elif args.language == 'es':
-        from nemo_text_processing.inverse_text_normalization.es.taggers.tokenize_and_classify import (
-            ClassifyFst as ITNClassifyFst,
-        )
-        from nemo_text_processing.inverse_text_normalization.es.verbalizers.verbalize import (
-            VerbalizeFst as ITNVerbalizeFst,
-        )
-        from nemo_text_processing.text_normalization.es.taggers.tokenize_and_classify import (
-            ClassifyFst as TNClassifyFst,
-        )
-        from nemo_text_processing.text_normalization.es.verbalizers.verbalize import VerbalizeFst as TNVerbalizeFst
-    elif args.language == 'pt':
-        from nemo_text_processing.inverse_text_normalization.pt.taggers.tokenize_and_classify import (
-            ClassifyFst as ITNClassifyFst,
-        )
-        from nemo_text_processing.inverse_text_normalization.pt.verbalizers.verbalize import (
-            VerbalizeFst as ITNVerbalizeFst,
-        )
-        from nemo_text_processing.text_normalization.pt.taggers.tokenize_and_classify import (
-            ClassifyFst as TNClassifyFst,
-        )
-        from nemo_text_processing.text_normalization.pt.verbalizers.verbalize import VerbalizeFst as TNVerbalizeFst
-    elif args.language == 'fr':
-        from nemo_text_processing.inverse_text_normalization.fr.taggers.tokenize_and_classify import (
-            ClassifyFst as ITNClassifyFst,
-        )
-        from nemo_text_processing.inverse_text_normalization.fr.verbalizers.verbalize import (
-            VerbalizeFst as ITNVerbalizeFst,
-        )
-        from nemo_text_processing.text_normalization.fr.taggers.tokenize_and_classify import (
-            ClassifyFst as TNClassifyFst,
-        )
-        from nemo_text_processing.text_normalization.fr.verbalizers.verbalize import VerbalizeFst as TNVerbalizeFst
-    elif args.language == 'hi':
-        from nemo_text_processing.inverse_text_normalization.hi.taggers.tokenize_and_classify import (
-            ClassifyFst as ITNClassifyFst,
-        )
-        from nemo_text_processing.inverse_text_normalization.hi.verbalizers.verbalize import (
-            VerbalizeFst as ITNVerbalizeFst,
-        )
-        from nemo_text_processing.text_normalization.hi.taggers.tokenize_and_classify import (
-            ClassifyFst as TNClassifyFst,
-        )
-        from nemo_text_processing.text_normalization.hi.verbalizers.post_processing import (
-            PostProcessingFst as TNPostProcessingFst,
-        )
-        from nemo_text_processing.text_normalization.hi.verbalizers.verbalize import VerbalizeFst as TNVerbalizeFst
-    elif args.language == 'hu':
-        from nemo_text_processing.text_normalization.hu.taggers.tokenize_and_classify import (
-            ClassifyFst as TNClassifyFst,
-        )
-        from nemo_text_processing.text_normalization.hu.verbalizers.verbalize import VerbalizeFst as TNVerbalizeFst
-    elif args.language == 'sv':
-        from nemo_text_processing.inverse_text_normalization.sv.taggers.tokenize_and_classify import (
-            ClassifyFst as ITNClassifyFst,
-        )
-        from nemo_text_processing.inverse_text_normalization.sv.verbalizers.verbalize import (
-            VerbalizeFst as ITNVerbalizeFst,
-        )
-        from nemo_text_processing.text_normalization.sv.taggers.tokenize_and_classify import (
-            ClassifyFst as TNClassifyFst,
-        )
-        from nemo_text_processing.text_normalization.sv.verbalizers.verbalize import VerbalizeFst as TNVerbalizeFst
-    elif args.language == 'vi':
-        from nemo_text_processing.inverse_text_normalization.vi.taggers.tokenize_and_classify import (
-            ClassifyFst as ITNClassifyFst,
-        )
-        from nemo_text_processing.inverse_text_normalization.vi.verbalizers.verbalize import (
-            VerbalizeFst as ITNVerbalizeFst,
-        )
-        from nemo_text_processing.text_normalization.vi.taggers.tokenize_and_classify import (
-            ClassifyFst as TNClassifyFst,
-        )
-        from nemo_text_processing.text_normalization.vi.verbalizers.post_processing import (
-            PostProcessingFst as TNPostProcessingFst,
-        )
-        from nemo_text_processing.text_normalization.vi.verbalizers.verbalize import VerbalizeFst as TNVerbalizeFst
-    elif args.language == 'zh':
-        from nemo_text_processing.inverse_text_normalization.zh.taggers.tokenize_and_classify import (
-            ClassifyFst as ITNClassifyFst,
-        )
-        from nemo_text_processing.inverse_text_normalization.zh.verbalizers.verbalize import (
-            VerbalizeFst as ITNVerbalizeFst,
-        )
-        from nemo_text_processing.text_normalization.zh.taggers.tokenize_and_classify import (
-            ClassifyFst as TNClassifyFst,
-        )
-        from nemo_text_processing.text_normalization.zh.verbalizers.post_processing import (
-            PostProcessingFst as TNPostProcessingFst,
-        )
-        from nemo_text_processing.text_normalization.zh.verbalizers.verbalize import VerbalizeFst as TNVerbalizeFst
-    elif args.language == 'ar':
-        from nemo_text_processing.inverse_text_normalization.ar.taggers.tokenize_and_classify import (
-            ClassifyFst as ITNClassifyFst,
-        )
-        from nemo_text_processing.inverse_text_normalization.ar.verbalizers.verbalize import (
-            VerbalizeFst as ITNVerbalizeFst,
-        )
-        from nemo_text_processing.text_normalization.ar.taggers.tokenize_and_classify import (
-            ClassifyFst as TNClassifyFst,
-        )
-        from nemo_text_processing.text_normalization.ar.verbalizers.verbalize import VerbalizeFst as TNVerbalizeFst
-    elif args.language == 'it':
-        from nemo_text_processing.text_normalization.it.taggers.tokenize_and_classify import (
-            ClassifyFst as TNClassifyFst,
-        )
-        from nemo_text_processing.text_normalization.it.verbalizers.verbalize import VerbalizeFst as TNVerbalizeFst
-    elif args.language == 'es_en':
-        from nemo_text_processing.inverse_text_normalization.es_en.taggers.tokenize_and_classify import (
-            ClassifyFst as ITNClassifyFst,
-        )
-        from nemo_text_processing.inverse_text_normalization.es_en.verbalizers.verbalize import (
-            VerbalizeFst as ITNVerbalizeFst,
-        )
-    elif args.language == 'hi_en':
-        from nemo_text_processing.inverse_text_normalization.hi_en.taggers.tokenize_and_classify import (
-            ClassifyFst as ITNClassifyFst,
-        )
-        from nemo_text_processing.inverse_text_normalization.hi_en.verbalizers.verbalize import (
-            VerbalizeFst as ITNVerbalizeFst,
-        )
-    elif args.language == 'mr':
-        from nemo_text_processing.inverse_text_normalization.mr.taggers.tokenize_and_classify import (
-            ClassifyFst as ITNClassifyFst,
-        )
-        from nemo_text_processing.inverse_text_normalization.mr.verbalizers.verbalize import (
-            VerbalizeFst as ITNVerbalizeFst,
-        )
-    elif args.language == 'he':
-        from nemo_text_processing.inverse_text_normalization.he.taggers.tokenize_and_classify import (
-            ClassifyFst as ITNClassifyFst,
-        )
-        from nemo_text_processing.inverse_text_normalization.he.verbalizers.verbalize import (
-            VerbalizeFst as ITNVerbalizeFst,
-        )
-    elif args.language == 'hy':
-        from nemo_text_processing.inverse_text_normalization.hy.taggers.tokenize_and_classify import (
-            ClassifyFst as ITNClassifyFst,
-        )
-        from nemo_text_processing.inverse_text_normalization.hy.verbalizers.verbalize import (
-            VerbalizeFst as ITNVerbalizeFst,
-        )
-    elif args.language == 'ja':
-        from nemo_text_processing.inverse_text_normalization.ja.taggers.tokenize_and_classify import (
-            ClassifyFst as ITNClassifyFst,
-        )
-        from nemo_text_processing.inverse_text_normalization.ja.verbalizers.post_processing import (
-            PostProcessingFst as ITNPostProcessingFst,
-        )
-        from nemo_text_processing.inverse_text_normalization.ja.verbalizers.verbalize import (
-            VerbalizeFst as ITNVerbalizeFst,
-        )
-        from nemo_text_processing.text_normalization.ja.taggers.tokenize_and_classify import (
-            ClassifyFst as TNClassifyFst,
-        )
-        from nemo_text_processing.text_normalization.ja.verbalizers.post_processing import (
-            PostProcessingFst as TNPostProcessingFst,
-        )
-        from nemo_text_processing.text_normalization.ja.verbalizers.verbalize import VerbalizeFst as TNVerbalizeFst
-    elif args.language == 'rw':
-        from nemo_text_processing.text_normalization.rw.taggers.tokenize_and_classify import (
-            ClassifyFst as TNClassifyFst,
-        )
-        from nemo_text_processing.text_normalization.rw.verbalizers.verbalize import VerbalizeFst as TNVerbalizeFst
-    elif args.language == 'ko':
-        from nemo_text_processing.inverse_text_normalization.ko.taggers.tokenize_and_classify import (
-            ClassifyFst as ITNClassifyFst,
-        )
-        from nemo_text_processing.inverse_text_normalization.ko.verbalizers.verbalize import (
-            VerbalizeFst as ITNVerbalizeFst,
-        )
-        from nemo_text_processing.text_normalization.ko.taggers.tokenize_and_classify import (
-            ClassifyFst as TNClassifyFst,
-        )
-        from nemo_text_processing.text_normalization.ko.verbalizers.verbalize import VerbalizeFst as TNVerbalizeFst
+    if args.targets is None:
+        if args.language in ITN_ONLY_LANGUAGES and args.grammars == 'tn_grammars':
+            raise ValueError('Only ITN grammars could be deployed in Sparrowhawk for the selected languages.')
+        targets = [(args.language, args.grammars, args.input_case)]
     else:
-        raise KeyError(f"Language {args.language} is not defined for export.")
-    output_dir = os.path.join(args.output_dir, f"{args.language}_{args.grammars}_{args.input_case}")
-    export_grammars(
-        output_dir=output_dir,
-        grammars=locals()[args.grammars](
-            input_case=args.input_case,
-            cache_dir=args.cache_dir,
-            overwrite_cache=args.overwrite_cache,
-            whitelist=args.whitelist,
-        ),
+        targets = parse_targets(args.targets)
+
+    export_targets(
+        targets=targets,
+        output_dir=args.output_dir,
+        cache_dir=args.cache_dir,
+        overwrite_cache=args.overwrite_cache,
+        whitelist=args.whitelist,
+        n_jobs=args.n_jobs,
     )